@@ -1,9 +1,14 @@
-import os, re, sys, glob, subprocess, time
-import pandas as pd
-from datetime import datetime
-from openpyxl import load_workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+import os, re, sys, glob, json, shutil, struct, hashlib, argparse, tempfile, subprocess, time, contextlib
+import functools, tracemalloc
+from datetime import date, datetime, timedelta
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+# pandas/numpy/openpyxl são importados dentro das funções que os usam: o programa abre,
+# mostra as mensagens e valida as pastas antes de pagar o custo desses imports.
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ===== CONFIG =====
 # Sistema de busca inteligente de diretório
@@ -14,27 +19,42 @@ def encontrar_base_dir():
     """
     # Modo executável (PyInstaller) - usa pasta onde o .exe está
     if getattr(sys, 'frozen', False):
-        exe_dir = os.path.dirname(sys.executable)
-        print(f"✅ Usando pasta do executável: {exe_dir}")
-        return exe_dir
-    else:
-        # Script Python (desenvolvimento) - usa pasta do script
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        # Sobe um nível se estiver em /scripts
-        if os.path.basename(script_dir) == 'scripts':
-            script_dir = os.path.dirname(script_dir)
-        print(f"✅ Usando pasta do script: {script_dir}")
-        return script_dir
+        return os.path.dirname(sys.executable)
+    # Script Python (desenvolvimento) - usa pasta do script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    # Sobe um nível se estiver em /scripts
+    if os.path.basename(script_dir) == 'scripts':
+        script_dir = os.path.dirname(script_dir)
+    return script_dir
 
+def anunciar_base_dir():
+    """Mostra a pasta em uso (no stderr: no modo lote o stdout é só do resumo JSON)"""
+    origem = "do executável" if getattr(sys, 'frozen', False) else "do script"
+    print(f"✅ Usando pasta {origem}: {BASE_DIR}", file=sys.stderr)
+
+# Só cálculo de caminhos (sem I/O nem mensagens) - o import do módulo não tem efeitos colaterais
 BASE_DIR   = encontrar_base_dir()
 FILHAS_DIR = os.path.join(BASE_DIR, "filhas")
 MAE_PATH   = os.path.join(BASE_DIR, "PLANILHA_MAE.xlsx")
+STATUS_PATH = os.path.join(BASE_DIR, "status_atualizacao.txt")
 
 NOME_REGEX = re.compile(r"^([A-ZÇÃÕÉÊÁÍÓÚ]+)_[A-ZÇÃÕÉÊÁÍÓÚ]+ - ATENDIMENTOS.{0,3}(\d{2}-\d{2}-\d{2}|\d{2}-\d{2}-\d{4})\.xlsm?$", re.I)
 COLS_ESPERADAS = [
     "INICIAR","RESPONSÁVEL","OPERAÇÃO","CLIENTE","SOLICITAÇÃO","SETOR",
     "OBSERVAÇÕES","FINALIZAR","TIME SPENT","TRATATIVA SETOR","TIME SPENT - SETOR"
 ]
+# COMPILE GERAL: as colunas das filhas e as acrescentadas na leitura
+COLUNAS_CONSOLIDADO = COLS_ESPERADAS + ["PRIMEIRO_NOME", "DATA_ARQUIVO", "ARQUIVO"]
+COLUNAS_DATA   = ["INICIAR", "FINALIZAR", "TRATATIVA SETOR"]
+COLUNAS_TEMPO  = ["TIME SPENT", "TIME SPENT - SETOR"]
+# Esquema do frame consolidado, aplicado na leitura de cada filha: COLUNAS_DATA viram datetime64,
+# COLUNAS_TEMPO viram timedelta, as colunas com poucos valores distintos viram categorias e o resto
+# fica texto. OPERAÇÃO é quase um valor por linha e CLIENTE/SOLICITAÇÃO são texto livre: como
+# categoria só somariam o dicionário e o union_categoricals de cada concat.
+COLUNAS_CATEGORIA = ["RESPONSÁVEL", "SETOR", "PRIMEIRO_NOME", "ARQUIVO"]
+# Colunas que identificam um atendimento repetido entre filhas (cópias do dia anterior)
+CHAVE_DUPLICADOS = ["INICIAR", "RESPONSÁVEL", "CLIENTE", "SOLICITAÇÃO"]
+LARGURA_MAXIMA = 50
 
 def fechar_excel():
     """Verifica se o Excel está aberto e pergunta se quer fechar"""
@@ -104,7 +124,7 @@ def abrir_planilha_final():
         print(f"💡 Abra manualmente em: {MAE_PATH}")
         return False
 
-def abrir_no_navegador(df: pd.DataFrame):
+def abrir_no_navegador(df: "pd.DataFrame", motor="openpyxl", metricas=None):
     """Salva como arquivo temporário para visualização paralela"""
     try:
         # Limpa arquivos temporários antigos primeiro
@@ -127,22 +147,13 @@ def abrir_no_navegador(df: pd.DataFrame):
         
         print(f"\n📊 Salvando arquivo temporário: {os.path.basename(temp_path)}")
         
-        # Usa a mesma função de salvar_no_excel, mas com caminho temporário
-        # Temporariamente substitui MAE_PATH
-        global MAE_PATH
-        mae_path_original = MAE_PATH
-        MAE_PATH = temp_path
-        
-        try:
-            salvar_no_excel(df)
-            print(f"✅ Arquivo temporário salvo com TODAS as abas!")
-            print(f"📁 Local: {temp_path}")
-            print(f"\n💡 IMPORTANTE: Este é um arquivo temporário para visualização.")
-            print(f"💡 Ele será automaticamente removido na próxima execução.")
-            print(f"💡 Feche o Excel principal e execute novamente para atualizar o arquivo definitivo.")
-        finally:
-            # Restaura o caminho original
-            MAE_PATH = mae_path_original
+        # Usa a mesma função de salvar_no_excel, mas com caminho temporário e sem backup
+        salvar_no_excel(df, motor=motor, metricas=metricas, destino=temp_path, backups=0)
+        print(f"✅ Arquivo temporário salvo com TODAS as abas!")
+        print(f"📁 Local: {temp_path}")
+        print(f"\n💡 IMPORTANTE: Este é um arquivo temporário para visualização.")
+        print(f"💡 Ele será automaticamente removido na próxima execução.")
+        print(f"💡 Feche o Excel principal e execute novamente para atualizar o arquivo definitivo.")
         
         # Pergunta se quer abrir o temporário
         resposta = input("\n🤔 Deseja abrir o arquivo temporário agora? (S/N): ").strip().upper()
@@ -159,79 +170,512 @@ def abrir_no_navegador(df: pd.DataFrame):
         print(f"❌ Erro ao criar arquivo temporário: {e}")
         return False
 
-def escrever_status(mensagem: str):
+# O status da execução vai para um arquivo texto pequeno ao lado da planilha (barato de
+# escrever a qualquer momento) e o status final vai para a aba STATUS, no mesmo salvamento
+# da planilha mãe - assim ela é gravada uma única vez por execução.
+ABA_STATUS = "STATUS"
+
+def escrever_status(mensagem: str, caminho=None):
     try:
-        wb = load_workbook(MAE_PATH)
-        ws = wb.active  # primeira aba (pode ajustar pelo nome)
-        ws["A1"] = mensagem
-        wb.save(MAE_PATH)
+        with open(caminho or STATUS_PATH, "w", encoding="utf-8") as f:
+            f.write(f"{mensagem}\n{datetime.now():%d/%m/%Y %H:%M:%S}\n")
     except Exception:
-        pass  # se ainda não existe, segue
+        pass  # status é informativo, não interrompe a execução
 
-def aplicar_formatacao(ws, df):
-    """Aplica formatação profissional na planilha"""
-    
-    # Estilo do cabeçalho
-    header_font = Font(bold=True, color="FFFFFF")  # Cor do texto (branco)
-    header_fill = PatternFill(start_color="ed7d31", end_color="ed7d31", fill_type="solid")  # Cor de fundo (laranja)
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Bordas na cor laranja para todas as células
-    border_laranja = Border(
-        left=Side(style='thin', color='ed7d31'), 
-        right=Side(style='thin', color='ed7d31'), 
-        top=Side(style='thin', color='ed7d31'), 
-        bottom=Side(style='thin', color='ed7d31')
-    )
-    
-    # Aplica formatação no cabeçalho
-    for col_idx, column in enumerate(ws.columns, 1):
-        cell = ws.cell(row=1, column=col_idx)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = border_laranja
-    
-    # Autoajuste das colunas
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        
-        # Ajusta largura com limite máximo
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Formatação das células de dados
-    for row_idx in range(2, ws.max_row + 1):
-        for col_idx in range(1, ws.max_column + 1):
+def _linhas_status(status):
+    return [("Status", "Atualizado em"), (status, datetime.now().strftime("%d/%m/%Y %H:%M:%S"))]
+
+# ===== INSTRUMENTAÇÃO =====
+# Tempo, linhas e memória por etapa e por filha lida (--instrumentar), gravados no log e em
+# relatorio_execucao.json. Desligada, cada ponto de medição custa só um `if`.
+RELATORIO_EXECUCAO = "relatorio_execucao.json"
+
+def pico_rss_mb():
+    """Pico de memória residente do processo (MB); None se a plataforma não informar"""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil  # opcional no Windows
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+class _EtapaDesligada:
+    """Devolvida por etapa() com a instrumentação desligada: não mede nada"""
+    linhas_entrada = linhas_saida = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_ETAPA_DESLIGADA = _EtapaDesligada()
+
+class _Etapa:
+    def __init__(self, instrumentacao, nome, linhas_entrada):
+        self.instrumentacao = instrumentacao
+        self.nome = nome
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = None
+        self.pico_memoria = 0
+
+    def __enter__(self):
+        instr = self.instrumentacao
+        instr.etapas.setdefault(self.nome, {"nivel": len(instr._pilha), "chamadas": 0, "segundos": 0.0,
+                                            "linhas_entrada": None, "linhas_saida": None,
+                                            "pico_tracemalloc_mb": None, "rss_pico_mb": None})
+        if instr.memoria:
+            instr.marcar_pico()
+            tracemalloc.reset_peak()
+        instr._pilha.append(self)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self.inicio
+        instr = self.instrumentacao
+        instr._pilha.pop()
+        registro = instr.etapas[self.nome]
+        registro["chamadas"] += 1
+        registro["segundos"] += segundos
+        for chave in ("linhas_entrada", "linhas_saida"):
+            valor = getattr(self, chave)
+            if valor is not None:
+                registro[chave] = (registro[chave] or 0) + valor
+        if instr.memoria:
+            self.pico_memoria = max(self.pico_memoria, tracemalloc.get_traced_memory()[1])
+            if instr._pilha:  # o pico de uma etapa interna também é pico da externa
+                instr._pilha[-1].pico_memoria = max(instr._pilha[-1].pico_memoria, self.pico_memoria)
+            registro["pico_tracemalloc_mb"] = max(registro["pico_tracemalloc_mb"] or 0,
+                                                  round(self.pico_memoria / 2**20, 1))
+        registro["rss_pico_mb"] = pico_rss_mb()
+        return False
+
+class Instrumentacao:
+    """Coleta as medições de uma execução; `INSTRUMENTACAO` é a instância usada pelo programa"""
+
+    def __init__(self):
+        self.ativa = False
+        self.memoria = False
+        self.reiniciar()
+
+    def configurar(self, ativa=True, memoria=False):
+        """memoria=True liga o tracemalloc (pico de memória Python por etapa; deixa a execução mais lenta)"""
+        self.ativa = bool(ativa or memoria)
+        self.memoria = bool(memoria)
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.reiniciar()
+
+    def config(self):
+        return {"ativa": self.ativa, "memoria": self.memoria}
+
+    def reiniciar(self):
+        self.etapas = {}     # nome -> totais (na ordem em que as etapas começam)
+        self.arquivos = []   # uma medição por filha lida do disco
+        self._pilha = []
+        self.inicio = time.perf_counter()
+        self.inicio_data = datetime.now()
+
+    def etapa(self, nome, linhas_entrada=None):
+        """Context manager que mede o bloco; etapas com o mesmo nome são somadas"""
+        if not self.ativa:
+            return _ETAPA_DESLIGADA
+        return _Etapa(self, nome, linhas_entrada)
+
+    def marcar_pico(self):
+        """Guarda na etapa atual o pico do tracemalloc até aqui (antes de alguém zerar o pico)"""
+        if self.memoria and self._pilha:
+            etapa = self._pilha[-1]
+            etapa.pico_memoria = max(etapa.pico_memoria, tracemalloc.get_traced_memory()[1])
+
+    def registrar_arquivo(self, medida):
+        self.arquivos.append(medida)
+
+    def relatorio(self, **extras):
+        etapas = [{"etapa": nome, **dict(reg, segundos=round(reg["segundos"], 4))} for nome, reg in self.etapas.items()]
+        return {
+            "inicio": self.inicio_data.isoformat(timespec="seconds"),
+            "segundos_total": round(time.perf_counter() - self.inicio, 3),
+            "rss_pico_mb": pico_rss_mb(),
+            "tracemalloc": self.memoria,
+            **extras,
+            "etapas": etapas,
+            "arquivos": self.arquivos,
+        }
+
+    def linhas_log(self):
+        """Resumo legível das medições para o log_compilacao.txt"""
+        def mem(valor):
+            return f"{valor} MB" if valor is not None else "-"
+
+        linhas = ["", "-" * 50, "⏱️ Etapas (tempo | chamadas | linhas entrada -> saída | pico tracemalloc | pico RSS)"]
+        for nome, reg in self.etapas.items():
+            fluxo = f"{reg['linhas_entrada'] if reg['linhas_entrada'] is not None else '-'} -> " \
+                    f"{reg['linhas_saida'] if reg['linhas_saida'] is not None else '-'}"
+            linhas.append(f"{'   ' * reg['nivel']}{nome}: {reg['segundos']:.3f}s | {reg['chamadas']}x | {fluxo} | "
+                          f"{mem(reg['pico_tracemalloc_mb'])} | {mem(reg['rss_pico_mb'])}")
+        if self.arquivos:
+            linhas.append("📄 Filhas lidas do disco (mais lentas primeiro)")
+            for medida in sorted(self.arquivos, key=lambda m: -m["segundos"]):
+                linhas.append(f"   {medida['arquivo']}: {medida['segundos']:.3f}s | "
+                              f"{medida.get('linhas_entrada', '-')} -> {medida['linhas_saida']} linhas"
+                              + (f" | +{medida['memoria_extra_mb']} MB" if "memoria_extra_mb" in medida else ""))
+        linhas.append(f"Total: {time.perf_counter() - self.inicio:.3f}s | pico RSS {mem(pico_rss_mb())}")
+        return linhas
+
+INSTRUMENTACAO = Instrumentacao()
+
+def medir_etapa(nome, linhas=None):
+    """Decorador: cada chamada da função conta como a etapa `nome`; linhas(*args) informa as linhas tratadas"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if not INSTRUMENTACAO.ativa:
+                return funcao(*args, **kwargs)
+            quantidade = linhas(*args, **kwargs) if linhas else None
+            with INSTRUMENTACAO.etapa(nome, quantidade) as etapa:
+                etapa.linhas_saida = quantidade
+                return funcao(*args, **kwargs)
+        return medida
+    return decorador
+
+# ===== ESTILOS =====
+# Estilos nomeados registrados uma vez por workbook; cada célula recebe só o nome do estilo
+# (em vez de novos Font/Alignment/Border por célula), o que também enxuga o styles.xml.
+def registrar_estilos(wb):
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+    lado = Side(style='thin', color='ed7d31')
+    border_laranja = Border(left=lado, right=lado, top=lado, bottom=lado)  # Bordas na cor laranja
+    header_fill = PatternFill(start_color="ed7d31", end_color="ed7d31", fill_type="solid")  # Fundo laranja
+    centro = Alignment(horizontal="center", vertical="center")
+    esquerda = Alignment(horizontal="left", vertical="center")
+
+    estilos = [
+        NamedStyle("cabecalho", font=Font(bold=True, color="FFFFFF"), fill=header_fill, alignment=centro, border=border_laranja),
+        NamedStyle("titulo_14", font=Font(bold=True, size=14, color="FFFFFF"), fill=header_fill, alignment=centro, border=border_laranja),
+        NamedStyle("titulo_12", font=Font(bold=True, size=12, color="FFFFFF"), fill=header_fill, alignment=centro, border=border_laranja),
+        NamedStyle("texto", alignment=esquerda, border=border_laranja),
+        NamedStyle("texto_quebra", alignment=Alignment(wrap_text=True, vertical="top", horizontal="left"), border=border_laranja),
+        NamedStyle("centro", alignment=centro, border=border_laranja),
+        # Formatação de data bonita: DD/MM/AAAA HH:MM (sem dia da semana)
+        NamedStyle("data", alignment=centro, border=border_laranja, number_format='DD/MM/YYYY HH:MM'),
+        # Formatação de tempo: [HH]:MM:SS (durações de 24h ou mais não voltam a zero)
+        NamedStyle("duracao", alignment=centro, border=border_laranja, number_format='[HH]:MM:SS'),
+        NamedStyle("data_hora", alignment=esquerda, border=border_laranja, number_format='yyyy-mm-dd h:mm:ss'),
+    ]
+    for estilo in estilos:
+        if estilo.name not in wb.named_styles:
+            wb.add_named_style(estilo)
+
+def _mascara_quebra_linha(serie):
+    """Células de texto que recebem quebra de linha: multilinha ou com mais de 5 palavras"""
+    texto = serie.astype("string")
+    return (texto.str.contains("\n", regex=False) | (texto.str.count(r"\S+") > 5)).fillna(False).to_numpy(dtype=bool)
+
+class ColunasPreparadas:
+    """
+    Colunas de um DataFrame prontas para escrita: valores, máscara de vazios, estilo e
+    comprimento de texto de cada célula, calculados uma única vez. As abas por pessoa usam
+    fatias destes arrays (sem recalcular estilos nem copiar o DataFrame).
+    """
+
+    def __init__(self, nomes, valores, nulos, estilos, comprimentos):
+        self.nomes = nomes                # nomes das colunas (cabeçalho)
+        self.valores = valores            # por coluna: array de valores
+        self.nulos = nulos                # por coluna: array bool de células vazias
+        self.estilos = estilos            # por coluna: nome do estilo ou array de nomes por linha
+        self.comprimentos = comprimentos  # por coluna: len(str(valor)), vazios contam como 'None' (4)
+
+    @classmethod
+    @medir_etapa("preparo_colunas", linhas=lambda cls, df: len(df))
+    def do_dataframe(cls, df):
+        import numpy as np
+        import pandas as pd
+        valores, nulos, estilos, comprimentos = [], [], [], []
+        for col in df.columns:
+            serie = df[col]
+            vazios = serie.isna().to_numpy(dtype=bool)
+            if pd.api.types.is_datetime64_any_dtype(serie):
+                vals = pd.Series(serie.dt.to_pydatetime(), dtype=object).to_numpy()
+                estilo = "data" if col in COLUNAS_DATA else "data_hora"
+                comp = np.where(vazios, 4, 19)  # 'AAAA-MM-DD HH:MM:SS'
+            elif pd.api.types.is_timedelta64_dtype(serie):
+                vals = serie.to_numpy(dtype=object)  # pd.Timedelta (subclasse de timedelta)
+                estilo = "duracao"
+                comp = np.where(vazios, 4, 8)  # 'HH:MM:SS'
+            elif isinstance(serie.dtype, pd.CategoricalDtype):
+                # Uma conta por categoria, espalhada pelos códigos: as células compartilham os
+                # mesmos objetos de texto. O item extra no fim atende o código -1 (vazio).
+                categorias = serie.cat.categories
+                codigos = serie.cat.codes.to_numpy()
+                textos = categorias.to_numpy(dtype=object)
+                vals = np.append(textos, None)[codigos]
+                vazios = np.append(textos == "", True)[codigos]
+                quebra = _mascara_quebra_linha(pd.Series(categorias))
+                estilo = np.append(np.where(quebra, "texto_quebra", "texto"), "texto").astype(object)[codigos]
+                comp = np.append(categorias.str.len().to_numpy(dtype=np.int64), 0)[codigos]
+                comp = np.where(vazios | (comp == 0), 4, comp)
+            else:
+                vals = serie.to_numpy(dtype=object)
+                vazios = vazios | (vals == "")
+                if col in COLUNAS_DATA:
+                    estilo = "data"
+                elif col in COLUNAS_TEMPO:
+                    estilo = "duracao"
+                else:
+                    estilo = np.where(_mascara_quebra_linha(serie), "texto_quebra", "texto").astype(object)
+                comp = serie.astype("string").str.len().fillna(0).to_numpy(dtype=np.int64)
+                comp = np.where(vazios | (comp == 0), 4, comp)
+            valores.append(vals)
+            nulos.append(vazios)
+            estilos.append(estilo)
+            comprimentos.append(comp)
+        return cls(list(df.columns), valores, nulos, estilos, comprimentos)
+
+    def __len__(self):
+        return len(self.valores[0]) if self.valores else 0
+
+    def fatia(self, posicoes, colunas=None):
+        """Subconjunto de linhas (posições) e colunas; posições contíguas viram views (slice)"""
+        import numpy as np
+        posicoes = np.asarray(posicoes)
+        if len(posicoes) and posicoes[-1] - posicoes[0] + 1 == len(posicoes):
+            posicoes = slice(int(posicoes[0]), int(posicoes[-1]) + 1)
+        idxs = [self.nomes.index(c) for c in colunas] if colunas is not None else range(len(self.nomes))
+        return ColunasPreparadas(
+            [self.nomes[i] for i in idxs],
+            [self.valores[i][posicoes] for i in idxs],
+            [self.nulos[i][posicoes] for i in idxs],
+            [self.estilos[i] if isinstance(self.estilos[i], str) else self.estilos[i][posicoes] for i in idxs],
+            [self.comprimentos[i][posicoes] for i in idxs],
+        )
+
+    def larguras(self):
+        """Largura de cada coluna: maior len(str(valor)) + 2, limitado a 50"""
+        return [largura_coluna(nome, int(comp.max()) if len(comp) else 0)
+                for nome, comp in zip(self.nomes, self.comprimentos)]
+
+    def linhas(self):
+        """Itera (valores, nulos, estilos) de cada linha"""
+        estilos = [[e] * len(self) if isinstance(e, str) else e for e in self.estilos]
+        return zip(zip(*self.valores), zip(*self.nulos), zip(*estilos))
+
+def largura_coluna(nome, maior_comprimento):
+    """Largura de uma coluna a partir do maior texto dela (o cabeçalho conta)"""
+    return min(max(len(str(nome)), maior_comprimento) + 2, LARGURA_MAXIMA)
+
+def _posicoes_por_pessoa(df):
+    """Posições das linhas de cada PRIMEIRO_NOME (uma passada de groupby), em ordem de nome"""
+    if df.empty:
+        return []
+    grupos = df.groupby(df["PRIMEIRO_NOME"].astype(str), sort=True).indices
+    return [(nome, grupos[nome]) for nome in sorted(grupos) if nome not in ("nan", "<NA>", "None")]
+
+@medir_etapa("escrita_abas", linhas=lambda ws, colunas: len(colunas))
+def escrever_aba(ws, colunas):
+    """Escreve cabeçalho e dados numa aba do openpyxl, aplicando os estilos nomeados numa única passada"""
+    for col_idx, col in enumerate(colunas.nomes, 1):
+        ws.cell(row=1, column=col_idx, value=col).style = "cabecalho"
+
+    for row_idx, (valores, nulos, estilos) in enumerate(colunas.linhas(), 2):
+        for col_idx, (valor, nulo, estilo) in enumerate(zip(valores, nulos, estilos), 1):
             cell = ws.cell(row=row_idx, column=col_idx)
-            cell.border = border_laranja
-            cell.alignment = Alignment(horizontal="left", vertical="center")
-    
-    # Formatação específica para colunas de data/hora
-    date_columns = ["INICIAR", "FINALIZAR", "TRATATIVA SETOR"]
-    time_columns = ["TIME SPENT", "TIME SPENT - SETOR"]
-    
-    for col_idx, col_name in enumerate(df.columns, 1):
-        if col_name in date_columns:
-            for row_idx in range(2, ws.max_row + 1):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-                # Formatação de data bonita: DD/MM/AAAA HH:MM (sem dia da semana)
-                cell.number_format = 'DD/MM/YYYY HH:MM'
-        elif col_name in time_columns:
-            for row_idx in range(2, ws.max_row + 1):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-                # Formatação de tempo: HH:MM:SS
-                cell.number_format = 'HH:MM:SS'
+            if not nulo:
+                # Preserva quebras de linha originais do Excel
+                cell.value = valor
+            cell.style = estilo
+
+    aplicar_formatacao(ws, colunas)
+
+@medir_etapa("formatacao")
+def aplicar_formatacao(ws, colunas):
+    """Formatação em nível de coluna (as células já são estilizadas na escrita)"""
+    from openpyxl.utils import get_column_letter
+    for col_idx, largura in enumerate(colunas.larguras(), 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = largura
+
+COR_LARANJA = "#ED7D31"
+
+class FormatosXlsxwriter:
+    """Formatos do xlsxwriter com os mesmos nomes e aparência dos estilos de registrar_estilos"""
+
+    def __init__(self, wb):
+        borda = {"border": 1, "border_color": COR_LARANJA}
+        destaque = {**borda, "bold": True, "font_color": "#FFFFFF", "bg_color": COR_LARANJA,
+                    "align": "center", "valign": "vcenter"}
+        self.cabecalho    = wb.add_format(destaque)
+        self.titulo_14    = wb.add_format({**destaque, "font_size": 14})
+        self.titulo_12    = wb.add_format({**destaque, "font_size": 12})
+        self.texto        = wb.add_format({**borda, "align": "left", "valign": "vcenter"})
+        self.texto_quebra = wb.add_format({**borda, "align": "left", "valign": "top", "text_wrap": True})
+        self.centro       = wb.add_format({**borda, "align": "center", "valign": "vcenter"})
+        self.data         = wb.add_format({**borda, "align": "center", "valign": "vcenter", "num_format": "DD/MM/YYYY HH:MM"})
+        self.duracao      = wb.add_format({**borda, "align": "center", "valign": "vcenter", "num_format": "[HH]:MM:SS"})
+        self.data_hora    = wb.add_format({**borda, "align": "left", "valign": "vcenter", "num_format": "yyyy-mm-dd h:mm:ss"})
+        # O xlsxwriter numera os estilos na ordem do primeiro uso; numerando todos aqui, o styles.xml
+        # não depende de quais abas foram escritas (a gravação incremental copia abas de outro arquivo)
+        for fmt in vars(self).values():
+            fmt._get_xf_index()
+
+@medir_etapa("escrita_abas", linhas=lambda ws, colunas, formatos: len(colunas))
+def escrever_aba_streaming(ws, colunas, formatos):
+    """Escreve cabeçalho + linhas numa aba do xlsxwriter, já formatadas"""
+    for col_idx, (col, largura) in enumerate(zip(colunas.nomes, colunas.larguras())):
+        ws.set_column(col_idx, col_idx, largura)
+        ws.write_string(0, col_idx, str(col), formatos.cabecalho)
+    escrever_linhas_streaming(ws, colunas, formatos)
+
+def escrever_linhas_streaming(ws, colunas, formatos, primeira_linha=1):
+    """Escreve as linhas de colunas a partir de primeira_linha (base 0), sem cabeçalho"""
+    for row_idx, (valores, nulos, estilos) in enumerate(colunas.linhas(), primeira_linha):
+        for col_idx, (valor, nulo, estilo) in enumerate(zip(valores, nulos, estilos)):
+            fmt = getattr(formatos, estilo)
+            if nulo:
+                ws.write_blank(row_idx, col_idx, None, fmt)
+            elif isinstance(valor, str):
+                ws.write_string(row_idx, col_idx, valor, fmt)
+            elif isinstance(valor, (datetime, timedelta)):
+                ws.write_datetime(row_idx, col_idx, valor, fmt)
+            else:
+                ws.write(row_idx, col_idx, valor, fmt)
+
+OPCOES_XLSXWRITER = {
+    "constant_memory": True,
+    "strings_to_numbers": False,
+    "strings_to_formulas": False,
+    "strings_to_urls": False,
+}
+
+def _salvar_com_xlsxwriter(df, destino, metricas, status=None, pular=frozenset()):
+    """
+    Gera a planilha mãe inteira com o xlsxwriter (modo streaming).
+    pular: abas criadas vazias (a gravação incremental põe no lugar as do arquivo anterior).
+    """
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(destino, OPCOES_XLSXWRITER)
+    formatos = FormatosXlsxwriter(wb)
+    pessoas = [(nome.title(), posicoes) for nome, posicoes in _posicoes_por_pessoa(df)]
+    escrever = {"COMPILE GERAL", *(aba for aba, _ in pessoas)} - set(pular)
+
+    # 1) COMPILE GERAL
+    colunas = ColunasPreparadas.do_dataframe(df) if escrever else None
+    ws = wb.add_worksheet("COMPILE GERAL")
+    if "COMPILE GERAL" in escrever:
+        escrever_aba_streaming(ws, colunas, formatos)
+
+    # 2) MÉTRICAS e métricas por período
+    escrever_abas_metricas_streaming([wb.add_worksheet(aba) for aba in ABAS_METRICAS], metricas, formatos)
+
+    # 3) Abas por pessoa - fatias das colunas já preparadas para COMPILE GERAL
+    for aba, posicoes in pessoas:
+        ws = wb.add_worksheet(aba)
+        if aba in escrever:
+            escrever_aba_streaming(ws, colunas.fatia(posicoes, COLS_ESPERADAS), formatos)
+
+    # 4) STATUS da execução
+    if status:
+        escrever_status_streaming(wb.add_worksheet(ABA_STATUS), status, formatos)
+
+    with INSTRUMENTACAO.etapa("save"):
+        wb.close()
+
+def escrever_metricas_streaming(wsM, metricas, formatos):
+    """Aba MÉTRICAS no xlsxwriter (mesmo layout da versão openpyxl)"""
+    wsM.set_column(0, 0, 35)
+    wsM.set_column(1, 1, 20)
+    wsM.merge_range(0, 0, 0, 1, "📊 MÉTRICAS GERAIS", formatos.titulo_14)
+    wsM.write_string(2, 0, "Indicador", formatos.cabecalho)
+    wsM.write_string(2, 1, "Valor", formatos.cabecalho)
+    row = 3
+    for indicador, valor in metricas.linhas_kpi():
+        wsM.write(row, 0, indicador, formatos.texto)
+        wsM.write(row, 1, valor, formatos.centro)
+        row += 1
+
+    def write_pivot_streaming(title, series_counts, start_row, col1_name, col2_name):
+        r = start_row - 1  # xlsxwriter usa linhas a partir de 0
+        wsM.merge_range(r, 0, r, 1, f"📋 {title}", formatos.titulo_12)
+        wsM.write_string(r + 1, 0, col1_name, formatos.cabecalho)
+        wsM.write_string(r + 1, 1, col2_name, formatos.cabecalho)
+        r += 2
+        for k, v in series_counts.items():
+            wsM.write_string(r, 0, str(k), formatos.texto)
+            wsM.write_number(r, 1, int(v), formatos.centro)
+            r += 1
+        return r + 2  # mesma numeração (base 1) de write_pivot_styled
+
+    if metricas.total:
+        next_row = write_pivot_streaming("ATENDIMENTOS POR SETOR", metricas.setores(), 10, "Setor", "Qtd. Atendimentos")
+        write_pivot_streaming("ATENDIMENTOS POR RESPONSÁVEL", metricas.pessoas(), next_row + 1, "Responsável", "Qtd. Atendimentos")
+
+CABECALHO_PERIODO = ["Atendimentos", "Finalizados", "% Finalizados", "Tempo Total (min)", "Tempo Médio (min)"]
+LARGURAS_PERIODO = [25, 25, 14, 14, 14, 18, 18]
+
+def linhas_aba_periodo(titulo, metricas, periodo):
+    """
+    Conteúdo de uma aba por período (o mesmo nos dois motores): (linha base 0, [(valor, estilo)...],
+    mesclada). Uma linha mesclada ocupa todas as colunas com o único valor dela.
+    """
+    yield 0, [(f"📅 {titulo}", "titulo_14")], True
+    if not metricas.por_dia:
+        return
+    coluna = "Semana" if periodo == "semana" else "Mês"
+    row = 2
+    for nome, dimensao in (("SETOR", "setor"), ("RESPONSÁVEL", "pessoa")):
+        yield row, [(f"📋 ATENDIMENTOS POR {nome}", "titulo_12")], True
+        yield row + 1, [(texto, "cabecalho") for texto in [coluna, nome.title(), *CABECALHO_PERIODO]], False
+        row += 2
+        for linha in metricas.por_periodo(periodo, dimensao):
+            yield row, [(valor, "texto" if col < 2 else "centro") for col, valor in enumerate(linha)], False
+            row += 1
+        row += 2
+
+def escrever_periodo_streaming(ws, titulo, metricas, periodo, formatos):
+    """Aba por período (MÉTRICAS SEMANAIS/MENSAIS) no xlsxwriter, a partir dos agregados por dia"""
+    for col, largura in enumerate(LARGURAS_PERIODO):
+        ws.set_column(col, col, largura)
+    for row, celulas, mesclada in linhas_aba_periodo(titulo, metricas, periodo):
+        if mesclada:
+            valor, estilo = celulas[0]
+            ws.merge_range(row, 0, row, len(LARGURAS_PERIODO) - 1, valor, getattr(formatos, estilo))
+            continue
+        for col, (valor, estilo) in enumerate(celulas):
+            ws.write(row, col, valor, getattr(formatos, estilo))
+
+def escrever_periodo(ws, titulo, metricas, periodo):
+    """Aba por período no openpyxl (mesmo conteúdo de escrever_periodo_streaming)"""
+    from openpyxl.utils import get_column_letter
+    ultima = get_column_letter(len(LARGURAS_PERIODO))
+    for row, celulas, mesclada in linhas_aba_periodo(titulo, metricas, periodo):
+        for col, (valor, estilo) in enumerate(celulas, 1):
+            ws.cell(row=row + 1, column=col, value=valor).style = estilo
+        if mesclada:
+            ws.merge_cells(f"A{row + 1}:{ultima}{row + 1}")
+    for col, largura in enumerate(LARGURAS_PERIODO, 1):
+        ws.column_dimensions[get_column_letter(col)].width = largura
+
+def escrever_abas_metricas_streaming(abas, metricas, formatos):
+    """MÉTRICAS e as abas por período, criadas antes (na ordem de ABAS_METRICAS) para ficarem no lugar certo"""
+    wsM, *periodos = abas
+    escrever_metricas_streaming(wsM, metricas, formatos)
+    for ws, (titulo, periodo) in zip(periodos, ABAS_PERIODO.items()):
+        escrever_periodo_streaming(ws, titulo, metricas, periodo, formatos)
+
+def escrever_status_streaming(wsS, status, formatos):
+    """Aba STATUS no xlsxwriter"""
+    wsS.set_column(0, 0, 60)
+    wsS.set_column(1, 1, 20)
+    # constant_memory: escreve linha por linha, em ordem
+    for row_idx, linha in enumerate(_linhas_status(status)):
+        for col_idx, valor in enumerate(linha):
+            wsS.write_string(row_idx, col_idx, valor, formatos.cabecalho if row_idx == 0 else formatos.texto)
 
 def validar_nome(arquivo):
     nome = os.path.basename(arquivo)
@@ -253,372 +697,2602 @@ def extrair_primeiro_nome(arquivo):
         data = None
     return primeiro.upper(), data
 
-def ler_filhos():
-    arquivos = sorted(glob.glob(os.path.join(FILHAS_DIR, "*.xlsx")) + 
-                      glob.glob(os.path.join(FILHAS_DIR, "*.xlsm")))
-    logs = []
-    dfs = []
-    for arq in arquivos:
-        if not validar_nome(arq):
-            logs.append(f"❌ Nome inválido: {os.path.basename(arq)} (padrão: NOME_SOBRENOME - ATENDIMENTOS - DD-MM-AA.xlsx)")
-            continue
-        try:
-            # Lê Excel preservando formatação e quebras de linha
-            df = pd.read_excel(arq, dtype=str, keep_default_na=False)
-            # Remove espaços extras dos nomes das colunas
-            df.columns = df.columns.str.strip()
-            # Substitui células vazias por NaN para processamento correto
-            df = df.replace('', pd.NA)
-            faltantes = [c for c in COLS_ESPERADAS if c not in df.columns]
-            if faltantes:
-                logs.append(f"❌ Colunas faltando em {os.path.basename(arq)}: {faltantes}")
-                continue
-            
-            # FILTRAR LINHAS VAZIAS - Remove linhas onde todas as colunas principais estão vazias
-            colunas_principais = ["RESPONSÁVEL", "OPERAÇÃO", "CLIENTE", "SOLICITAÇÃO"]
-            
-            # Verifica se pelo menos uma coluna principal tem dados válidos
-            mask_nao_vazio = False
-            for col in colunas_principais:
-                if col in df.columns:
-                    # Verifica se a coluna tem valores não-nulos e não-vazios (preservando quebras de linha)
-                    mask_col = df[col].notna() & (df[col] != '') & (df[col].astype(str).str.strip() != "")
-                    if mask_nao_vazio is False:
-                        mask_nao_vazio = mask_col
-                    else:
-                        mask_nao_vazio = mask_nao_vazio | mask_col
-            
-            # Se não encontrou nenhuma linha válida, usar máscara padrão
-            if mask_nao_vazio is False:
-                mask_nao_vazio = df.index >= 0  # Todas as linhas
-            
-            df_filtrado = df[mask_nao_vazio].copy()
-            
-            if df_filtrado.empty:
-                logs.append(f"⚠️ Arquivo sem dados válidos: {os.path.basename(arq)}")
-                continue
-            
-            primeiro, data_arq = extrair_primeiro_nome(arq)
-            df_filtrado["PRIMEIRO_NOME"] = primeiro
-            df_filtrado["DATA_ARQUIVO"]  = pd.to_datetime(data_arq) if data_arq else pd.NaT
-            df_filtrado["ARQUIVO"]       = os.path.basename(arq)
-            dfs.append(df_filtrado[COLS_ESPERADAS + ["PRIMEIRO_NOME","DATA_ARQUIVO","ARQUIVO"]])
-            logs.append(f"✅ OK: {os.path.basename(arq)} ({len(df_filtrado)} linhas úteis de {len(df)} total)")
+# ===== DATAS E DURAÇÕES =====
+# As células chegam como texto (_texto_celula) em vários formatos: "00:25:00", "1 day, 2:00:00"
+# (timedelta), fração de dia do Excel ("0.0173611"), data/hora ISO (datetime do openpyxl -
+# durações de 24h ou mais vêm como 1899-12-31 hh:mm:ss) ou digitada ("16/10/2025 12:01").
+# Cada formato é convertido para a coluna inteira de uma vez (regex/parse do pandas), só nas
+# linhas que os anteriores não resolveram - sem laço em Python por linha.
+ORIGEM_EXCEL = "1899-12-30"  # dia 0 das datas/durações do Excel
+FORMATOS_DATA_DIGITADA = ["%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y", "%d/%m/%y %H:%M", "%d/%m/%y"]
+# FINALIZAR marcado à mão com o texto que versões antigas contavam como finalizado. Hoje finalizado
+# é FINALIZAR com data/hora; esses textos não contam, mas são contados à parte no log e no resumo.
+FINALIZADO_EM_TEXTO = ["sim", "yes", "true"]
+AVISO_FINALIZADO_EM_TEXTO = "FINALIZAR só com texto (Sim/yes/true), fora dos finalizados"
+_REGEX_DURACAO = r"^\s*(?:(?P<dias>\d+) days?,\s*)?(?P<h>\d+):(?P<m>\d{1,2})(?::(?P<s>\d{1,2}(?:[.,]\d+)?))?\s*$"
 
-        except Exception as e:
-            logs.append(f"❌ Erro lendo {os.path.basename(arq)}: {e}")
-    return (pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame(columns=COLS_ESPERADAS+["PRIMEIRO_NOME","DATA_ARQUIVO","ARQUIVO"])), logs
+def _preenchidas(texto):
+    return texto.notna() & (texto.str.strip() != "")
 
-def salvar_no_excel(df: pd.DataFrame):
-    # Cria pasta de backup se não existir
-    backup_dir = os.path.join(BASE_DIR, "backup")
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
-        print(f"📁 Pasta de backup criada: {backup_dir}")
-    
-    # Faz backup da planilha mãe antes de apagar (se existir)
-    if os.path.exists(MAE_PATH):
-        try:
-            backup_path = os.path.join(backup_dir, "PLANILHA_MAE_BACKUP.xlsx")
-            
-            # Se já existe um backup, remove ele (mantém sempre só o último)
-            if os.path.exists(backup_path):
-                os.remove(backup_path)
-                print(f"🔄 Backup anterior removido")
-            
-            # Cria novo backup
-            import shutil
-            shutil.copy2(MAE_PATH, backup_path)
-            print(f"💾 Backup criado: PLANILHA_MAE_BACKUP.xlsx")
-            
-            # Só remove o arquivo original após backup bem-sucedido
-            os.remove(MAE_PATH)
-            print(f"🗑️ Arquivo anterior removido: {os.path.basename(MAE_PATH)}")
-            
-        except Exception as e:
-            print(f"⚠️ Erro ao fazer backup: {e}")
-            print(f"⚠️ Continuando sem remover arquivo anterior...")
-    
-    # Cria ou abre a Mãe
-    if os.path.exists(MAE_PATH):
-        wb = load_workbook(MAE_PATH)
-    else:
-        from openpyxl import Workbook
-        wb = Workbook()
-        # Remove a aba padrão "Sheet" que vem com workbooks novos
-        if "Sheet" in wb.sheetnames:
-            wb.remove(wb["Sheet"])
+def _numero(texto):
+    """Texto -> float, aceitando vírgula decimal ("0,5")"""
+    import pandas as pd
+    return pd.to_numeric(texto.str.strip().str.replace(",", ".", regex=False), errors="coerce")
 
-    # 1) COMPILE GERAL
-    aba_compilado = "COMPILE GERAL"
-    if aba_compilado in wb.sheetnames:
-        ws = wb[aba_compilado]
-        wb.remove(ws)
-    ws = wb.create_sheet(aba_compilado)
-
-    # cabeçalho
-    cols = df.columns.tolist()
-    ws.append(cols)
-    
-    # Adiciona dados preservando quebras de linha
-    for row_idx, (_, row) in enumerate(df.iterrows(), start=2):
-        for col_idx, value in enumerate(row, start=1):
-            cell = ws.cell(row=row_idx, column=col_idx)
-            if pd.notna(value) and value != '':
-                # Preserva quebras de linha e formatação especial
-                if isinstance(value, str):
-                    # Preserva quebras de linha originais do Excel
-                    cell.value = value
-                    # Se tem múltiplas linhas, aplica formatação especial
-                    if '\n' in str(value) or len(str(value).split()) > 5:
-                        cell.alignment = Alignment(wrap_text=True, vertical="top", horizontal="left")
-                    else:
-                        cell.alignment = Alignment(vertical="center", horizontal="left")
-                else:
-                    cell.value = value
-    
-    # Aplica formatação
-    aplicar_formatacao(ws, df)
+def segundos_de_duracao(texto):
+    """Série de texto -> total de segundos (float; NaN se vazio ou não reconhecido)"""
+    import pandas as pd
+    partes = texto.str.extract(_REGEX_DURACAO)
+    segundos = (partes["dias"].astype(float).fillna(0) * 86400 + partes["h"].astype(float) * 3600
+                + partes["m"].astype(float) * 60
+                + partes["s"].str.replace(",", ".", regex=False).astype(float).fillna(0))
+    restantes = segundos.isna() & _preenchidas(texto)
+    if restantes.any():
+        # Fração de dia (célula sem formato de hora), arredondada ao segundo
+        segundos[restantes] = (_numero(texto[restantes]) * 86400).round()
+        restantes = segundos.isna() & _preenchidas(texto)
+    if restantes.any():
+        # Data/hora perto da origem do Excel = duração; datas "de verdade" não são duração
+        desde_origem = (pd.to_datetime(texto[restantes], errors="coerce", format="ISO8601")
+                        - pd.Timestamp(ORIGEM_EXCEL)).dt.total_seconds()
+        segundos[restantes] = desde_origem.where(desde_origem < 366 * 86400)
+    return segundos
 
-    # 2) MÉTRICAS
-    aba_metricas = "MÉTRICAS"
-    if aba_metricas in wb.sheetnames:
-        wb.remove(wb[aba_metricas])
-    wsM = wb.create_sheet(aba_metricas)
-
-    # KPIs básicos
-    total = len(df)
-    finalizados = int((df["FINALIZAR"].astype(str).str.lower().isin(["sim","yes","true","1"])).sum()) if not df.empty else 0
-    tempo_total = pd.to_numeric(df["TIME SPENT"], errors="coerce").fillna(0).sum() if "TIME SPENT" in df else 0
-    tempo_medio = pd.to_numeric(df["TIME SPENT"], errors="coerce").fillna(0).mean() if total else 0
-
-    # Estilo para a aba de métricas
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="ed7d31", end_color="ed7d31", fill_type="solid")
-    border_laranja = Border(
-        left=Side(style='thin', color='ed7d31'), 
-        right=Side(style='thin', color='ed7d31'), 
-        top=Side(style='thin', color='ed7d31'), 
-        bottom=Side(style='thin', color='ed7d31')
-    )
-    center_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Cabeçalho principal das métricas
-    wsM["A1"] = "📊 MÉTRICAS GERAIS"
-    wsM.merge_cells('A1:B1')
-    wsM["A1"].font = Font(bold=True, size=14, color="FFFFFF")
-    wsM["A1"].fill = header_fill
-    wsM["A1"].alignment = center_alignment
-    wsM["A1"].border = border_laranja
+def datas_de_texto(texto):
+    """Série de texto -> datetime64 (NaT se vazio ou não reconhecido)"""
+    import pandas as pd
+    datas = pd.to_datetime(texto, errors="coerce", format="ISO8601")
+    restantes = datas.isna() & _preenchidas(texto)
+    for formato in FORMATOS_DATA_DIGITADA:
+        if not restantes.any():
+            break
+        datas[restantes] = pd.to_datetime(texto[restantes].str.strip(), errors="coerce", format=formato)
+        restantes = datas.isna() & _preenchidas(texto)
+    if restantes.any():
+        # Número de série do Excel (célula de data sem formato de data)
+        serie = _numero(texto[restantes])
+        datas[restantes] = pd.to_datetime(serie.where(serie > 0), unit="D", origin=ORIGEM_EXCEL,
+                                          errors="coerce").dt.round("s")
+    return datas
 
-    # Cabeçalhos das colunas
-    wsM["A3"] = "Indicador"
-    wsM["B3"] = "Valor"
-    wsM["A3"].font = header_font
-    wsM["B3"].font = header_font
-    wsM["A3"].fill = header_fill
-    wsM["B3"].fill = header_fill
-    wsM["A3"].alignment = center_alignment
-    wsM["B3"].alignment = center_alignment
-    wsM["A3"].border = border_laranja
-    wsM["B3"].border = border_laranja
-    
-    # Dados das métricas
-    metricas_dados = [
-        ["📈 Atendimentos Totais", total],
-        ["✅ Finalizados", finalizados],
-        ["📊 % Finalizados", f"{(finalizados/total*100 if total else 0):.1f}%"],
-        ["⏱️ Tempo Total (minutos)", f"{tempo_total:.1f}"],
-        ["⏰ Tempo Médio (minutos)", f"{tempo_medio:.1f}"]
-    ]
-    
-    row = 4
-    for indicador, valor in metricas_dados:
-        wsM[f"A{row}"] = indicador
-        wsM[f"B{row}"] = valor
-        wsM[f"A{row}"].border = border_laranja
-        wsM[f"B{row}"].border = border_laranja
-        wsM[f"A{row}"].alignment = Alignment(horizontal="left", vertical="center")
-        wsM[f"B{row}"].alignment = center_alignment
-        row += 1
+def converter_datas_e_duracoes(df):
+    """
+    Converte no lugar as colunas de data (datetime64) e de duração (timedelta) de um frame de
+    texto. Devolve Counter coluna -> valores preenchidos que não foram reconhecidos; os textos de
+    FINALIZADO_EM_TEXTO em FINALIZAR ficam à parte, em "FINALIZAR_EM_TEXTO".
+    """
+    import pandas as pd
+    nao_reconhecidos = Counter()
+    for col in COLUNAS_DATA + COLUNAS_TEMPO:
+        texto = df[col]
+        if col in COLUNAS_DATA:
+            convertido = datas_de_texto(texto)
+        else:
+            convertido = pd.to_timedelta(segundos_de_duracao(texto), unit="s")
+        falhas = convertido.isna() & _preenchidas(texto)
+        if col == "FINALIZAR":
+            marcados = falhas & texto.str.strip().str.lower().isin(FINALIZADO_EM_TEXTO)
+            if marcados.any():
+                nao_reconhecidos["FINALIZAR_EM_TEXTO"] = int(marcados.sum())
+                falhas &= ~marcados
+        if falhas.any():
+            nao_reconhecidos[col] = int(falhas.sum())
+        df[col] = convertido
+    return nao_reconhecidos
 
-    # Tabelas pivôs estilizadas
-    def write_pivot_styled(title, series_counts, start_row, col1_name="Item", col2_name="Quantidade"):
-        # Título da tabela
-        wsM[f"A{start_row}"] = f"📋 {title}"
-        wsM.merge_cells(f'A{start_row}:B{start_row}')
-        wsM[f"A{start_row}"].font = Font(bold=True, size=12, color="FFFFFF")
-        wsM[f"A{start_row}"].fill = header_fill
-        wsM[f"A{start_row}"].alignment = center_alignment
-        wsM[f"A{start_row}"].border = border_laranja
-        
-        # Cabeçalhos da tabela com nomes específicos
-        wsM[f"A{start_row+1}"] = col1_name
-        wsM[f"B{start_row+1}"] = col2_name
-        wsM[f"A{start_row+1}"].font = header_font
-        wsM[f"B{start_row+1}"].font = header_font
-        wsM[f"A{start_row+1}"].fill = header_fill
-        wsM[f"B{start_row+1}"].fill = header_fill
-        wsM[f"A{start_row+1}"].alignment = center_alignment
-        wsM[f"B{start_row+1}"].alignment = center_alignment
-        wsM[f"A{start_row+1}"].border = border_laranja
-        wsM[f"B{start_row+1}"].border = border_laranja
-        
-        # Dados da tabela
-        r = start_row + 2
-        for k, v in series_counts.items():
-            wsM[f"A{r}"] = str(k)
-            wsM[f"B{r}"] = int(v)
-            wsM[f"A{r}"].border = border_laranja
-            wsM[f"B{r}"].border = border_laranja
-            wsM[f"A{r}"].alignment = Alignment(horizontal="left", vertical="center")
-            wsM[f"B{r}"].alignment = center_alignment
-            r += 1
-        return r + 1  # Espaço extra após a tabela
+# ===== LEITURA DAS FILHAS =====
+# Leitura em streaming (openpyxl read-only): confere o cabeçalho antes de ler o corpo, lê só as
+# colunas necessárias e para depois de LINHAS_VAZIAS_CORTE linhas vazias seguidas - os modelos
+# .xlsm dos operadores têm milhares de linhas formatadas mas vazias no final.
+LINHAS_VAZIAS_CORTE = 200  # 0 = lê até a última linha
 
-    if not df.empty:
-        por_setor = df["SETOR"].astype(str).value_counts()
-        next_row = write_pivot_styled("ATENDIMENTOS POR SETOR", por_setor, 10, "Setor", "Qtd. Atendimentos")
-        por_resp = df["PRIMEIRO_NOME"].astype(str).value_counts()
-        write_pivot_styled("ATENDIMENTOS POR RESPONSÁVEL", por_resp, next_row + 1, "Responsável", "Qtd. Atendimentos")
-    
-    # Ajuste manual das colunas na aba de métricas
-    wsM.column_dimensions['A'].width = 35
-    wsM.column_dimensions['B'].width = 20
+def _texto_celula(cell):
+    """Converte uma célula para texto como o pd.read_excel(dtype=str); vazio/erro viram None"""
+    valor = cell.value
+    if valor is None or valor == "" or cell.data_type == "e":
+        return None
+    if isinstance(valor, str):
+        return valor
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
 
-    # 3) Abas por pessoa
-    if not df.empty:
-        for nome in sorted(df["PRIMEIRO_NOME"].dropna().astype(str).unique()):
-            sheet_name = nome.title()
-            if sheet_name in wb.sheetnames:
-                wb.remove(wb[sheet_name])
-            wsP = wb.create_sheet(sheet_name)
-            sub = df[df["PRIMEIRO_NOME"] == nome][COLS_ESPERADAS + ["DATA_ARQUIVO","ARQUIVO"]]
-            
-            # Remove as colunas extras das abas individuais para ficar igual ao formato mostrado
-            sub_clean = df[df["PRIMEIRO_NOME"] == nome][COLS_ESPERADAS]
-            
-            wsP.append(sub_clean.columns.tolist())
-            
-            # Adiciona dados preservando quebras de linha nas abas individuais
-            for row_idx, (_, row) in enumerate(sub_clean.iterrows(), start=2):
-                for col_idx, value in enumerate(row, start=1):
-                    cell = wsP.cell(row=row_idx, column=col_idx)
-                    if pd.notna(value) and value != '':
-                        # Preserva quebras de linha e formatação especial nas abas individuais
-                        if isinstance(value, str):
-                            cell.value = value
-                            # Se tem múltiplas linhas, aplica formatação especial
-                            if '\n' in str(value) or len(str(value).split()) > 5:
-                                cell.alignment = Alignment(wrap_text=True, vertical="top", horizontal="left")
-                            else:
-                                cell.alignment = Alignment(vertical="center", horizontal="left")
-                        else:
-                            cell.value = value
-            
-            # Aplica formatação na aba individual
-            aplicar_formatacao(wsP, sub_clean)
+def ler_planilha_filha(arq, corte_vazias=None):
+    """
+    Lê a primeira aba de uma filha em modo read-only.
+    Retorna (df, total_linhas, faltantes) - se faltarem colunas, df é None e o corpo não é lido.
+    """
+    import pandas as pd
+    from openpyxl import load_workbook
+    if corte_vazias is None:
+        corte_vazias = LINHAS_VAZIAS_CORTE
+    wb = load_workbook(arq, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        dimensao = ws.max_row  # linhas declaradas no arquivo (pode incluir linhas só formatadas)
+        ws.reset_dimensions()  # a dimensão salva pode estar errada; lê até o fim real
+
+        # 1) Cabeçalho: rejeita o arquivo sem ler o corpo
+        cabecalho = next(ws.iter_rows(min_row=1, max_row=1), ())
+        posicoes = {}
+        for idx, cell in enumerate(cabecalho):
+            # Remove espaços extras dos nomes das colunas
+            nome = str(cell.value).strip() if cell.value is not None else ""
+            posicoes.setdefault(nome, idx)
+        faltantes = [c for c in COLS_ESPERADAS if c not in posicoes]
+        if faltantes:
+            return None, 0, faltantes
+
+        # 2) Corpo: só o intervalo de colunas necessárias, até a sequência de linhas vazias
+        idxs = [posicoes[c] for c in COLS_ESPERADAS]
+        primeira, ultima = min(idxs), max(idxs)
+        rel = [i - primeira for i in idxs]
+        dados = [[] for _ in COLS_ESPERADAS]
+        lidas = ultima_com_dados = vazias_seguidas = 0
+        cortou = False
+        for row in ws.iter_rows(min_row=2, min_col=primeira + 1, max_col=ultima + 1):
+            valores = [_texto_celula(cell) for cell in row]
+            lidas += 1
+            if any(v is not None for v in valores):
+                ultima_com_dados = lidas
+                vazias_seguidas = 0
+            else:
+                vazias_seguidas += 1
+                if corte_vazias and vazias_seguidas >= corte_vazias:
+                    cortou = True
+                    break
+            for lista, i in zip(dados, rel):
+                lista.append(valores[i] if i < len(valores) else None)
+    finally:
+        wb.close()  # read-only mantém o arquivo aberto até fechar
+
+    # Linhas vazias do fim não contam (igual ao pd.read_excel); se cortou, usa o total declarado
+    total = ultima_com_dados
+    if cortou and dimensao:
+        total = max(total, dimensao - 1)
+    df = pd.DataFrame({c: coluna_tipada(c, lista[:ultima_com_dados]) for c, lista in zip(COLS_ESPERADAS, dados)})
+    return df, total, []
 
-    # Deixa a primeira aba como “COMPILE GERAL”
-    wb.move_sheet(wb[aba_compilado], offset=-wb.index(wb[aba_compilado]))
-    wb.save(MAE_PATH)
+def coluna_tipada(col, valores):
+    """
+    Série a partir dos textos lidos (None = vazio): categoria ou texto. Datas e durações continuam
+    texto aqui e são convertidas depois da filtragem (converter_datas_e_duracoes).
+    """
+    import pandas as pd
+    texto = pd.Series(valores, dtype="str")
+    # categorias sempre de texto (mesmo numa coluna toda vazia), para a união entre filhas
+    return texto.astype("category") if col in COLUNAS_CATEGORIA else texto
+
+def _categoria_constante(valor, n):
+    """Coluna categórica com o mesmo valor em n linhas (PRIMEIRO_NOME/ARQUIVO de uma filha)"""
+    import pandas as pd
+    return pd.Categorical.from_codes([0] * n, categories=pd.Index([valor], dtype="str"))
+
+def concatenar_filhas(dfs):
+    """
+    pd.concat das filhas mantendo as categorias: cada filha tem as suas e o concat comum
+    devolveria texto - union_categoricals junta só as categorias e os códigos.
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+    colunas = {}
+    for col in dfs[0].columns:
+        partes = [d[col] for d in dfs]
+        if isinstance(partes[0].dtype, pd.CategoricalDtype):
+            colunas[col] = union_categoricals(partes)
+        else:
+            colunas[col] = pd.concat(partes, ignore_index=True)
+    return pd.DataFrame(colunas)
 
-def main():
+def _ler_arquivo_filho(arq, medida=None):
+    """
+    Lê e filtra uma planilha filha.
+    Retorna (df_filtrado, log, cacheavel) - df_filtrado é None quando o arquivo é rejeitado.
+    medida: dict opcional que recebe as linhas lidas da planilha (instrumentação).
+    """
+    import pandas as pd
+    if not validar_nome(arq):
+        return None, f"❌ Nome inválido: {os.path.basename(arq)} (padrão: NOME_SOBRENOME - ATENDIMENTOS - DD-MM-AA.xlsx)", True
     try:
-        print("🚀 Iniciando atualização das planilhas...")
-        
-        # Verifica se o Excel está aberto e pede ação
-        status_excel = fechar_excel()
-        
-        # Se usuário cancelou, encerra
-        if status_excel == 'cancelado':
-            print("\n❌ Operação cancelada.")
-            if getattr(sys, 'frozen', False):
-                input("Pressione ENTER para fechar...")
-            return
-        
-        # Verifica se os diretórios existem
-        if not os.path.exists(BASE_DIR):
-            raise FileNotFoundError(f"Diretório base não encontrado: {BASE_DIR}")
+        # Lê Excel preservando formatação e quebras de linha (células vazias já vêm como NaN)
+        df, total, faltantes = ler_planilha_filha(arq)
+        if medida is not None:
+            medida["linhas_entrada"] = total
+        if faltantes:
+            return None, f"❌ Colunas faltando em {os.path.basename(arq)}: {faltantes}", True
         
-        if not os.path.exists(FILHAS_DIR):
-            raise FileNotFoundError(f"Diretório de filhas não encontrado: {FILHAS_DIR}")
-        
-        print(f"📁 Procurando arquivos em: {FILHAS_DIR}")
+        # FILTRAR LINHAS VAZIAS - Remove linhas onde todas as colunas principais estão vazias
+        colunas_principais = ["RESPONSÁVEL", "OPERAÇÃO", "CLIENTE", "SOLICITAÇÃO"]
         
-        escrever_status("⏳ Atualizando…")
-        df, logs = ler_filhos()
+        # Verifica se pelo menos uma coluna principal tem dados válidos
+        mask_nao_vazio = False
+        for col in colunas_principais:
+            if col in df.columns:
+                # Verifica se a coluna tem valores não-nulos e não-vazios (preservando quebras de linha)
+                mask_col = df[col].notna() & (df[col] != '') & (df[col].astype(str).str.strip() != "")
+                if mask_nao_vazio is False:
+                    mask_nao_vazio = mask_col
+                else:
+                    mask_nao_vazio = mask_nao_vazio | mask_col
         
-        print(f"📊 Encontrados {len(df)} registros para consolidar")
-        for log in logs:
-            print(log)
+        # Se não encontrou nenhuma linha válida, usar máscara padrão
+        if mask_nao_vazio is False:
+            mask_nao_vazio = df.index >= 0  # Todas as linhas
         
-        if df.empty:
-            print("⚠️ Nenhum dado encontrado para consolidar!")
+        # Só copia quando há linhas a descartar; copy(deep=False) solta o vínculo com df sem copiar dados
+        df_filtrado = df if mask_nao_vazio.all() else df[mask_nao_vazio].copy(deep=False)
         
-        # Se escolheu modo navegador, salva temporário e pula salvamento normal
-        if status_excel == 'navegador':
-            abrir_no_navegador(df)
-            
-            # Salvar log em arquivo
-            log_path = os.path.join(BASE_DIR, "log_compilacao.txt")
-            with open(log_path, "w", encoding="utf-8") as f:
-                f.write(f"Execução em {datetime.now()} (MODO TEMPORÁRIO - Excel aberto)\n")
-                f.write(f"Total de registros: {len(df)}\n")
-                f.write("-" * 50 + "\n")
-                f.write("\n".join(logs))
-            
-            print(f"\n📝 Log salvo em: {log_path}")
-        else:
-            # Modo normal - salva no arquivo principal
-            salvar_no_excel(df)
-            escrever_status(f"✅ Atualizado com sucesso — {len(df)} linhas consolidadas.")
-            
-            # Salvar log em arquivo
-            log_path = os.path.join(BASE_DIR, "log_compilacao.txt")
-            with open(log_path, "w", encoding="utf-8") as f:
-                f.write(f"Execução em {datetime.now()}\n")
-                f.write(f"Total de registros: {len(df)}\n")
-                f.write("-" * 50 + "\n")
-                f.write("\n".join(logs))
-            
-            print(f"✅ Processo concluído! Arquivo salvo em: {MAE_PATH}")
-            print(f"📝 Log salvo em: {log_path}")
-            
-            # Abre a planilha final (com opção de escolha)
-            abrir_planilha_final()
+        if df_filtrado.empty:
+            return None, f"⚠️ Arquivo sem dados válidos: {os.path.basename(arq)}", True
         
-        # Pausa para ver o resultado (apenas quando executado como exe)
-        if getattr(sys, 'frozen', False):
-            print("\n✅ Processamento finalizado!")
-            input("Pressione ENTER para fechar...")
-            
+        nao_reconhecidos = converter_datas_e_duracoes(df_filtrado)
+        primeiro, data_arq = extrair_primeiro_nome(arq)
+        df_filtrado["PRIMEIRO_NOME"] = _categoria_constante(primeiro, len(df_filtrado))
+        df_filtrado["DATA_ARQUIVO"]  = pd.to_datetime(data_arq) if data_arq else pd.NaT
+        df_filtrado["ARQUIVO"]       = _categoria_constante(os.path.basename(arq), len(df_filtrado))
+        log = f"✅ OK: {os.path.basename(arq)} ({len(df_filtrado)} linhas úteis de {total} total)"
+        em_texto = nao_reconhecidos.pop("FINALIZAR_EM_TEXTO", 0)
+        if nao_reconhecidos:
+            detalhes = ", ".join(f"{col}: {n}" for col, n in nao_reconhecidos.items())
+            log += f" — {sum(nao_reconhecidos.values())} data(s)/duração(ões) não reconhecida(s) ({detalhes})"
+        if em_texto:
+            log += f" — {em_texto} {AVISO_FINALIZADO_EM_TEXTO}"
+        return df_filtrado, log, True
+
     except Exception as e:
-        error_msg = f"❌ Erro na atualização: {e}"
-        print(error_msg)
-        escrever_status(error_msg)
-        
-        # Salva erro no log
-        try:
-            log_path = os.path.join(BASE_DIR, "log_compilacao.txt")
-            with open(log_path, "w", encoding="utf-8") as f:
-                f.write(f"ERRO em {datetime.now()}\n")
-                f.write(f"{error_msg}\n")
-                f.write(f"Detalhes: {str(e)}")
+        # Erros de leitura (ex.: arquivo bloqueado) não vão para o cache - tenta de novo na próxima
+        return None, f"❌ Erro lendo {os.path.basename(arq)}: {e}", False
+
+# ===== CACHE DAS FILHAS =====
+# Cada filha já lida fica guardada em CACHE_DIR (DataFrame filtrado em pickle + linha de log),
+# indexada por nome, tamanho, mtime e hash do conteúdo. Só arquivos novos/alterados são relidos.
+CACHE_DIR    = os.path.join(BASE_DIR, "cache_filhas")
+CACHE_INDICE = "indice.json"
+CACHE_VERSAO = 6  # incrementar quando mudar a leitura/filtragem das filhas
+
+def hash_arquivo(caminho, bloco=1024 * 1024):
+    """SHA-1 do conteúdo do arquivo (lido em blocos)"""
+    h = hashlib.sha1()
+    with open(caminho, "rb") as f:
+        for parte in iter(lambda: f.read(bloco), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+def carregar_indice_cache(cache_dir):
+    caminho = os.path.join(cache_dir, CACHE_INDICE)
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            indice = json.load(f)
+        if indice.get("versao") == CACHE_VERSAO:
+            return indice
+    except Exception:
+        pass  # cache ausente ou corrompido: começa do zero
+    return {"versao": CACHE_VERSAO, "arquivos": {}}
+
+def salvar_indice_cache(cache_dir, indice):
+    caminho = os.path.join(cache_dir, CACHE_INDICE)
+    temp = caminho + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, indent=1)
+    os.replace(temp, caminho)
+
+def fechar_indice_cache(cache_dir, indice, entradas):
+    """Salva o índice só com as entradas atuais: arquivos removidos de filhas/ têm o pickle apagado"""
+    pickles_vivos = {e["pickle"] for e in entradas.values() if e.get("pickle")}
+    for entrada in indice["arquivos"].values():
+        pickle_antigo = entrada.get("pickle")
+        if pickle_antigo and pickle_antigo not in pickles_vivos:
+            try:
+                os.remove(os.path.join(cache_dir, pickle_antigo))
+            except OSError:
+                pass
+    indice["arquivos"] = entradas
+    try:
+        salvar_indice_cache(cache_dir, indice)
+    except Exception as e:
+        print(f"⚠️ Não foi possível salvar o índice do cache: {e}")
+
+def _buscar_no_cache(cache_dir, entrada, arq, st):
+    """
+    Devolve (df, log, metricas) do cache se o arquivo não mudou, senão None.
+    Tamanho+mtime iguais bastam; se só o mtime mudou, confere o hash do conteúdo.
+    """
+    import pandas as pd
+    if not entrada or entrada.get("tamanho") != st.st_size:
+        return None
+    if entrada.get("mtime_ns") != st.st_mtime_ns:
+        if entrada.get("sha1") != hash_arquivo(arq):
+            return None
+        entrada["mtime_ns"] = st.st_mtime_ns  # mesmo conteúdo (arquivo copiado/tocado)
+    df = None
+    if entrada.get("pickle"):
+        try:
+            df = pd.read_pickle(os.path.join(cache_dir, entrada["pickle"]))
+        except Exception:
+            return None
+    if df is None:
+        return None, entrada["log"], None
+    if not entrada.get("metricas") or "por_dia" not in entrada["metricas"]:
+        entrada["metricas"] = MetricasParciais.do_dataframe(df).para_dict()  # entrada de versão anterior
+    return df, entrada["log"], MetricasParciais.de_dict(entrada["metricas"])
+
+def _gravar_no_cache(cache_dir, arq, st, df, log, metricas):
+    """Grava o resultado da leitura de uma filha e devolve a entrada do índice"""
+    sha1 = hash_arquivo(arq)
+    entrada = {"tamanho": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": sha1, "pickle": None, "log": log,
+               "metricas": metricas.para_dict() if metricas is not None else None}
+    if df is not None:
+        # O nome entra na chave: cópias idênticas com outro nome têm PRIMEIRO_NOME/ARQUIVO diferentes
+        nome_pickle = hashlib.sha1(f"{os.path.basename(arq)}|{sha1}".encode("utf-8")).hexdigest() + ".pkl"
+        temp = os.path.join(cache_dir, nome_pickle + ".tmp")
+        df.to_pickle(temp)
+        os.replace(temp, os.path.join(cache_dir, nome_pickle))
+        entrada["pickle"] = nome_pickle
+    return entrada
+
+def _ler_e_medir(arq, memoria=False):
+    """_ler_arquivo_filho com tempo, linhas e pico de memória (também roda nos processos do pool)"""
+    medida = {"arquivo": os.path.basename(arq)}
+    if memoria:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        INSTRUMENTACAO.marcar_pico()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    inicio = time.perf_counter()
+    resultado = _ler_arquivo_filho(arq, medida)
+    medida["segundos"] = round(time.perf_counter() - inicio, 4)
+    medida["linhas_saida"] = len(resultado[0]) if resultado[0] is not None else 0
+    if memoria:
+        medida["memoria_extra_mb"] = round((tracemalloc.get_traced_memory()[1] - base) / 2**20, 2)
+    return resultado, medida
+
+def _ler_varios_filhos(arquivos, workers=1, pool=None):
+    """
+    Executa _ler_arquivo_filho para cada arquivo, na mesma ordem da lista.
+    Com workers > 1 os arquivos são distribuídos entre processos (cada leitura usa um núcleo);
+    pool: ProcessPoolExecutor já aberto pelo chamador, reaproveitado entre chamadas.
+    """
+    ler = _ler_arquivo_filho
+    if INSTRUMENTACAO.ativa:
+        ler = functools.partial(_ler_e_medir, memoria=INSTRUMENTACAO.memoria)
+    if pool is not None:
+        resultados = list(pool.map(ler, arquivos))
+    elif workers <= 1 or len(arquivos) <= 1:
+        resultados = [ler(arq) for arq in arquivos]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(arquivos))) as pool:
+            # map devolve os resultados na ordem de entrada, independente de qual termina primeiro
+            resultados = list(pool.map(ler, arquivos))
+    if INSTRUMENTACAO.ativa:
+        for _, medida in resultados:
+            INSTRUMENTACAO.registrar_arquivo(medida)
+        resultados = [resultado for resultado, _ in resultados]
+    return resultados
+
+def listar_filhas(filhas_dir):
+    """Planilhas filhas (.xlsx/.xlsm) da pasta, em ordem de nome"""
+    return sorted(glob.glob(os.path.join(filhas_dir, "*.xlsx")) +
+                  glob.glob(os.path.join(filhas_dir, "*.xlsm")))
+
+def ler_filhos(usar_cache=True, reconstruir_cache=False, workers=1, filhas_dir=None, cache_dir=None,
+               chave_duplicados=CHAVE_DUPLICADOS):
+    """Lê e consolida as filhas; devolve (df, logs)"""
+    df, logs, _ = ler_filhos_com_metricas(usar_cache, reconstruir_cache, workers, filhas_dir=filhas_dir,
+                                          cache_dir=cache_dir, chave_duplicados=chave_duplicados)
+    return df, logs
+
+def ler_filhos_com_metricas(usar_cache=True, reconstruir_cache=False, workers=1, memoria=None,
+                            filhas_dir=None, cache_dir=None, chave_duplicados=CHAVE_DUPLICADOS):
+    """
+    Como ler_filhos, mas devolve também as MetricasParciais combinadas de todas as filhas
+    (os agregados de cada filha vêm do cache; só as relidas são recalculadas).
+    memoria: dict mantido pelo chamador entre execuções (modo observação) com os resultados
+    já carregados - arquivos inalterados nem passam pelo cache em disco.
+    filhas_dir/cache_dir: padrão FILHAS_DIR/CACHE_DIR.
+    chave_duplicados: colunas da remoção de atendimentos repetidos entre filhas (None desliga).
+    """
+    import pandas as pd
+    cache_dir = cache_dir or CACHE_DIR
+    arquivos = listar_filhas(filhas_dir or FILHAS_DIR)
+    logs = []
+    dfs = []
+
+    if usar_cache:
+        if reconstruir_cache and os.path.exists(cache_dir):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            print("🧹 Cache das filhas apagado, todas serão relidas")
+        os.makedirs(cache_dir, exist_ok=True)
+        indice = carregar_indice_cache(cache_dir)
+        entradas_antigas = indice["arquivos"]
+        entradas = {}
+
+    # 1) Separa o que já está no cache do que precisa ser lido
+    resultados = {}   # arq -> (df_filtrado, log, metricas)
+    pendentes = []
+    stats = {}
+    with INSTRUMENTACAO.etapa("cache") as etapa:
+        for arq in arquivos:
+            nome = os.path.basename(arq)
+            if memoria is not None:
+                try:
+                    st = stats[arq] = os.stat(arq)
+                except OSError:
+                    st = None
+                em_memoria = memoria.get(nome)
+                if st is not None and em_memoria and em_memoria[0] == (st.st_size, st.st_mtime_ns):
+                    resultados[arq] = em_memoria[1]
+                    if usar_cache and nome in entradas_antigas:
+                        entradas[nome] = entradas_antigas[nome]
+                    continue
+            if usar_cache:
+                try:
+                    st = stats[arq] = os.stat(arq)
+                    em_cache = _buscar_no_cache(cache_dir, entradas_antigas.get(nome), arq, st)
+                except OSError:
+                    em_cache = None
+                if em_cache is not None:
+                    resultados[arq] = em_cache
+                    entradas[nome] = entradas_antigas[nome]
+                    continue
+            pendentes.append(arq)
+        etapa.linhas_saida = sum(len(r[0]) for r in resultados.values() if r[0] is not None)
+
+    # 2) Lê os pendentes (em paralelo se workers > 1)
+    with INSTRUMENTACAO.etapa("leitura") as etapa:
+        lidos = _ler_varios_filhos(pendentes, workers)
+        etapa.linhas_entrada = sum(m.get("linhas_entrada") or 0 for m in INSTRUMENTACAO.arquivos)
+        etapa.linhas_saida = sum(len(r[0]) for r in lidos if r[0] is not None)
+    nao_cacheaveis = set()
+    with INSTRUMENTACAO.etapa("metricas_e_cache"):
+        for arq, (df_filtrado, log, cacheavel) in zip(pendentes, lidos):
+            metricas = MetricasParciais.do_dataframe(df_filtrado) if df_filtrado is not None else None
+            resultados[arq] = (df_filtrado, log, metricas)
+            if not cacheavel:
+                nao_cacheaveis.add(arq)
+            if usar_cache and cacheavel and arq in stats:
+                nome = os.path.basename(arq)
+                try:
+                    entradas[nome] = _gravar_no_cache(cache_dir, arq, stats[arq], df_filtrado, log, metricas)
+                except Exception as e:
+                    print(f"⚠️ Não foi possível gravar cache de {nome}: {e}")
+
+    # 3) Monta o resultado na ordem original dos arquivos
+    parciais = []
+    for arq in arquivos:
+        df_filtrado, log, metricas = resultados[arq]
+        if df_filtrado is not None:
+            dfs.append(df_filtrado)
+            parciais.append(metricas)
+        logs.append(log)
+
+    if memoria is not None:
+        # Guarda só os arquivos atuais (removidos saem) e nunca erros de leitura
+        memoria.clear()
+        for arq in arquivos:
+            if arq in stats and arq not in nao_cacheaveis:
+                memoria[os.path.basename(arq)] = ((stats[arq].st_size, stats[arq].st_mtime_ns), resultados[arq])
+
+    if usar_cache:
+        fechar_indice_cache(cache_dir, indice, entradas)
+        print(f"♻️ Cache: {len(arquivos) - len(pendentes)} arquivo(s) reaproveitado(s), {len(pendentes)} lido(s) do disco")
+
+    with INSTRUMENTACAO.etapa("concat", sum(len(d) for d in dfs)) as etapa:
+        df = concatenar_filhas(dfs) if dfs else pd.DataFrame(columns=COLUNAS_CONSOLIDADO)
+        etapa.linhas_saida = len(df)
+    metricas = combinar_metricas(parciais)
+
+    if chave_duplicados:
+        with INSTRUMENTACAO.etapa("duplicados", len(df)) as etapa:
+            remover = linhas_repetidas(df, chave_duplicados)
+            if remover.any():
+                # Os agregados de cada filha contavam os repetidos: só as filhas que perderam linhas
+                # são corrigidas (df de cada uma está na mesma ordem do consolidado)
+                inicio = 0
+                for i, df_filha in enumerate(dfs):
+                    fim = inicio + len(df_filha)
+                    parciais[i] = metricas_sem_repetidas(parciais[i], df_filha, remover[inicio:fim])
+                    inicio = fim
+                metricas = combinar_metricas(parciais)
+                removidos = Counter(df["ARQUIVO"].to_numpy()[remover].tolist())
+                df = df[~remover].reset_index(drop=True)
+                logs = _anotar_repetidos(arquivos, logs, removidos, chave_duplicados)
+            etapa.linhas_saida = len(df)
+    return df, logs, metricas
+
+def _anotar_repetidos(arquivos, logs, removidos, chave):
+    """Logs com as linhas repetidas removidas de cada filha (e o total na tela)"""
+    print(f"🔁 {sum(removidos.values())} atendimento(s) repetido(s) entre filhas removido(s) "
+          f"(chave: {', '.join(chave)})")
+    return [f"{log} — {removidos[nome]} repetido(s) de filha mais nova removido(s)" if removidos.get(nome) else log
+            for nome, log in zip(map(os.path.basename, arquivos), logs)]
+
+# ===== ATENDIMENTOS REPETIDOS ENTRE FILHAS =====
+# Operadores costumam criar a filha do dia copiando a do dia anterior: o mesmo atendimento
+# aparece em várias filhas. A chave (CHAVE_DUPLICADOS) vira um hash por linha, vetorizado.
+def remover_duplicados(df: "pd.DataFrame", chave=CHAVE_DUPLICADOS):
+    """
+    Mantém cada atendimento só na filha de DATA_ARQUIVO mais nova (empate: a última na ordem
+    dos arquivos). Repetições dentro da mesma filha e linhas com a chave incompleta ficam.
+    Devolve (df sem os repetidos, Counter de linhas removidas por ARQUIVO).
+    """
+    remover = linhas_repetidas(df, chave)
+    if not remover.any():
+        return df, Counter()
+    return df[~remover].reset_index(drop=True), Counter(df["ARQUIVO"].to_numpy()[remover].tolist())
+
+def linhas_repetidas(df: "pd.DataFrame", chave=CHAVE_DUPLICADOS):
+    """Máscara (array bool) das linhas de df que remover_duplicados tira"""
+    import numpy as np
+    import pandas as pd
+    if df.empty:
+        return np.zeros(len(df), dtype=bool)
+    faltando = [col for col in chave if col not in df.columns]
+    if faltando:
+        raise ValueError(f"Coluna(s) da chave de duplicados inexistente(s): {', '.join(faltando)}")
+    completas = df[chave].notna().all(axis=1).to_numpy()
+    candidatas = pd.DataFrame({
+        "hash": pd.util.hash_pandas_object(df.loc[completas, chave], index=False).to_numpy(),
+        "data": df["DATA_ARQUIVO"].to_numpy()[completas],
+        "arquivo": df["ARQUIVO"].to_numpy()[completas],
+    })
+    remover = completas.copy()
+    remover[completas] = _marcar_repetidas(candidatas)
+    return remover
+
+def metricas_sem_repetidas(metricas, df, remover):
+    """
+    MetricasParciais de uma filha (metricas: as de df inteiro) sem as linhas da máscara `remover`.
+    Calcula só do lado menor: desconta as removidas ou, se sobrou menos do que saiu (a filha de
+    ontem copiada quase inteira na de hoje), refaz das que ficaram - nunca do frame consolidado.
+    """
+    removidas = int(remover.sum())
+    if not removidas:
+        return metricas
+    if removidas <= len(df) - removidas:
+        return metricas - MetricasParciais.do_dataframe(df[remover])
+    return MetricasParciais.do_dataframe(df[~remover])
+
+def _marcar_repetidas(candidatas):
+    """
+    candidatas: hash da chave, DATA_ARQUIVO e arquivo de cada linha com a chave completa, na ordem
+    dos arquivos. Devolve array bool: True nas linhas cujo atendimento fica em outra filha.
+    """
+    import pandas as pd
+    # sort estável: nos empates de data a ordem dos arquivos decide (keep="last")
+    vencedoras = candidatas.sort_values("data", kind="stable").drop_duplicates("hash", keep="last")
+    vencedora = candidatas["hash"].map(pd.Series(vencedoras["arquivo"].to_numpy(), index=vencedoras["hash"].to_numpy()))
+    return (candidatas["arquivo"] != vencedora).to_numpy()
+
+# ===== MÉTRICAS =====
+# Agregados parciais associativos: cada filha gera os seus (guardados no cache) e o total é a
+# combinação deles - uma filha nova custa O(linhas dela), não O(histórico inteiro).
+# Os agregados por dia (data, setor, pessoa) entram na mesma conta; as abas por período somam
+# esses dias por semana ou mês, sem voltar às linhas.
+ABAS_PERIODO = {"MÉTRICAS SEMANAIS": "semana", "MÉTRICAS MENSAIS": "mes"}
+ABAS_METRICAS = ["MÉTRICAS", *ABAS_PERIODO]  # na ordem do arquivo, logo depois de COMPILE GERAL
+
+def indicadores_por_linha(df):
+    """Por atendimento: se foi finalizado e o TIME SPENT em minutos (0 quando vazio)"""
+    import pandas as pd
+    fim, gasto = df["FINALIZAR"], df["TIME SPENT"]
+    # Frame de texto montado fora da leitura: mesma conversão de converter_datas_e_duracoes
+    if not pd.api.types.is_datetime64_any_dtype(fim):
+        fim = datas_de_texto(fim)
+    if not pd.api.types.is_timedelta64_dtype(gasto):
+        gasto = pd.to_timedelta(segundos_de_duracao(gasto), unit="s")
+    # Finalizado = FINALIZAR com data/hora (o botão da filha grava o momento). Texto que não é data
+    # ("sim", "ok"...) não conta como finalizado; ver FINALIZADO_EM_TEXTO.
+    return fim.notna(), (gasto.dt.total_seconds() / 60).fillna(0)
+
+def dias_dos_atendimentos(df):
+    """Dia (à meia-noite) de cada atendimento: o de INICIAR ou, sem ele, o da filha (DATA_ARQUIVO)"""
+    import pandas as pd
+    dia = df["INICIAR"]
+    if not pd.api.types.is_datetime64_any_dtype(dia):  # frame de texto montado fora da leitura
+        dia = datas_de_texto(dia.astype(str))
+    if "DATA_ARQUIVO" in df:
+        dia = dia.fillna(pd.to_datetime(df["DATA_ARQUIVO"], errors="coerce"))
+    return dia.dt.normalize()
+
+def agregados_por_dia(df, finalizado, tempo):
+    """
+    {('AAAA-MM-DD', setor, pessoa): [atendimentos, finalizados, tempo em minutos]} das linhas de df;
+    setor ou pessoa vazios viram ''. Atendimentos sem data nenhuma ficam de fora (não cabem em período algum).
+    """
+    import pandas as pd
+    dia = dias_dos_atendimentos(df)
+    validos = dia.notna().to_numpy()
+    valores = pd.DataFrame({"finalizado": finalizado.to_numpy(dtype="int64"), "tempo": tempo.to_numpy()})[validos]
+    # Agrupa pelas próprias colunas (categorias): o texto só é montado uma vez por grupo
+    chaves = [dia.to_numpy()[validos], df["SETOR"].array[validos], df["PRIMEIRO_NOME"].array[validos]]
+    grupos = valores.groupby(chaves, observed=True, dropna=False, sort=False)
+    somas = grupos.agg(atendimentos=("finalizado", "size"), finalizados=("finalizado", "sum"), tempo=("tempo", "sum"))
+    texto = lambda valor: "" if pd.isna(valor) else str(valor)
+    return {(f"{d:%Y-%m-%d}", texto(setor), texto(pessoa)): [int(n), int(f), float(t)]
+            for (d, setor, pessoa), n, f, t in zip(somas.index, somas["atendimentos"].to_numpy(),
+                                                   somas["finalizados"].to_numpy(), somas["tempo"].to_numpy())}
+
+def _somar_em(destino, chave, valores):
+    """destino[chave] += valores (listas [atendimentos, finalizados, tempo]), sem alterar `valores`"""
+    atual = destino.get(chave)
+    if atual is None:
+        destino[chave] = list(valores)
+    else:
+        for i, valor in enumerate(valores):
+            atual[i] += valor
+
+def inicio_do_periodo(dia, periodo):
+    """Primeiro dia da semana (segunda-feira) ou do mês de 'AAAA-MM-DD'"""
+    d = date.fromisoformat(dia)
+    return d - timedelta(days=d.weekday()) if periodo == "semana" else d.replace(day=1)
+
+def rotulo_do_periodo(inicio, periodo):
+    if periodo == "semana":
+        return f"{inicio:%d/%m/%Y} a {inicio + timedelta(days=6):%d/%m/%Y}"
+    return f"{inicio:%m/%Y}"
+
+@dataclass
+class MetricasParciais:
+    """Contadores da aba MÉTRICAS para um conjunto de atendimentos (uma filha ou várias combinadas)"""
+    total: int = 0
+    finalizados: int = 0
+    tempo_soma: float = 0.0  # soma de TIME SPENT (minutos)
+    por_setor: Counter = field(default_factory=Counter)
+    por_pessoa: Counter = field(default_factory=Counter)
+    por_dia: dict = field(default_factory=dict)  # ver agregados_por_dia
+
+    @classmethod
+    def do_dataframe(cls, df):
+        if df.empty:
+            return cls()
+        finalizado, tempo = indicadores_por_linha(df)
+        return cls(
+            total=len(df),
+            finalizados=int(finalizado.sum()),
+            tempo_soma=float(tempo.sum()),
+            # sort=False mantém a ordem de aparição; a ordenação por quantidade fica para o final
+            por_setor=Counter(df["SETOR"].astype(str).value_counts(sort=False).to_dict()),
+            por_pessoa=Counter(df["PRIMEIRO_NOME"].astype(str).value_counts(sort=False).to_dict()),
+            por_dia=agregados_por_dia(df, finalizado, tempo),
+        )
+
+    def combinar(self, outra):
+        """Nova MetricasParciais com a soma das duas (operação associativa)"""
+        por_dia = {chave: list(valores) for chave, valores in self.por_dia.items()}
+        for chave, valores in outra.por_dia.items():
+            _somar_em(por_dia, chave, valores)
+        return MetricasParciais(
+            total=self.total + outra.total,
+            finalizados=self.finalizados + outra.finalizados,
+            tempo_soma=self.tempo_soma + outra.tempo_soma,
+            por_setor=self.por_setor + outra.por_setor,
+            por_pessoa=self.por_pessoa + outra.por_pessoa,
+            por_dia=por_dia,
+        )
+
+    __add__ = combinar
+
+    def descontar(self, outra):
+        """Nova MetricasParciais sem os atendimentos de `outra` (um subconjunto dos desta)"""
+        por_dia = {}
+        for chave, valores in self.por_dia.items():
+            menos = outra.por_dia.get(chave)
+            if menos is None:
+                por_dia[chave] = list(valores)
+            elif valores[0] > menos[0]:
+                por_dia[chave] = [valor - valor_menos for valor, valor_menos in zip(valores, menos)]
+        return MetricasParciais(
+            total=self.total - outra.total,
+            finalizados=self.finalizados - outra.finalizados,
+            tempo_soma=self.tempo_soma - outra.tempo_soma,
+            por_setor=self.por_setor - outra.por_setor,  # Counter: contagens zeradas saem
+            por_pessoa=self.por_pessoa - outra.por_pessoa,
+            por_dia=por_dia,
+        )
+
+    __sub__ = descontar
+
+    @property
+    def tempo_medio(self):
+        return self.tempo_soma / self.total if self.total else 0
+
+    def linhas_kpi(self):
+        """Linhas (indicador, valor) da tabela principal da aba MÉTRICAS"""
+        return [
+            ["📈 Atendimentos Totais", self.total],
+            ["✅ Finalizados", self.finalizados],
+            ["📊 % Finalizados", f"{(self.finalizados/self.total*100 if self.total else 0):.1f}%"],
+            ["⏱️ Tempo Total (minutos)", f"{self.tempo_soma:.1f}"],
+            ["⏰ Tempo Médio (minutos)", f"{self.tempo_medio:.1f}"]
+        ]
+
+    def setores(self):
+        """Atendimentos por setor, do maior para o menor"""
+        return _mais_frequentes(self.por_setor)
+
+    def pessoas(self):
+        """Atendimentos por responsável (PRIMEIRO_NOME), do maior para o menor"""
+        return _mais_frequentes(self.por_pessoa)
+
+    def por_periodo(self, periodo, dimensao):
+        """
+        Agregados por dia somados por semana ou mês ("semana"/"mes") e por "setor" ou "pessoa":
+        linhas [período, nome, atendimentos, finalizados, % finalizados, tempo total, tempo médio],
+        em ordem de período e, dentro dele, do maior para o menor. Setor vazio fica de fora.
+        """
+        posicao = 1 if dimensao == "setor" else 2
+        inicios, somas = {}, {}
+        for chave, valores in self.por_dia.items():
+            nome = chave[posicao]
+            if not nome:
+                continue
+            dia = chave[0]
+            if dia not in inicios:
+                inicios[dia] = inicio_do_periodo(dia, periodo)
+            _somar_em(somas, (inicios[dia], nome), valores)
+        linhas = []
+        ordem = lambda item: (item[0][0], -item[1][0], item[0][1])
+        for (inicio, nome), (total, finalizados, tempo) in sorted(somas.items(), key=ordem):
+            linhas.append([rotulo_do_periodo(inicio, periodo), nome, total, finalizados,
+                           f"{finalizados / total * 100:.1f}%", round(tempo, 1), round(tempo / total, 1)])
+        return linhas
+
+    def para_dict(self):
+        return {"total": self.total, "finalizados": self.finalizados, "tempo_soma": self.tempo_soma,
+                "por_setor": dict(self.por_setor), "por_pessoa": dict(self.por_pessoa),
+                "por_dia": [[*chave, *valores] for chave, valores in self.por_dia.items()]}
+
+    @classmethod
+    def de_dict(cls, dados):
+        return cls(dados["total"], dados["finalizados"], dados["tempo_soma"],
+                   Counter(dados["por_setor"]), Counter(dados["por_pessoa"]),
+                   {tuple(linha[:3]): linha[3:] for linha in dados["por_dia"]})
+
+def _mais_frequentes(contagem):
+    # sorted é estável: empates mantêm a ordem de aparição, como no value_counts
+    return dict(sorted(contagem.items(), key=lambda item: -item[1]))
+
+def combinar_metricas(parciais):
+    """Combina uma sequência de MetricasParciais num único agregado (acumulando no lugar)"""
+    resultado = MetricasParciais()
+    for parcial in parciais:
+        resultado.total += parcial.total
+        resultado.finalizados += parcial.finalizados
+        resultado.tempo_soma += parcial.tempo_soma
+        resultado.por_setor.update(parcial.por_setor)
+        resultado.por_pessoa.update(parcial.por_pessoa)
+        for chave, valores in parcial.por_dia.items():
+            _somar_em(resultado.por_dia, chave, valores)
+    return resultado
+
+# ===== GRAVAÇÃO ATÔMICA E BACKUPS =====
+# A planilha nova é gerada num arquivo temporário na mesma pasta e só então troca de lugar com
+# a anterior (os.replace é atômico) - se algo falhar no meio, a planilha anterior continua intacta.
+# A versão anterior vira backup sem cópia (hard link, ou rename quando o disco não suporta).
+BACKUPS_MANTIDOS = 5
+
+def _listar_backups(backup_dir, base):
+    """Backups da planilha (xlsx e zip), do mais novo para o mais antigo"""
+    padrao = re.compile(rf"^{re.escape(base)}_\d{{8}}_\d{{6}}(_\d+)?\.xlsx(\.zip)?$")
+    nomes = [n for n in os.listdir(backup_dir) if padrao.match(n)]
+    return sorted(nomes, key=lambda n: n.replace(".zip", ""), reverse=True)
+
+def _comprimir_backups(backup_dir, nomes):
+    """Compacta backups antigos (.xlsx -> .xlsx.zip); roda em segundo plano"""
+    import zipfile
+    for nome in nomes:
+        origem = os.path.join(backup_dir, nome)
+        temp = origem + ".zip.tmp"
+        try:
+            with zipfile.ZipFile(temp, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+                zf.write(origem, arcname=nome)
+            os.replace(temp, origem + ".zip")
+            os.remove(origem)
+        except Exception as e:
+            print(f"⚠️ Não foi possível compactar o backup {nome}: {e}")
+            if os.path.exists(temp):
+                os.remove(temp)
+
+def _rotacionar_backups(destino, manter=BACKUPS_MANTIDOS, comprimir=False):
+    """
+    Guarda a versão atual de destino em backup/ com data e hora, sem copiar o arquivo,
+    e mantém só os `manter` backups mais recentes. Com comprimir, os backups além do mais
+    recente são compactados numa thread em segundo plano (devolvida para quem quiser esperar).
+    """
+    if not os.path.exists(destino) or manter <= 0:
+        return None
+    backup_dir = os.path.join(os.path.dirname(os.path.abspath(destino)), "backup")
+    if not os.path.exists(backup_dir):
+        os.makedirs(backup_dir)
+        print(f"📁 Pasta de backup criada: {backup_dir}")
+
+    base = os.path.splitext(os.path.basename(destino))[0]
+    carimbo = datetime.now().strftime("%Y%m%d_%H%M%S")
+    nome = f"{base}_{carimbo}.xlsx"
+    sufixo = 1
+    while os.path.exists(os.path.join(backup_dir, nome)) or os.path.exists(os.path.join(backup_dir, nome + ".zip")):
+        nome = f"{base}_{carimbo}_{sufixo}.xlsx"
+        sufixo += 1
+    backup_path = os.path.join(backup_dir, nome)
+    try:
+        os.link(destino, backup_path)  # mesmo conteúdo, sem copiar bytes
+    except OSError:
+        os.replace(destino, backup_path)  # disco sem hard link (FAT, alguns compartilhamentos)
+    print(f"💾 Backup criado: {nome}")
+
+    backups = _listar_backups(backup_dir, base)
+    for antigo in backups[manter:]:
+        try:
+            os.remove(os.path.join(backup_dir, antigo))
+            print(f"🔄 Backup antigo removido: {antigo}")
+        except OSError as e:
+            print(f"⚠️ Não foi possível remover o backup {antigo}: {e}")
+
+    if comprimir:
+        para_comprimir = [n for n in backups[1:manter] if n.endswith(".xlsx")]
+        if para_comprimir:
+            import threading
+            thread = threading.Thread(target=_comprimir_backups, args=(backup_dir, para_comprimir),
+                                      name="comprimir-backups")
+            thread.start()  # não-daemon: o processo espera terminar antes de sair
+            return thread
+    return None
+
+def salvar_no_excel(df: "pd.DataFrame", motor="openpyxl", metricas=None, status=None,
+                    destino=None, backups=BACKUPS_MANTIDOS, comprimir_backups=False, incremental=False,
+                    abas_em_paralelo=0):
+    """
+    Gera a planilha consolidada em destino (padrão: MAE_PATH) de forma atômica.
+    backups=0 desativa o backup da versão anterior (usado no arquivo temporário).
+    incremental: reaproveita as abas que não mudaram desde a última gravação (sempre com o xlsxwriter).
+    abas_em_paralelo: processos que geram as abas de dados (0 = num processo só; sempre com o xlsxwriter).
+    """
+    if len(df) > LINHAS_POR_ABA:
+        raise ValueError(f"{len(df)} linhas não cabem numa aba do Excel (máximo {LINHAS_POR_ABA}): "
+                         f"use --memoria-limitada para dividir o COMPILE GERAL em várias abas")
+    # Sem agregados prontos (ex.: DataFrame montado fora de ler_filhos), calcula do frame
+    if metricas is None:
+        metricas = MetricasParciais.do_dataframe(df)
+
+    destino = destino or MAE_PATH
+    resumos = None
+    salvar = functools.partial(salvar_abas_em_paralelo, workers=abas_em_paralelo) if abas_em_paralelo else None
+
+    def gerar(temp):
+        nonlocal resumos
+        with INSTRUMENTACAO.etapa("gravacao", len(df)):
+            if incremental:
+                resumos = salvar_incremental(df, temp, destino, metricas, status, salvar)
+            elif salvar:
+                salvar(df, temp, metricas, status)
+            elif motor == "xlsxwriter":
+                _salvar_com_xlsxwriter(df, temp, metricas, status)
+            else:
+                _salvar_com_openpyxl(df, temp, metricas, status)
+    gravar_com_troca(destino, gerar, backups, comprimir_backups)
+    if resumos is not None:
+        try:
+            _salvar_resumos(destino, resumos)
+        except OSError as e:
+            print(f"⚠️ Não foi possível salvar os resumos das abas: {e}")
+
+def gravar_com_troca(destino, gerar, backups=BACKUPS_MANTIDOS, comprimir_backups=False):
+    """Chama gerar(temp) com um temporário na pasta de destino e só então troca os dois (com backup)"""
+    pasta = os.path.dirname(os.path.abspath(destino))
+    fd, temp = tempfile.mkstemp(prefix=".~" + os.path.splitext(os.path.basename(destino))[0] + "_",
+                                suffix=".xlsx", dir=pasta)
+    os.close(fd)
+    try:
+        gerar(temp)
+        with INSTRUMENTACAO.etapa("backup_e_troca"):
+            # mkstemp cria o arquivo só para o dono; mantém as permissões de uma planilha normal
+            if os.path.exists(destino):
+                shutil.copymode(destino, temp)
+            else:
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(temp, 0o666 & ~umask)
+            _rotacionar_backups(destino, backups, comprimir_backups)
+            os.replace(temp, destino)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+def _salvar_com_openpyxl(df, destino, metricas, status=None):
+    """Gera a planilha mãe inteira com o openpyxl"""
+    from openpyxl import Workbook
+    wb = Workbook()
+    # Remove a aba padrão "Sheet" que vem com workbooks novos
+    wb.remove(wb.active)
+
+    registrar_estilos(wb)
+
+    # 1) COMPILE GERAL
+    ws = wb.create_sheet("COMPILE GERAL")
+
+    colunas = ColunasPreparadas.do_dataframe(df)
+    escrever_aba(ws, colunas)
+
+    # 2) MÉTRICAS
+    wsM = wb.create_sheet("MÉTRICAS")
+
+    # Cabeçalho principal das métricas
+    wsM["A1"] = "📊 MÉTRICAS GERAIS"
+    wsM.merge_cells('A1:B1')
+    wsM["A1"].style = "titulo_14"
+
+    # Cabeçalhos das colunas
+    wsM["A3"] = "Indicador"
+    wsM["B3"] = "Valor"
+    wsM["A3"].style = wsM["B3"].style = "cabecalho"
+    
+    # Dados das métricas
+    row = 4
+    for indicador, valor in metricas.linhas_kpi():
+        wsM[f"A{row}"] = indicador
+        wsM[f"B{row}"] = valor
+        wsM[f"A{row}"].style = "texto"
+        wsM[f"B{row}"].style = "centro"
+        row += 1
+
+    # Tabelas pivôs estilizadas
+    def write_pivot_styled(title, series_counts, start_row, col1_name="Item", col2_name="Quantidade"):
+        # Título da tabela
+        wsM[f"A{start_row}"] = f"📋 {title}"
+        wsM.merge_cells(f'A{start_row}:B{start_row}')
+        wsM[f"A{start_row}"].style = "titulo_12"
+        
+        # Cabeçalhos da tabela com nomes específicos
+        wsM[f"A{start_row+1}"] = col1_name
+        wsM[f"B{start_row+1}"] = col2_name
+        wsM[f"A{start_row+1}"].style = wsM[f"B{start_row+1}"].style = "cabecalho"
+        
+        # Dados da tabela
+        r = start_row + 2
+        for k, v in series_counts.items():
+            wsM[f"A{r}"] = str(k)
+            wsM[f"B{r}"] = int(v)
+            wsM[f"A{r}"].style = "texto"
+            wsM[f"B{r}"].style = "centro"
+            r += 1
+        return r + 1  # Espaço extra após a tabela
+
+    if metricas.total:
+        next_row = write_pivot_styled("ATENDIMENTOS POR SETOR", metricas.setores(), 10, "Setor", "Qtd. Atendimentos")
+        write_pivot_styled("ATENDIMENTOS POR RESPONSÁVEL", metricas.pessoas(), next_row + 1, "Responsável", "Qtd. Atendimentos")
+    
+    # Ajuste manual das colunas na aba de métricas
+    wsM.column_dimensions['A'].width = 35
+    wsM.column_dimensions['B'].width = 20
+
+    # Métricas por semana e por mês (dos agregados por dia)
+    for titulo, periodo in ABAS_PERIODO.items():
+        escrever_periodo(wb.create_sheet(titulo), titulo, metricas, periodo)
+
+    # 3) Abas por pessoa - uma passada de groupby; cada pessoa recebe uma fatia das colunas
+    # já preparadas para COMPILE GERAL (só as colunas originais, sem PRIMEIRO_NOME/DATA_ARQUIVO/ARQUIVO)
+    for nome, posicoes in _posicoes_por_pessoa(df):
+        escrever_aba(wb.create_sheet(nome.title()), colunas.fatia(posicoes, COLS_ESPERADAS))
+
+    # 4) STATUS da execução (última aba)
+    if status:
+        wsS = wb.create_sheet(ABA_STATUS)
+        for row_idx, linha in enumerate(_linhas_status(status), 1):
+            for col_idx, valor in enumerate(linha, 1):
+                wsS.cell(row=row_idx, column=col_idx, value=valor).style = "cabecalho" if row_idx == 1 else "texto"
+        wsS.column_dimensions['A'].width = 60
+        wsS.column_dimensions['B'].width = 20
+
+    with INSTRUMENTACAO.etapa("save"):
+        wb.save(destino)
+
+# ===== GRAVAÇÃO INCREMENTAL =====
+# Com --incremental, o resumo (hash) do conteúdo de cada aba fica em PLANILHA_MAE.abas.json. Na
+# execução seguinte, as abas com o mesmo resumo não são escritas de novo: o xlsxwriter gera só as que
+# mudaram (as outras saem vazias) e o xl/worksheets/sheetN.xml delas é copiado do arquivo anterior,
+# ainda comprimido, para o zip novo. Cada aba é independente do resto do arquivo: em constant_memory
+# os textos ficam na própria aba (sem sharedStrings) e os estilos têm numeração fixa
+# (FormatosXlsxwriter). workbook.xml, relações e styles.xml vêm sempre da geração nova.
+VERSAO_ABAS = 1  # incrementar quando mudar o que é escrito nas abas
+EXTENSAO_RESUMOS = ".abas.json"
+ABAS_SEMPRE_NOVAS = {*ABAS_METRICAS, ABA_STATUS}  # pequenas e mudam a cada execução
+
+def resumos_das_abas(df: "pd.DataFrame"):
+    """Resumo do conteúdo de COMPILE GERAL e de cada aba por pessoa: {nome da aba: sha1}"""
+    import pandas as pd
+
+    def resumo(colunas, hashes):
+        h = hashlib.sha1("|".join(colunas).encode("utf-8"))
+        h.update(hashes.tobytes())
+        return h.hexdigest()
+
+    resumos = {"COMPILE GERAL": resumo(df.columns, pd.util.hash_pandas_object(df, index=False).to_numpy())}
+    por_linha = pd.util.hash_pandas_object(df[COLS_ESPERADAS], index=False).to_numpy()
+    for nome, posicoes in _posicoes_por_pessoa(df):
+        resumos[nome.title()] = resumo(COLS_ESPERADAS, por_linha[posicoes])
+    return resumos
+
+def _versao_resumos():
+    import xlsxwriter
+    return f"{VERSAO_ABAS}/{xlsxwriter.__version__}"
+
+def _carregar_resumos(destino):
+    """Resumos da gravação anterior, só se o arquivo em destino ainda é o que foi gravado"""
+    try:
+        with open(os.path.splitext(destino)[0] + EXTENSAO_RESUMOS, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        st = os.stat(destino)
+    except (OSError, ValueError):
+        return {}
+    # Planilha salva de novo no Excel (ou trocada por um backup): nada é reaproveitado
+    if (dados.get("versao") != _versao_resumos() or dados.get("tamanho") != st.st_size
+            or dados.get("mtime_ns") != st.st_mtime_ns):
+        return {}
+    return dados.get("abas", {})
+
+def _salvar_resumos(destino, resumos):
+    st = os.stat(destino)
+    caminho = os.path.splitext(destino)[0] + EXTENSAO_RESUMOS
+    temp = caminho + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump({"versao": _versao_resumos(), "tamanho": st.st_size, "mtime_ns": st.st_mtime_ns,
+                   "abas": resumos}, f, ensure_ascii=False, indent=1)
+    os.replace(temp, caminho)
+
+def _partes_das_abas(zf):
+    """Nome da aba -> parte do zip (xl/worksheets/sheetN.xml), pelo workbook.xml e suas relações"""
+    import xml.etree.ElementTree as ET
+    main = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+    rel_id = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+    alvos = {rel.get("Id"): rel.get("Target") for rel in ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))}
+    partes = {}
+    for aba in ET.fromstring(zf.read("xl/workbook.xml")).iter(main + "sheet"):
+        alvo = alvos[aba.get(rel_id)]
+        partes[aba.get("name")] = alvo[1:] if alvo.startswith("/") else "xl/" + alvo
+    return partes
+
+def _copiar_entrada_bruta(origem, info, destino, bloco=1024 * 1024):
+    """Copia os bytes ainda comprimidos de uma entrada do zip origem para o arquivo destino"""
+    origem.seek(info.header_offset)
+    tam_nome, tam_extra = struct.unpack("<2H", origem.read(30)[26:30])
+    origem.seek(info.header_offset + 30 + tam_nome + tam_extra)
+    restante = info.compress_size
+    while restante:
+        dados = origem.read(min(bloco, restante))
+        if not dados:
+            raise ValueError(f"entrada {info.filename} truncada")
+        destino.write(dados)
+        restante -= len(dados)
+
+def _gravar_zip_bruto(destino, entradas):
+    """
+    Grava um zip a partir de (nome, ZipInfo de origem, arquivo de origem aberto), copiando cada
+    entrada sem descomprimir. Formato zip simples (sem zip64): quem chama garante o tamanho.
+    """
+    central = []
+    with open(destino, "wb") as f:
+        for nome, info, origem in entradas:
+            nome_bytes = nome.encode("utf-8")
+            flags = (info.flag_bits & ~0x08) | (0x800 if not nome.isascii() else 0)  # sem data descriptor
+            ano, mes, dia, hora, minuto, segundo = info.date_time
+            hora_dos = (hora << 11) | (minuto << 5) | (segundo // 2)
+            data_dos = ((ano - 1980) << 9) | (mes << 5) | dia
+            posicao = f.tell()
+            f.write(struct.pack("<4s5H3L2H", b"PK\x03\x04", 20, flags, info.compress_type, hora_dos, data_dos,
+                                info.CRC, info.compress_size, info.file_size, len(nome_bytes), 0))
+            f.write(nome_bytes)
+            _copiar_entrada_bruta(origem, info, f)
+            central.append(struct.pack("<4s6H3L5H2L", b"PK\x01\x02", 20, 20, flags, info.compress_type, hora_dos,
+                                       data_dos, info.CRC, info.compress_size, info.file_size, len(nome_bytes),
+                                       0, 0, 0, 0, info.external_attr, posicao) + nome_bytes)
+        inicio = f.tell()
+        for registro in central:
+            f.write(registro)
+        f.write(struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, len(central), len(central), f.tell() - inicio, inicio, 0))
+
+def _montar_com_abas_anteriores(gerado, anterior, reaproveitadas, destino):
+    """destino = zip de gerado, com as partes das abas reaproveitadas copiadas de anterior"""
+    import zipfile
+    with zipfile.ZipFile(gerado) as zg, zipfile.ZipFile(anterior) as za, \
+            open(gerado, "rb") as fg, open(anterior, "rb") as fa:
+        novas, antigas = _partes_das_abas(zg), _partes_das_abas(za)
+        trocas = {novas[aba]: za.getinfo(antigas[aba]) for aba in reaproveitadas}
+        entradas = [(info.filename, trocas[info.filename], fa) if info.filename in trocas else (info.filename, info, fg)
+                    for info in zg.infolist()]
+        if (sum(info.compress_size + 100 + len(nome) * 2 for nome, info, _ in entradas) >= 0xFFFFFFFF
+                or any(info.file_size >= 0xFFFFFFFF for _, info, _ in entradas) or len(entradas) >= 0xFFFF):
+            raise ValueError("arquivo grande demais para a montagem sem zip64")
+        _gravar_zip_bruto(destino, entradas)
+
+def salvar_incremental(df: "pd.DataFrame", temp, anterior, metricas, status=None, salvar=None):
+    """
+    Grava em temp a planilha do xlsxwriter reaproveitando de `anterior` (a planilha atual) as abas
+    cujo conteúdo não mudou. Devolve os resumos das abas, para _salvar_resumos depois da troca.
+    salvar: gera as abas que mudaram (padrão _salvar_com_xlsxwriter; ex.: salvar_abas_em_paralelo).
+    """
+    salvar = salvar or _salvar_com_xlsxwriter
+    with INSTRUMENTACAO.etapa("resumos_abas", len(df)):
+        resumos = resumos_das_abas(df)
+        antigos = _carregar_resumos(anterior)
+    reaproveitadas = {aba for aba, resumo in resumos.items() if antigos.get(aba) == resumo}
+    if not reaproveitadas:
+        salvar(df, temp, metricas, status)
+        print(f"🧩 Planilha: {len(resumos)} aba(s) de dados gerada(s), nenhuma reaproveitada")
+        return resumos
+    gerado = temp + ".parcial.xlsx"
+    try:
+        salvar(df, gerado, metricas, status, pular=reaproveitadas)
+        try:
+            with INSTRUMENTACAO.etapa("montagem_zip"):
+                _montar_com_abas_anteriores(gerado, anterior, reaproveitadas, temp)
+        except Exception as e:
+            # Arquivo anterior ilegível ou grande demais: gera tudo de novo
+            print(f"⚠️ Não foi possível reaproveitar abas da planilha anterior ({e}); gerando todas")
+            salvar(df, temp, metricas, status)
+            return resumos
+    finally:
+        if os.path.exists(gerado):
+            os.remove(gerado)
+    print(f"🧩 Planilha: {len(reaproveitadas)} aba(s) reaproveitada(s), "
+          f"{len(resumos) - len(reaproveitadas)} gerada(s) de novo")
+    return resumos
+
+# ===== ABAS EM PARALELO =====
+# Com --abas-em-paralelo, o XML de cada aba de dados é gerado por um processo do pool, a partir da
+# fatia do consolidado que vai nela; COMPILE GERAL, que tem todas as linhas, é dividida em blocos de
+# linhas consecutivas (um por processo) para não ficar sozinha no fim. Cada processo grava o seu
+# pedaço num xlsx próprio e extrai dele o xl/worksheets/sheetN.xml. O processo principal gera o resto
+# do arquivo (abas de métricas, STATUS, workbook.xml, styles.xml...) com as abas de dados vazias e monta o zip
+# final na ordem de sempre, emendando as linhas (<row>) dos blocos. Como na gravação incremental, não
+# há tabela de textos compartilhados a juntar (em constant_memory os textos ficam na própria aba) e os
+# estilos têm a mesma numeração em todos os processos (FormatosXlsxwriter).
+ABA_AUXILIAR = "_"  # 1ª aba dos arquivos dos processos: só COMPILE GERAL sai marcada como selecionada
+_INICIO_LINHAS, _FIM_LINHAS = b"<sheetData>", b"</sheetData>"
+
+def _gerar_trecho_de_aba(aba, df, primeira_linha, larguras, pasta, indice):
+    """
+    Processo de gravação: escreve as linhas de df (a partir de primeira_linha, base 0, sem contar o
+    cabeçalho) na aba `aba` de um xlsx próprio e extrai o XML dela para pasta/bloco_<indice>.xml.
+    Com primeira_linha == 0 escreve também o cabeçalho e as larguras (calculadas da aba inteira).
+    Devolve (caminho, início das linhas, fim das linhas): posições em bytes no XML.
+    """
+    import zipfile
+    import xlsxwriter
+
+    gerado = os.path.join(pasta, f"bloco_{indice}.xlsx")
+    wb = xlsxwriter.Workbook(gerado, OPCOES_XLSXWRITER)
+    formatos = FormatosXlsxwriter(wb)
+    if aba != "COMPILE GERAL":
+        wb.add_worksheet(ABA_AUXILIAR)
+    ws = wb.add_worksheet(aba)
+    if primeira_linha == 0:
+        for col_idx, (col, largura) in enumerate(zip(df.columns, larguras)):
+            ws.set_column(col_idx, col_idx, largura)
+            ws.write_string(0, col_idx, str(col), formatos.cabecalho)
+    escrever_linhas_streaming(ws, ColunasPreparadas.do_dataframe(df), formatos, primeira_linha + 1)
+    wb.close()
+
+    caminho = os.path.join(pasta, f"bloco_{indice}.xml")
+    with zipfile.ZipFile(gerado) as zf, zf.open(_partes_das_abas(zf)[aba]) as origem, open(caminho, "wb") as destino:
+        shutil.copyfileobj(origem, destino, 1024 * 1024)
+    os.remove(gerado)
+    # O que vem antes e depois das linhas é pequeno: basta olhar o começo e o fim do arquivo
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, "rb") as f:
+        inicio = f.read(64 * 1024).index(_INICIO_LINHAS) + len(_INICIO_LINHAS)
+        f.seek(max(0, tamanho - 64 * 1024))
+        fim = f.tell()
+        fim += f.read().rindex(_FIM_LINHAS)
+    return caminho, inicio, fim
+
+def _copiar_intervalo(caminho, inicio, fim, destino, bloco=1024 * 1024):
+    """Copia os bytes [inicio, fim) do arquivo caminho para o arquivo aberto destino"""
+    with open(caminho, "rb") as f:
+        f.seek(inicio)
+        restante = fim - inicio
+        while restante:
+            dados = f.read(min(bloco, restante))
+            if not dados:
+                raise ValueError(f"{os.path.basename(caminho)} truncado")
+            destino.write(dados)
+            restante -= len(dados)
+
+def _montar_abas_em_paralelo(gerado, blocos_por_aba, dimensoes, destino):
+    """
+    destino = zip de gerado com a parte de cada aba de blocos_por_aba trocada pela emenda dos blocos:
+    o começo do XML vem do 1º bloco (com a dimensão da aba inteira), as linhas de todos e o fim do último.
+    """
+    import zipfile
+    with zipfile.ZipFile(gerado) as zg, zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as zd:
+        trocas = {parte: aba for aba, parte in _partes_das_abas(zg).items() if aba in blocos_por_aba}
+        for info in zg.infolist():
+            novo = zipfile.ZipInfo(info.filename, info.date_time)
+            novo.compress_type, novo.external_attr = zipfile.ZIP_DEFLATED, info.external_attr
+            aba = trocas.get(info.filename)
+            if aba is None:
+                zd.writestr(novo, zg.read(info))
+                continue
+            blocos = blocos_por_aba[aba]
+            with open(blocos[0][0], "rb") as f:
+                cabeca = f.read(blocos[0][1])
+            if len(blocos) > 1:
+                cabeca = re.sub(rb'<dimension ref="[^"]*"/>', f'<dimension ref="{dimensoes[aba]}"/>'.encode(),
+                                cabeca, count=1)
+            caminho, _, fim = blocos[-1]
+            cauda_tamanho = os.path.getsize(caminho) - fim
+            tamanho = len(cabeca) + sum(f - i for _, i, f in blocos) + cauda_tamanho
+            with zd.open(novo, "w", force_zip64=tamanho >= zipfile.ZIP64_LIMIT) as saida:
+                saida.write(cabeca)
+                for caminho_bloco, inicio, fim_bloco in blocos:
+                    _copiar_intervalo(caminho_bloco, inicio, fim_bloco, saida)
+                _copiar_intervalo(caminho, fim, fim + cauda_tamanho, saida)
+
+def _blocos_de_linhas(linhas, partes):
+    """Divide range(linhas) em até `partes` intervalos consecutivos (início, fim) de tamanhos parecidos"""
+    partes = max(1, min(partes, linhas))
+    limites = [linhas * i // partes for i in range(partes + 1)]
+    return list(zip(limites[:-1], limites[1:]))
+
+def salvar_abas_em_paralelo(df: "pd.DataFrame", destino, metricas, status=None, pular=frozenset(), workers=1):
+    """
+    Mesma planilha de _salvar_com_xlsxwriter, com as abas de dados geradas em `workers` processos
+    (ver _gerar_trecho_de_aba). pular: abas deixadas vazias, como em _salvar_com_xlsxwriter.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from xlsxwriter.utility import xl_range
+
+    with INSTRUMENTACAO.etapa("larguras_abas", len(df)):
+        colunas = ColunasPreparadas.do_dataframe(df)
+        pessoas = [(nome.title(), posicoes) for nome, posicoes in _posicoes_por_pessoa(df)]
+        # Trabalhos: (aba, linhas do df, 1ª linha na aba, larguras), os maiores primeiro na fila
+        trabalhos = []
+        if "COMPILE GERAL" not in pular:
+            larguras = colunas.larguras()
+            for inicio, fim in _blocos_de_linhas(len(df), workers):
+                trabalhos.append(("COMPILE GERAL", slice(inicio, fim), inicio, larguras))
+        for aba, posicoes in pessoas:
+            if aba not in pular:
+                trabalhos.append((aba, posicoes, 0, colunas.fatia(posicoes, COLS_ESPERADAS).larguras()))
+        del colunas
+    dimensoes = {"COMPILE GERAL": xl_range(0, 0, len(df), len(df.columns) - 1)}
+    dimensoes.update((aba, xl_range(0, 0, len(posicoes), len(COLS_ESPERADAS) - 1)) for aba, posicoes in pessoas)
+    tamanho = lambda linhas: linhas.stop - linhas.start if isinstance(linhas, slice) else len(linhas)
+
+    pasta = tempfile.mkdtemp(prefix=".~abas_", dir=os.path.dirname(os.path.abspath(destino)))
+    try:
+        with INSTRUMENTACAO.etapa("abas_em_paralelo", len(df)):
+            blocos = {}
+            if trabalhos:
+                with ProcessPoolExecutor(max_workers=max(1, min(workers, len(trabalhos)))) as pool:
+                    futuros = []
+                    for indice, (aba, linhas, primeira, larguras) in sorted(
+                            enumerate(trabalhos), key=lambda t: -tamanho(t[1][1])):
+                        fatia = df.iloc[linhas] if aba == "COMPILE GERAL" else df[COLS_ESPERADAS].iloc[linhas]
+                        futuros.append((indice, aba, pool.submit(_gerar_trecho_de_aba, aba, fatia, primeira,
+                                                                 larguras, pasta, indice)))
+                    # Blocos de uma aba na ordem das linhas (os índices seguem a ordem de `trabalhos`)
+                    for indice, aba, futuro in sorted(futuros, key=lambda t: t[0]):
+                        blocos.setdefault(aba, []).append(futuro.result())
+        gerado = os.path.join(pasta, "planilha.xlsx")
+        _salvar_com_xlsxwriter(df, gerado, metricas, status, pular={"COMPILE GERAL", *(aba for aba, _ in pessoas)})
+        with INSTRUMENTACAO.etapa("montagem_zip"):
+            _montar_abas_em_paralelo(gerado, blocos, dimensoes, destino)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    print(f"🧵 Planilha: {len(blocos)} aba(s) de dados geradas em {len(trabalhos)} bloco(s) "
+          f"por {max(1, workers)} processo(s)")
+
+# ===== BASE COLUNAR =====
+# Cópia tipada do COMPILE GERAL em Feather (Arrow IPC) ao lado da planilha mãe, para relatórios e
+# scripts lerem só as colunas/linhas que precisam sem abrir o xlsx. Sem compressão: o arquivo é
+# mapeado em memória na leitura. pyarrow é opcional - sem ele a base colunar não é gerada.
+EXTENSAO_COLUNAR = ".feather"
+def tipar_dataframe(df: "pd.DataFrame"):
+    """
+    Cópia do frame com todos os tipos reais: o da leitura já vem no esquema; frames de texto
+    montados fora da leitura são convertidos.
+    """
+    import pandas as pd
+    tipado = df.copy(deep=False)
+    if not all(pd.api.types.is_datetime64_any_dtype(df[col]) for col in COLUNAS_DATA):
+        converter_datas_e_duracoes(tipado)
+    for col in COLUNAS_CATEGORIA:
+        tipado[col] = df[col].astype("category")
+    tipado["DATA_ARQUIVO"] = pd.to_datetime(df["DATA_ARQUIVO"])
+    return tipado
+
+def salvar_base_colunar(df: "pd.DataFrame", destino):
+    """Grava a base colunar de forma atômica; devolve o caminho ou None se o pyarrow não estiver instalado"""
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        print("⚠️ pyarrow não instalado: base colunar (.feather) não gerada")
+        return None
+    temp = destino + ".tmp"
+    try:
+        feather.write_feather(tipar_dataframe(df).reset_index(drop=True), temp, compression="uncompressed")
+        os.replace(temp, destino)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+    return destino
+
+class BaseColunarEmPartes:
+    """
+    Base colunar gravada um bloco (filha) por vez, para o modo memória limitada: cada bloco vira um
+    lote do arquivo Arrow. O esquema é fixo no arquivo, então as categorias (que variam de filha para
+    filha) são gravadas como texto. Sem pyarrow, os métodos não fazem nada.
+    """
+
+    def __init__(self, destino):
+        self.destino, self.temp = destino, destino + ".tmp"
+        self.escritor = self.esquema = None
+        try:
+            import pyarrow  # noqa: F401
+            self.disponivel = True
+        except ImportError:
+            print("⚠️ pyarrow não instalado: base colunar (.feather) não gerada")
+            self.disponivel = False
+
+    def acrescentar(self, df: "pd.DataFrame"):
+        import pyarrow as pa
+        if not self.disponivel:
+            return
+        tabela = pa.Table.from_pandas(tipar_dataframe(df), preserve_index=False)
+        if self.escritor is None:
+            campos = []
+            for campo in tabela.schema:
+                if pa.types.is_dictionary(campo.type):
+                    campo = campo.with_type(campo.type.value_type)
+                elif pa.types.is_null(campo.type):  # coluna toda vazia nesta filha
+                    campo = campo.with_type(pa.string())
+                campos.append(campo)
+            self.esquema = pa.schema(campos)  # sem os metadados do pandas (que falam em categoria)
+            self.escritor = pa.ipc.new_file(self.temp, self.esquema)
+        self.escritor.write_table(tabela.cast(self.esquema, safe=False))
+
+    def fechar(self):
+        """Conclui o arquivo e troca com o anterior; devolve o caminho (ou None sem pyarrow)"""
+        import pandas as pd
+        if not self.disponivel:
+            return None
+        if self.escritor is None:
+            return salvar_base_colunar(pd.DataFrame(columns=COLUNAS_CONSOLIDADO), self.destino)
+        self.escritor.close()
+        os.replace(self.temp, self.destino)
+        return self.destino
+
+    def descartar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+        if os.path.exists(self.temp):
+            os.remove(self.temp)
+
+def carregar_atendimentos(caminho=None, colunas=None, pessoas=None, setores=None, inicio=None, fim=None,
+                          como_tabela=False):
+    """
+    Consulta a base colunar (padrão: a da pasta do programa) sem abrir a planilha mãe.
+      colunas       - só estas colunas são lidas (projeção)
+      pessoas       - PRIMEIRO_NOME aceitos (sem diferenciar maiúsculas)
+      setores       - SETOR aceitos
+      inicio / fim  - intervalo de DATA_ARQUIVO, inclusivo (data ou texto "AAAA-MM-DD")
+    Devolve um DataFrame (ou a pyarrow.Table com como_tabela=True).
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+
+    caminho = caminho or caminhos_saida()["colunar"]
+    filtros = [col for col, usado in (("PRIMEIRO_NOME", pessoas), ("SETOR", setores),
+                                      ("DATA_ARQUIVO", inicio is not None or fim is not None)) if usado]
+    leitura = list(dict.fromkeys(list(colunas) + filtros)) if colunas else None
+    tabela = feather.read_table(caminho, columns=leitura, memory_map=True)
+
+    condicoes = []
+    if pessoas:
+        nomes = tabela["PRIMEIRO_NOME"].cast(pa.string())
+        condicoes.append(pc.is_in(nomes, value_set=pa.array([str(p).upper() for p in pessoas])))
+    if setores:
+        condicoes.append(pc.is_in(tabela["SETOR"].cast(pa.string()), value_set=pa.array([str(s) for s in setores])))
+    tipo_data = tabela.schema.field("DATA_ARQUIVO").type if "DATA_ARQUIVO" in filtros else None
+    if inicio is not None:
+        condicoes.append(pc.greater_equal(tabela["DATA_ARQUIVO"],
+                                          pa.scalar(pd.Timestamp(inicio), type=tipo_data)))
+    if fim is not None:
+        condicoes.append(pc.less_equal(tabela["DATA_ARQUIVO"],
+                                       pa.scalar(pd.Timestamp(fim), type=tipo_data)))
+    if condicoes:
+        mascara = condicoes[0]
+        for condicao in condicoes[1:]:
+            mascara = pc.and_(mascara, condicao)
+        tabela = tabela.filter(mascara)
+    if colunas:
+        tabela = tabela.select(list(colunas))
+    return tabela if como_tabela else tabela.to_pandas()
+
+# ===== HISTÓRICO (SQLite) =====
+# Todos os atendimentos já consolidados, numa base SQLite ao lado da planilha mãe. Cada filha nova
+# ou alterada substitui as suas linhas; filhas que saíram de filhas/ continuam no histórico.
+# Consultas por período, setor ou responsável usam os índices em vez de reler planilhas.
+HISTORICO_ARQUIVO = "historico_atendimentos.db"
+COLUNAS_HISTORICO = {
+    "INICIAR": "iniciar", "RESPONSÁVEL": "responsavel", "OPERAÇÃO": "operacao", "CLIENTE": "cliente",
+    "SOLICITAÇÃO": "solicitacao", "SETOR": "setor", "OBSERVAÇÕES": "observacoes", "FINALIZAR": "finalizar",
+    "TIME SPENT": "time_spent", "TRATATIVA SETOR": "tratativa_setor", "TIME SPENT - SETOR": "time_spent_setor",
+    "PRIMEIRO_NOME": "primeiro_nome",
+}
+ESQUEMA_HISTORICO = f"""
+CREATE TABLE IF NOT EXISTS arquivos (
+    arquivo      TEXT PRIMARY KEY,
+    data_arquivo TEXT,
+    assinatura   TEXT NOT NULL,
+    linhas       INTEGER NOT NULL,
+    gravado_em   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS atendimentos (
+    arquivo       TEXT NOT NULL,
+    linha         INTEGER NOT NULL,
+    data_arquivo  TEXT,
+    {", ".join(f"{col} TEXT" for col in COLUNAS_HISTORICO.values())},
+    finalizado    INTEGER NOT NULL,
+    tempo_minutos REAL NOT NULL,
+    chave         INTEGER,
+    PRIMARY KEY (arquivo, linha)
+);
+CREATE INDEX IF NOT EXISTS idx_atendimentos_responsavel ON atendimentos(responsavel);
+CREATE INDEX IF NOT EXISTS idx_atendimentos_setor ON atendimentos(setor);
+-- data na frente e setor junto: "últimos N dias por setor" sai só do índice
+CREATE INDEX IF NOT EXISTS idx_atendimentos_data ON atendimentos(data_arquivo, setor);
+"""
+# (a chave primária já indexa arquivo; chave = hash de CHAVE_DUPLICADOS, para achar repetidos)
+_INDICE_CHAVE = "CREATE INDEX IF NOT EXISTS idx_atendimentos_chave ON atendimentos(chave);"
+_CAMPOS_ATENDIMENTO = ["arquivo", "linha", "data_arquivo", *COLUNAS_HISTORICO.values(), "finalizado", "tempo_minutos",
+                       "chave"]
+INSERIR_ATENDIMENTO = (f"INSERT INTO atendimentos ({', '.join(_CAMPOS_ATENDIMENTO)}) "
+                       f"VALUES ({', '.join('?' * len(_CAMPOS_ATENDIMENTO))})")
+
+def abrir_historico(caminho):
+    """Conexão com a base do histórico (cria as tabelas e índices na primeira vez)"""
+    import sqlite3
+    con = sqlite3.connect(caminho)
+    con.executescript(ESQUEMA_HISTORICO)
+    if "chave" not in {linha[1] for linha in con.execute("PRAGMA table_info(atendimentos)")}:
+        con.execute("ALTER TABLE atendimentos ADD COLUMN chave INTEGER")  # base de versão anterior
+    con.executescript(_INDICE_CHAVE)
+    return con
+
+def _data_iso(valor):
+    import pandas as pd
+    return None if pd.isna(valor) else pd.Timestamp(valor).strftime("%Y-%m-%d")
+
+def _texto_historico(serie):
+    """Coluna como texto para o histórico: datas 'AAAA-MM-DD HH:MM:SS', durações 'HH:MM:SS'"""
+    import pandas as pd
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.strftime("%Y-%m-%d %H:%M:%S")
+    if pd.api.types.is_timedelta64_dtype(serie):
+        segundos = serie.dt.total_seconds()
+        preenchidas = segundos.notna()
+        inteiros = segundos[preenchidas].astype("int64")  # trunca os milissegundos, como int()
+        texto = pd.Series(None, index=serie.index, dtype=object)
+        texto[preenchidas] = ((inteiros // 3600).astype(str).str.zfill(2) + ":"
+                              + (inteiros % 3600 // 60).astype(str).str.zfill(2) + ":"
+                              + (inteiros % 60).astype(str).str.zfill(2))
+        return texto
+    return serie
+
+def _registros_historico(bloco, chave=None):
+    """
+    Tuplas do INSERT para as linhas de uma filha, na ordem de _CAMPOS_ATENDIMENTO (NaN -> NULL).
+    Com chave, cada linha leva o hash das colunas da chave (NULL se alguma estiver vazia).
+    """
+    import pandas as pd
+    finalizado, tempo = indicadores_por_linha(bloco)
+    valores = pd.DataFrame({col: _texto_historico(bloco[col]) for col in COLUNAS_HISTORICO}).astype(object)
+    valores = valores.where(valores.notna(), None)
+    if chave:
+        # uint64 -> int64 (o INTEGER do SQLite tem sinal); o valor só serve para comparar igualdade
+        hashes = pd.util.hash_pandas_object(bloco[chave], index=False).to_numpy().view("int64").tolist()
+        completas = bloco[chave].notna().all(axis=1).tolist()
+        hashes = [h if ok else None for h, ok in zip(hashes, completas)]
+    else:
+        hashes = [None] * len(bloco)
+    arquivo, data = bloco["ARQUIVO"].iloc[0], _data_iso(bloco["DATA_ARQUIVO"].iloc[0])
+    return [(arquivo, linha, data, *campos, fin, minutos, h)
+            for linha, (campos, fin, minutos, h) in enumerate(zip(valores.itertuples(index=False, name=None),
+                                                                 finalizado.astype(int).tolist(), tempo.tolist(),
+                                                                 hashes))]
+
+def atualizar_historico(df: "pd.DataFrame", caminho, chave_duplicados=None):
+    """
+    Grava no histórico as filhas do frame que são novas ou mudaram (assinatura do conteúdo), numa
+    única transação. Com chave_duplicados, um atendimento repetido entre uma filha gravada agora
+    e outra já no histórico (mesmo que fora de filhas/) fica só na de DATA_ARQUIVO mais nova.
+    Devolve (filhas gravadas, linhas inseridas).
+    """
+    import pandas as pd
+    con = abrir_historico(caminho)
+    gravadas = linhas = 0
+    try:
+        with con:  # commit no fim; rollback se algo falhar no meio
+            conhecidas = dict(con.execute("SELECT arquivo, assinatura FROM arquivos"))
+            agora = datetime.now().isoformat(timespec="seconds")
+            if chave_duplicados:
+                con.execute("CREATE TEMP TABLE IF NOT EXISTS gravadas (arquivo TEXT PRIMARY KEY)")
+            # ARQUIVO é categoria: sem observed, a filha que ficou sem linhas (todas repetidas de uma
+            # mais nova) viraria um grupo vazio no pandas 2
+            for arquivo, bloco in df.groupby("ARQUIVO", observed=True, sort=False):
+                assinatura = hashlib.sha1(pd.util.hash_pandas_object(bloco, index=False).values.tobytes()).hexdigest()
+                if conhecidas.get(arquivo) == assinatura:
+                    continue
+                registros = _registros_historico(bloco, chave_duplicados)
+                con.execute("DELETE FROM atendimentos WHERE arquivo = ?", (arquivo,))
+                con.executemany(INSERIR_ATENDIMENTO, registros)
+                con.execute("INSERT INTO arquivos (arquivo, data_arquivo, assinatura, linhas, gravado_em) "
+                            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(arquivo) DO UPDATE SET "
+                            "data_arquivo = excluded.data_arquivo, assinatura = excluded.assinatura, "
+                            "linhas = excluded.linhas, gravado_em = excluded.gravado_em",
+                            (arquivo, registros[0][2], assinatura, len(registros), agora))
+                gravadas += 1
+                linhas += len(registros)
+                if chave_duplicados:
+                    con.execute("INSERT INTO gravadas VALUES (?)", (arquivo,))
+            if chave_duplicados and gravadas:
+                _remover_repetidos_do_historico(con)
+    finally:
+        con.close()
+    return gravadas, linhas
+
+def _remover_repetidos_do_historico(con):
+    """
+    Entre pares de linhas com a mesma chave em filhas diferentes (uma delas recém-gravada), apaga a
+    da filha mais antiga - empate na data: fica a de nome maior, como a ordem dos arquivos na leitura.
+    Filha sem data no nome conta como a mais nova, como em remover_duplicados.
+    """
+    # Sem comparação de tuplas (SQLite 3.15+): a ordem (sem data, data, arquivo) escrita por extenso;
+    # "IS" compara NULL com NULL
+    con.execute("""
+        DELETE FROM atendimentos WHERE rowid IN (
+            SELECT CASE WHEN (a.data_arquivo IS NOT NULL AND b.data_arquivo IS NULL)
+                          OR a.data_arquivo < b.data_arquivo
+                          OR (a.data_arquivo IS b.data_arquivo AND a.arquivo < b.arquivo)
+                        THEN a.rowid ELSE b.rowid END
+            FROM atendimentos AS a JOIN atendimentos AS b ON b.chave = a.chave AND b.arquivo <> a.arquivo
+            WHERE a.arquivo IN (SELECT arquivo FROM temp.gravadas))""")
+    con.execute("UPDATE arquivos SET linhas = (SELECT COUNT(*) FROM atendimentos WHERE atendimentos.arquivo = arquivos.arquivo)")
+    con.execute("DELETE FROM temp.gravadas")
+
+def metricas_do_historico(caminho, inicio=None, fim=None):
+    """
+    MetricasParciais calculadas por agregação SQL sobre o histórico (opcionalmente só o intervalo
+    inicio..fim de DATA_ARQUIVO), sem ler filhas nem montar DataFrames.
+    """
+    condicoes, parametros = [], []
+    if inicio is not None:
+        condicoes.append("data_arquivo >= ?")
+        parametros.append(_data_iso(inicio))
+    if fim is not None:
+        condicoes.append("data_arquivo <= ?")
+        parametros.append(_data_iso(fim))
+
+    def onde(*extras):
+        todas = condicoes + list(extras)
+        return f" WHERE {' AND '.join(todas)}" if todas else ""
+
+    con = abrir_historico(caminho)
+    try:
+        total, finalizados, tempo = con.execute(
+            "SELECT COUNT(*), COALESCE(SUM(finalizado), 0), COALESCE(SUM(tempo_minutos), 0) "
+            f"FROM atendimentos{onde()}", parametros).fetchone()
+
+        def contagem(coluna):
+            # ORDER BY MIN(rowid): ordem de aparição, como o value_counts(sort=False) das filhas
+            return Counter(dict(con.execute(
+                f"SELECT {coluna}, COUNT(*) FROM atendimentos{onde(f'{coluna} IS NOT NULL')} "
+                f"GROUP BY {coluna} ORDER BY MIN(rowid)", parametros)))
+
+        # Mesma data de dias_dos_atendimentos: a de INICIAR ('AAAA-MM-DD HH:MM:SS') ou a da filha
+        por_dia = {(dia, setor, pessoa): [n, f, float(t)] for dia, setor, pessoa, n, f, t in con.execute(
+            "SELECT COALESCE(substr(iniciar, 1, 10), data_arquivo), COALESCE(setor, ''), "
+            "COALESCE(primeiro_nome, ''), COUNT(*), SUM(finalizado), SUM(tempo_minutos) "
+            f"FROM atendimentos{onde('COALESCE(iniciar, data_arquivo) IS NOT NULL')} GROUP BY 1, 2, 3", parametros)}
+        return MetricasParciais(total=total, finalizados=finalizados, tempo_soma=float(tempo),
+                                por_setor=contagem("setor"), por_pessoa=contagem("primeiro_nome"), por_dia=por_dia)
+    finally:
+        con.close()
+
+def consultar_historico(sql, parametros=(), caminho=None):
+    """Executa uma consulta no histórico (padrão: o da pasta do programa) e devolve um DataFrame"""
+    import pandas as pd
+    con = abrir_historico(caminho or caminhos_saida()["historico"])
+    try:
+        return pd.read_sql_query(sql, con, params=parametros)
+    finally:
+        con.close()
+
+def aviso_finalizados_em_texto(logs):
+    """Resumo da execução com os FINALIZAR só com texto somados de todas as filhas (None se não houver)"""
+    padrao = re.compile(rf"— (\d+) {re.escape(AVISO_FINALIZADO_EM_TEXTO)}")
+    n = sum(int(achado.group(1)) for log in logs for achado in padrao.finditer(log))
+    if n:
+        return (f"⚠️ {n} atendimento(s) com FINALIZAR só com texto (Sim/yes/true) não contam como finalizados: "
+                f"finalizado é FINALIZAR com data/hora (o botão da filha)")
+    return None
+
+def salvar_log(logs, total, cabecalho="Execução", pasta=None):
+    """
+    Grava log_compilacao.txt em pasta (padrão: BASE_DIR) e devolve o caminho.
+    Com a instrumentação ligada, acrescenta as medições e grava relatorio_execucao.json.
+    """
+    pasta = pasta or BASE_DIR
+    log_path = os.path.join(pasta, "log_compilacao.txt")
+    aviso = aviso_finalizados_em_texto(logs)
+    if aviso:
+        print(aviso)
+    with open(log_path, "w", encoding="utf-8") as f:
+        f.write(f"{cabecalho} em {datetime.now()}\n")
+        f.write(f"Total de registros: {total}\n")
+        if aviso:
+            f.write(aviso + "\n")
+        f.write("-" * 50 + "\n")
+        f.write("\n".join(logs))
+        if INSTRUMENTACAO.ativa:
+            f.write("\n".join(INSTRUMENTACAO.linhas_log()) + "\n")
+    if INSTRUMENTACAO.ativa:
+        relatorio = INSTRUMENTACAO.relatorio(registros=total, log=logs)
+        with open(os.path.join(pasta, RELATORIO_EXECUCAO), "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    return log_path
+
+def caminhos_saida(saida_dir=None):
+    """
+    Arquivos gerados numa pasta de saída: planilha mãe, base colunar, histórico, status, log e cache
+    das filhas.
+    Sem saida_dir, os caminhos globais (pasta do programa).
+    """
+    if saida_dir is None:
+        caminhos = {"mae": MAE_PATH, "status": STATUS_PATH, "log": BASE_DIR, "cache": CACHE_DIR}
+    else:
+        caminhos = {"mae": os.path.join(saida_dir, "PLANILHA_MAE.xlsx"),
+                    "status": os.path.join(saida_dir, "status_atualizacao.txt"),
+                    "log": saida_dir,
+                    "cache": os.path.join(saida_dir, "cache_filhas")}
+    caminhos["colunar"] = os.path.splitext(caminhos["mae"])[0] + EXTENSAO_COLUNAR
+    caminhos["historico"] = os.path.join(caminhos["log"], HISTORICO_ARQUIVO)
+    return caminhos
+
+def gravar_consolidado(df, logs, metricas, motor="openpyxl", backups=BACKUPS_MANTIDOS, comprimir_backups=False,
+                       saida_dir=None, metricas_historico=False, chave_duplicados=CHAVE_DUPLICADOS,
+                       incremental=False, abas_em_paralelo=0):
+    """
+    Atualiza o histórico e salva a planilha mãe (com a aba STATUS), a base colunar, o status e o log;
+    devolve o caminho do log. metricas_historico: abas de métricas com todo o histórico, não só filhas/.
+    incremental: reaproveita da planilha anterior as abas que não mudaram (ver salvar_incremental).
+    abas_em_paralelo: processos que geram as abas de dados (ver salvar_abas_em_paralelo).
+    """
+    caminhos = caminhos_saida(saida_dir)
+    try:
+        with INSTRUMENTACAO.etapa("historico", len(df)):
+            gravadas, linhas = atualizar_historico(df, caminhos["historico"], chave_duplicados)
+            if metricas_historico:
+                metricas = metricas_do_historico(caminhos["historico"])
+        if gravadas:
+            print(f"🗃️ Histórico: {gravadas} filha(s) nova(s) ou alterada(s), {linhas} linhas gravadas")
+    except Exception as e:
+        # Ex.: base aberta por outro programa - a planilha mãe sai com as métricas das filhas
+        print(f"⚠️ Não foi possível atualizar o histórico: {e}")
+    status_final = f"✅ Atualizado com sucesso — {len(df)} linhas consolidadas."
+    salvar_no_excel(df, motor=motor, metricas=metricas, status=status_final, destino=caminhos["mae"],
+                    backups=backups, comprimir_backups=comprimir_backups, incremental=incremental,
+                    abas_em_paralelo=abas_em_paralelo)
+    try:
+        with INSTRUMENTACAO.etapa("base_colunar", len(df)):
+            salvar_base_colunar(df, caminhos["colunar"])
+    except Exception as e:
+        # A planilha mãe já foi salva; a base colunar é só uma cópia para consultas
+        print(f"⚠️ Não foi possível gravar a base colunar: {e}")
+    escrever_status(status_final, caminhos["status"])
+    return salvar_log(logs, len(df), pasta=caminhos["log"])
+
+def consolidar(motor="openpyxl", workers=1, reconstruir_cache=False, backups=BACKUPS_MANTIDOS,
+               comprimir_backups=False, memoria=None, filhas_dir=None, saida_dir=None, metricas_historico=False,
+               chave_duplicados=CHAVE_DUPLICADOS, memoria_limitada=False, linhas_por_aba=None, incremental=False,
+               pipeline=False, abas_em_paralelo=False):
+    """
+    Consolidação completa sem nenhuma pergunta ao usuário; devolve (df, logs, metricas).
+    filhas_dir/saida_dir: padrão FILHAS_DIR e a pasta do programa.
+    memoria_limitada: usa consolidar_em_partes (o frame não é montado: devolve None no lugar do df).
+    pipeline: usa consolidar_em_fluxo (idem; ignorado com memoria_limitada).
+    abas_em_paralelo: gera as abas de dados em `workers` processos (ignorado nos dois modos acima).
+    """
+    if memoria_limitada:
+        _, logs, metricas = consolidar_em_partes(workers, reconstruir_cache, backups, comprimir_backups,
+                                                 filhas_dir, saida_dir, metricas_historico, chave_duplicados,
+                                                 linhas_por_aba or LINHAS_POR_ABA)
+        return None, logs, metricas
+    if pipeline:
+        _, logs, metricas = consolidar_em_fluxo(workers, reconstruir_cache, backups, comprimir_backups,
+                                                filhas_dir, saida_dir, metricas_historico, chave_duplicados)
+        return None, logs, metricas
+    caminhos = caminhos_saida(saida_dir)
+    INSTRUMENTACAO.reiniciar()
+    escrever_status("⏳ Atualizando…", caminhos["status"])
+    df, logs, metricas = ler_filhos_com_metricas(reconstruir_cache=reconstruir_cache, workers=workers,
+                                                 memoria=memoria, filhas_dir=filhas_dir,
+                                                 cache_dir=caminhos["cache"], chave_duplicados=chave_duplicados)
+    print(f"📊 Encontrados {len(df)} registros para consolidar")
+    for log in logs:
+        print(log)
+    gravar_consolidado(df, logs, metricas, motor, backups, comprimir_backups, saida_dir, metricas_historico,
+                       chave_duplicados, incremental, workers if abas_em_paralelo else 0)
+    return df, logs, metricas
+
+# ===== MODO MEMÓRIA LIMITADA =====
+# Para históricos que passam do tamanho de uma aba do Excel: nenhum frame com todas as filhas é
+# montado. A 1ª passada garante cada filha no cache e guarda dela só o que planeja a gravação (linhas,
+# pessoa e hashes da chave de duplicados); a 2ª relê do cache uma filha por vez e escreve as linhas
+# direto no xlsx (xlsxwriter em constant_memory), passando para COMPILE GERAL (2), (3)... quando a aba
+# enche - o mesmo vale para as abas por pessoa. O pico de memória é o de uma filha (ou `workers`
+# filhas na leitura), mais 1 byte por linha e 8 por linha com a chave completa para os duplicados.
+LIMITE_LINHAS_EXCEL = 1_048_576
+LINHAS_POR_ABA = LIMITE_LINHAS_EXCEL - 1  # a primeira linha é o cabeçalho
+
+def nomes_das_abas(base, linhas, linhas_por_aba=LINHAS_POR_ABA):
+    """Abas necessárias para `linhas` linhas: base, base (2), base (3)... (sempre ao menos uma)"""
+    partes = max(1, -(-linhas // linhas_por_aba))
+    return [base] + [f"{base} ({i})" for i in range(2, partes + 1)]
+
+class AbasEmSequencia:
+    """
+    Aba do xlsxwriter dividida em várias (base, base (2), ...), todas criadas no construtor para
+    ficarem na ordem certa do arquivo. Recebe as linhas em blocos (ColunasPreparadas) e passa para a
+    próxima aba quando a atual enche; as larguras são acumuladas e aplicadas em fechar().
+    Os blocos podem ter mais colunas que a aba: só as de `nomes` são escritas.
+    """
+
+    def __init__(self, wb, base, linhas, nomes, formatos, linhas_por_aba=LINHAS_POR_ABA):
+        import numpy as np
+        self.nomes, self.formatos, self.linhas_por_aba = nomes, formatos, linhas_por_aba
+        self.abas = [wb.add_worksheet(nome) for nome in nomes_das_abas(base, linhas, linhas_por_aba)]
+        self.maiores = [np.zeros(len(nomes), dtype=np.int64) for _ in self.abas]
+        self.atual, self.proxima_linha = 0, 1
+        for ws in self.abas:
+            for col_idx, col in enumerate(nomes):
+                ws.write_string(0, col_idx, str(col), formatos.cabecalho)
+
+    @medir_etapa("escrita_abas", linhas=lambda self, colunas: len(colunas))
+    def escrever(self, colunas):
+        import numpy as np
+        inicio = 0
+        while inicio < len(colunas):
+            if self.proxima_linha > self.linhas_por_aba:
+                self.atual, self.proxima_linha = self.atual + 1, 1
+            n = min(len(colunas) - inicio, self.linhas_por_aba - self.proxima_linha + 1)
+            parte = colunas.fatia(np.arange(inicio, inicio + n), self.nomes)
+            escrever_linhas_streaming(self.abas[self.atual], parte, self.formatos, self.proxima_linha)
+            self.maiores[self.atual] = np.maximum(self.maiores[self.atual],
+                                                  [int(comp.max()) for comp in parte.comprimentos])
+            inicio += n
+            self.proxima_linha += n
+
+    def fechar(self):
+        for ws, maiores in zip(self.abas, self.maiores):
+            for col_idx, (nome, maior) in enumerate(zip(self.nomes, maiores)):
+                ws.set_column(col_idx, col_idx, largura_coluna(nome, int(maior)))
+
+def resumir_filha(arq, df, log, metricas, entrada=None, chave=None):
+    """
+    O que planeja a gravação de uma filha (o frame fica de fora, no cache): dict com arquivo, log,
+    metricas, linhas e, quando aceita, pessoa, data, pickle e (com chave) as linhas de chave completa
+    e seus hashes. entrada: a do índice do cache, se houver.
+    """
+    import pandas as pd
+    filha = {"arquivo": arq, "log": log, "metricas": metricas, "linhas": 0, "pickle": None}
+    if df is not None:
+        filha.update(linhas=len(df), pessoa=str(df["PRIMEIRO_NOME"].iloc[0]),
+                     data=df["DATA_ARQUIVO"].iloc[0], pickle=(entrada or {}).get("pickle"))
+        if chave:
+            completas = df[chave].notna().all(axis=1).to_numpy()
+            filha["completas"] = completas
+            filha["hashes"] = pd.util.hash_pandas_object(df.loc[completas, chave], index=False).to_numpy()
+    return filha
+
+def _planejar_filhas(arquivos, cache_dir, workers=1, chave=None):
+    """
+    1ª passada: garante cada filha no cache (lendo só as novas/alteradas, `workers` por vez) e
+    devolve, na ordem de arquivos, o resumo de cada filha (resumir_filha).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    indice = carregar_indice_cache(cache_dir)
+    entradas_antigas, entradas = indice["arquivos"], {}
+    filhas, pendentes, stats = {}, [], {}
+
+    def resumir(arq, df, log, metricas):
+        filhas[arq] = resumir_filha(arq, df, log, metricas, entradas.get(os.path.basename(arq)), chave)
+
+    def ler_pendentes():
+        for arq, (df, log, cacheavel) in zip(pendentes, _ler_varios_filhos(pendentes, workers, pool)):
+            metricas = MetricasParciais.do_dataframe(df) if df is not None else None
+            if cacheavel and arq in stats:
+                nome = os.path.basename(arq)
+                try:
+                    entradas[nome] = _gravar_no_cache(cache_dir, arq, stats[arq], df, log, metricas)
+                except Exception as e:
+                    print(f"⚠️ Não foi possível gravar cache de {nome}: {e}")
+            resumir(arq, df, log, metricas)
+        pendentes.clear()
+
+    lidas, pool = 0, None
+    try:
+        for arq in arquivos:
+            nome = os.path.basename(arq)
+            try:
+                st = stats[arq] = os.stat(arq)
+                em_cache = _buscar_no_cache(cache_dir, entradas_antigas.get(nome), arq, st)
+            except OSError:
+                em_cache = None
+            if em_cache is not None:
+                entradas[nome] = entradas_antigas[nome]
+                resumir(arq, *em_cache)
+                continue
+            pendentes.append(arq)
+            lidas += 1
+            if len(pendentes) >= workers:
+                if pool is None and workers > 1:
+                    from concurrent.futures import ProcessPoolExecutor
+                    pool = ProcessPoolExecutor(max_workers=workers)  # um só pool para a passada inteira
+                ler_pendentes()
+        ler_pendentes()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    fechar_indice_cache(cache_dir, indice, entradas)
+    print(f"♻️ Cache: {len(arquivos) - lidas} arquivo(s) reaproveitado(s), {lidas} lido(s) do disco")
+    return [filhas[arq] for arq in arquivos]
+
+def _marcar_repetidas_por_filha(filhas):
+    """
+    Decide os atendimentos repetidos entre filhas como remover_duplicados, só com os hashes da
+    1ª passada. Grava em cada filha a máscara "remover" (se houver) e devolve o Counter por ARQUIVO.
+    """
+    import numpy as np
+    import pandas as pd
+    com_dados = [filha for filha in filhas if filha["linhas"]]
+    if not com_dados:
+        return Counter()
+    tamanhos = [len(filha["hashes"]) for filha in com_dados]
+    candidatas = pd.DataFrame({
+        "hash": np.concatenate([filha["hashes"] for filha in com_dados]),
+        "data": np.repeat(np.array([filha["data"] for filha in com_dados], dtype="datetime64[ns]"), tamanhos),
+        "arquivo": np.repeat(np.arange(len(com_dados)), tamanhos),
+    })
+    removidos = Counter()
+    for filha, repetidas in zip(com_dados, np.split(_marcar_repetidas(candidatas), np.cumsum(tamanhos)[:-1])):
+        completas = filha.pop("completas")
+        del filha["hashes"]
+        if repetidas.any():
+            remover = completas.copy()
+            remover[completas] = repetidas
+            filha["remover"] = remover
+            removidos[os.path.basename(filha["arquivo"])] = int(repetidas.sum())
+    return removidos
+
+def _frame_da_filha(filha, cache_dir):
+    """
+    2ª passada: o frame da filha sem os repetidos - o guardado em filha["df"] (pipeline), o do cache
+    ou, se não foi possível guardá-lo, relido. filha["metricas"] passa a ser a das linhas que ficam.
+    """
+    import pandas as pd
+    df = filha.pop("df", None)
+    if df is not None:
+        pass
+    elif filha["pickle"]:
+        df = pd.read_pickle(os.path.join(cache_dir, filha["pickle"]))
+    else:
+        df = _ler_arquivo_filho(filha["arquivo"])[0]
+    if df is None or len(df) != filha["linhas"]:
+        raise RuntimeError(f"{os.path.basename(filha['arquivo'])} mudou durante a consolidação; execute de novo")
+    df = df[COLUNAS_CONSOLIDADO]
+    if "remover" in filha:
+        filha["metricas"] = metricas_sem_repetidas(filha["metricas"], df, filha["remover"])
+        df = df[~filha["remover"]].reset_index(drop=True)
+    return df
+
+class SaidasPorFilha:
+    """
+    Histórico e base colunar alimentados uma filha por vez (modos memória limitada e pipeline).
+    Como em gravar_consolidado, um erro desliga só a saída que falhou e a planilha mãe segue.
+    """
+
+    def __init__(self, caminhos, chave_duplicados):
+        self.caminhos, self.chave_duplicados = caminhos, chave_duplicados
+        self.base_colunar = BaseColunarEmPartes(caminhos["colunar"])
+        self.historico_ok, self.gravadas, self.linhas = True, 0, 0
+
+    def acrescentar(self, df: "pd.DataFrame"):
+        if self.historico_ok:
+            try:
+                gravadas, linhas = atualizar_historico(df, self.caminhos["historico"], self.chave_duplicados)
+                self.gravadas += gravadas
+                self.linhas += linhas
+            except Exception as e:
+                print(f"⚠️ Não foi possível atualizar o histórico: {e}")
+                self.historico_ok = False
+        if self.base_colunar.disponivel:
+            try:
+                self.base_colunar.acrescentar(df)
+            except Exception as e:
+                print(f"⚠️ Não foi possível gravar a base colunar: {e}")
+                self.base_colunar.descartar()
+                self.base_colunar.disponivel = False
+
+    def concluir(self, total):
+        """Depois da troca da planilha mãe: fecha a base colunar e mostra o resumo do histórico"""
+        if self.gravadas:
+            print(f"🗃️ Histórico: {self.gravadas} filha(s) nova(s) ou alterada(s), {self.linhas} linhas gravadas")
+        if self.base_colunar.disponivel:
+            with INSTRUMENTACAO.etapa("base_colunar", total):
+                self.base_colunar.fechar()
+
+    def descartar(self):
+        self.base_colunar.descartar()
+
+def consolidar_em_partes(workers=1, reconstruir_cache=False, backups=BACKUPS_MANTIDOS, comprimir_backups=False,
+                         filhas_dir=None, saida_dir=None, metricas_historico=False,
+                         chave_duplicados=CHAVE_DUPLICADOS, linhas_por_aba=LINHAS_POR_ABA):
+    """
+    Consolidação com memória limitada (sempre com o xlsxwriter): mesmas saídas de consolidar(), com
+    COMPILE GERAL e as abas por pessoa divididas a cada linhas_por_aba linhas.
+    Devolve (linhas consolidadas, logs, metricas).
+    """
+    import xlsxwriter
+    caminhos = caminhos_saida(saida_dir)
+    cache_dir = caminhos["cache"]
+    INSTRUMENTACAO.reiniciar()
+    escrever_status("⏳ Atualizando…", caminhos["status"])
+    arquivos = listar_filhas(filhas_dir or FILHAS_DIR)
+    if reconstruir_cache and os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        print("🧹 Cache das filhas apagado, todas serão relidas")
+
+    with INSTRUMENTACAO.etapa("primeira_passada") as etapa:
+        filhas = _planejar_filhas(arquivos, cache_dir, workers, chave_duplicados)
+        etapa.linhas_saida = sum(filha["linhas"] for filha in filhas)
+    logs = [filha["log"] for filha in filhas]
+    if chave_duplicados:
+        removidos = _marcar_repetidas_por_filha(filhas)
+        if removidos:
+            logs = _anotar_repetidos(arquivos, logs, removidos, chave_duplicados)
+    pessoas = Counter()
+    for filha in filhas:
+        if filha["linhas"]:
+            removidas = int(filha["remover"].sum()) if "remover" in filha else 0
+            pessoas[filha["pessoa"]] += filha["linhas"] - removidas
+    pessoas = {nome: linhas for nome, linhas in sorted(pessoas.items()) if linhas}
+    total = sum(pessoas.values())
+    print(f"📊 Encontrados {total} registros para consolidar")
+    for log in logs:
+        print(log)
+
+    status_final = f"✅ Atualizado com sucesso — {total} linhas consolidadas."
+    saidas = SaidasPorFilha(caminhos, chave_duplicados)
+    parciais = []
+
+    def gerar(temp):
+        with INSTRUMENTACAO.etapa("gravacao", total):
+            wb = xlsxwriter.Workbook(temp, OPCOES_XLSXWRITER)
+            formatos = FormatosXlsxwriter(wb)
+            # Todas as abas criadas antes das linhas: a ordem de criação é a ordem no arquivo
+            geral = AbasEmSequencia(wb, "COMPILE GERAL", total, COLUNAS_CONSOLIDADO, formatos, linhas_por_aba)
+            abas_metricas = [wb.add_worksheet(aba) for aba in ABAS_METRICAS]
+            abas_pessoa = {nome: AbasEmSequencia(wb, nome.title(), linhas, COLS_ESPERADAS, formatos, linhas_por_aba)
+                           for nome, linhas in pessoas.items()}
+            wsS = wb.add_worksheet(ABA_STATUS)
+            for filha in filhas:
+                if not filha["linhas"]:
+                    continue
+                df = _frame_da_filha(filha, cache_dir)
+                parciais.append(filha["metricas"])
+                if df.empty:
+                    continue
+                colunas = ColunasPreparadas.do_dataframe(df)
+                geral.escrever(colunas)
+                abas_pessoa[filha["pessoa"]].escrever(colunas)
+                saidas.acrescentar(df)
+            metricas = combinar_metricas(parciais)
+            if metricas_historico and saidas.historico_ok:
+                metricas = metricas_do_historico(caminhos["historico"])
+            for abas in [geral, *abas_pessoa.values()]:
+                abas.fechar()
+            escrever_abas_metricas_streaming(abas_metricas, metricas, formatos)
+            escrever_status_streaming(wsS, status_final, formatos)
+            with INSTRUMENTACAO.etapa("save"):
+                wb.close()
+
+    try:
+        gravar_com_troca(caminhos["mae"], gerar, backups, comprimir_backups)
+    except BaseException:
+        saidas.descartar()
+        raise
+    saidas.concluir(total)
+    abas_geral = len(nomes_das_abas("COMPILE GERAL", total, linhas_por_aba))
+    if abas_geral > 1:
+        print(f"📑 COMPILE GERAL dividido em {abas_geral} abas de até {linhas_por_aba} linhas")
+    escrever_status(status_final, caminhos["status"])
+    salvar_log(logs, total, pasta=caminhos["log"])
+    return total, logs, combinar_metricas(parciais)
+
+# ===== CONSOLIDAÇÃO EM PIPELINE =====
+# Leitura e gravação sobrepostas: processos leem as próximas filhas enquanto o processo principal
+# escreve no xlsx (xlsxwriter em constant_memory) as já lidas, na ordem dos arquivos. Uma filha só é
+# escrita depois de decidida: sem remoção de repetidos, assim que chega; com ela, quando todas as
+# filhas mais novas (as que podem tirar linhas dela) já foram lidas - até lá o frame fica no cache em
+# disco. As abas por pessoa são criadas em ordem de nome assim que a pessoa tem linhas e as anteriores
+# já foram resolvidas. A memória fica em `profundidade` filhas lidas à frente e `profundidade` frames
+# guardados, mais os hashes da chave de duplicados; a planilha sai igual à do modo normal com xlsxwriter.
+PROFUNDIDADE_POR_LEITOR = 2  # filhas lidas à frente da gravação, por processo de leitura
+
+def _chave_mais_nova(ordem, arq):
+    """Ordem de remover_duplicados: DATA_ARQUIVO (sem data conta como a mais nova), empate pela ordem dos arquivos"""
+    data = extrair_primeiro_nome(arq)[1]
+    return (data is None, data.toordinal() if data else 0, ordem)
+
+def _ler_e_guardar(arq, cache_dir, st, chave=None, medir=False, memoria=False):
+    """
+    No processo de leitura do pipeline: lê a filha e já grava o cache, as métricas e os hashes da
+    chave, para o processo principal só carregar o frame na hora de escrever.
+    Devolve (resumo, entrada do índice ou None, medida ou None); o frame só vai junto no resumo
+    quando não foi possível guardá-lo no cache.
+    """
+    medida = None
+    if medir:
+        (df, log, cacheavel), medida = _ler_e_medir(arq, memoria)
+    else:
+        df, log, cacheavel = _ler_arquivo_filho(arq)
+    metricas = MetricasParciais.do_dataframe(df) if df is not None else None
+    entrada = None
+    if cacheavel and st is not None:
+        try:
+            entrada = _gravar_no_cache(cache_dir, arq, st, df, log, metricas)
+        except Exception as e:
+            print(f"⚠️ Não foi possível gravar cache de {os.path.basename(arq)}: {e}")
+    filha = resumir_filha(arq, df, log, metricas, entrada, chave)
+    if df is not None and not filha["pickle"]:
+        filha["df"] = df
+    return filha, entrada, medida
+
+class AbasPorPessoa:
+    """
+    Abas por pessoa criadas durante a gravação, na ordem de nome de _salvar_com_xlsxwriter: a aba de
+    uma pessoa só é criada quando as anteriores já têm aba ou terminaram sem linhas. Até lá as linhas
+    dela esperam em memória (só acontece quando os nomes dos arquivos não seguem a ordem das pessoas).
+    """
+
+    def __init__(self, wb, filhas_por_pessoa, formatos):
+        self.wb, self.formatos = wb, formatos
+        self.pessoas = sorted(filhas_por_pessoa)
+        self.restantes = dict(filhas_por_pessoa)  # filhas de cada pessoa ainda não escritas
+        self.abas, self.esperando = {}, {}
+        self.proxima = 0  # primeira pessoa (em ordem de nome) ainda não resolvida
+
+    def escrever(self, pessoa, colunas=None):
+        """Linhas de uma filha da pessoa (None = filha sem linhas); chamar uma vez por filha"""
+        import numpy as np
+        if colunas is not None and len(colunas):
+            if pessoa in self.abas:
+                self.abas[pessoa].escrever(colunas)
+            else:
+                self.esperando.setdefault(pessoa, []).append(colunas.fatia(np.arange(len(colunas)), COLS_ESPERADAS))
+        self.restantes[pessoa] -= 1
+        while self.proxima < len(self.pessoas):
+            proxima = self.pessoas[self.proxima]
+            if proxima in self.esperando:
+                abas = self.abas[proxima] = AbasEmSequencia(self.wb, proxima.title(), 1, COLS_ESPERADAS, self.formatos)
+                for bloco in self.esperando.pop(proxima):
+                    abas.escrever(bloco)
+            elif proxima not in self.abas and self.restantes[proxima]:
+                break
+            self.proxima += 1
+
+    def fechar(self):
+        for abas in self.abas.values():
+            abas.fechar()
+
+def consolidar_em_fluxo(workers=1, reconstruir_cache=False, backups=BACKUPS_MANTIDOS, comprimir_backups=False,
+                        filhas_dir=None, saida_dir=None, metricas_historico=False,
+                        chave_duplicados=CHAVE_DUPLICADOS, profundidade=None):
+    """
+    Consolidação em pipeline (sempre com o xlsxwriter): mesmas saídas de consolidar(), com a leitura
+    das filhas em `workers` processos (ao menos um) sobreposta à gravação.
+    profundidade: filhas lidas à frente da gravação (padrão: PROFUNDIDADE_POR_LEITOR por processo).
+    Devolve (linhas consolidadas, logs, metricas).
+    """
+    import numpy as np
+    import xlsxwriter
+    from concurrent.futures import ProcessPoolExecutor
+    caminhos = caminhos_saida(saida_dir)
+    cache_dir = caminhos["cache"]
+    INSTRUMENTACAO.reiniciar()
+    escrever_status("⏳ Atualizando…", caminhos["status"])
+    arquivos = listar_filhas(filhas_dir or FILHAS_DIR)
+    if reconstruir_cache and os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        print("🧹 Cache das filhas apagado, todas serão relidas")
+    os.makedirs(cache_dir, exist_ok=True)
+    indice = carregar_indice_cache(cache_dir)
+    entradas_antigas, entradas = indice["arquivos"], {}
+    leitores = max(1, workers)
+    profundidade = profundidade or PROFUNDIDADE_POR_LEITOR * leitores
+
+    n = len(arquivos)
+    filhas = [None] * n                   # resumir_filha de cada arquivo, depois de lido
+    mais_novas = sorted(range(n), key=lambda i: _chave_mais_nova(i, arquivos[i]), reverse=True)
+    pessoas = Counter(extrair_primeiro_nome(arq)[0] for arq in arquivos if validar_nome(arq))
+    visto = set()                         # hashes da chave nas filhas já decididas (as mais novas)
+    guardados = set()                     # filhas com o frame em memória esperando a gravação
+    estado = {"decididas": 0, "gravadas": 0, "lidas": 0, "total": 0}
+    saidas = SaidasPorFilha(caminhos, chave_duplicados)
+    parciais, removidos = [], Counter()
+    pool = None
+
+    def buscar(arq):
+        """Do cache (carregado na hora) ou enviado ao pool; devolve o item da fila"""
+        nome = os.path.basename(arq)
+        st = None
+        try:
+            st = os.stat(arq)
+            em_cache = _buscar_no_cache(cache_dir, entradas_antigas.get(nome), arq, st)
+        except OSError:
+            em_cache = None
+        if em_cache is not None:
+            entradas[nome] = entradas_antigas[nome]
+            return em_cache
+        estado["lidas"] += 1
+        return pool.submit(_ler_e_guardar, arq, cache_dir, st, chave_duplicados,
+                           INSTRUMENTACAO.ativa, INSTRUMENTACAO.memoria)
+
+    def receber(i, item):
+        """Resultado de uma filha (do cache ou do pool) vira o resumo usado na decisão e na gravação"""
+        arq = arquivos[i]
+        if isinstance(item, tuple):
+            df, log, metricas = item
+            filha = resumir_filha(arq, df, log, metricas, entradas.get(os.path.basename(arq)), chave_duplicados)
+            if df is not None and len(guardados) < profundidade:
+                filha["df"] = df  # já carregado: evita ler o pickle de novo na gravação
+                guardados.add(i)
+        else:
+            filha, entrada, medida = item.result()
+            if entrada is not None:
+                entradas[os.path.basename(arq)] = entrada
+            if medida is not None:
+                INSTRUMENTACAO.registrar_arquivo(medida)
+        filhas[i] = filha
+
+    def decidir():
+        """Decide os repetidos das filhas cujas mais novas já foram todas lidas (da mais nova para a mais velha)"""
+        while estado["decididas"] < n and filhas[mais_novas[estado["decididas"]]] is not None:
+            filha = filhas[mais_novas[estado["decididas"]]]
+            if "hashes" in filha:
+                completas, hashes = filha.pop("completas"), filha.pop("hashes").tolist()
+                repetidas = np.fromiter(map(visto.__contains__, hashes), dtype=bool, count=len(hashes))
+                visto.update(hashes)
+                if repetidas.any():
+                    remover = completas.copy()
+                    remover[completas] = repetidas
+                    filha["remover"] = remover
+                    removidos[os.path.basename(filha["arquivo"])] = int(repetidas.sum())
+            filha["decidida"] = True
+            estado["decididas"] += 1
+
+    def gravar_decididas(geral, abas_pessoa):
+        """Escreve, na ordem dos arquivos, as filhas já decididas"""
+        while estado["gravadas"] < n and filhas[estado["gravadas"]] is not None \
+                and filhas[estado["gravadas"]].get("decidida"):
+            i = estado["gravadas"]
+            filha = filhas[i]
+            estado["gravadas"] += 1
+            guardados.discard(i)
+            colunas = None
+            if filha["linhas"]:
+                df = _frame_da_filha(filha, cache_dir)
+                parciais.append(filha["metricas"])
+                estado["total"] += len(df)
+                if estado["total"] > LINHAS_POR_ABA:
+                    raise ValueError(f"Mais de {LINHAS_POR_ABA} linhas não cabem numa aba do Excel: "
+                                     f"use --memoria-limitada para dividir o COMPILE GERAL em várias abas")
+                if len(df):
+                    colunas = ColunasPreparadas.do_dataframe(df)
+                    geral.escrever(colunas)
+                    saidas.acrescentar(df)
+            if validar_nome(filha["arquivo"]):
+                abas_pessoa.escrever(extrair_primeiro_nome(filha["arquivo"])[0], colunas)
+            filhas[i] = {"log": filha["log"]}  # solta o resto (hashes, máscaras, métricas)
+
+    def gerar(temp):
+        nonlocal pool
+        with INSTRUMENTACAO.etapa("pipeline") as etapa:
+            wb = xlsxwriter.Workbook(temp, OPCOES_XLSXWRITER)
+            formatos = FormatosXlsxwriter(wb)
+            # COMPILE GERAL e métricas primeiro; as abas por pessoa entram na ordem ao serem criadas
+            geral = AbasEmSequencia(wb, "COMPILE GERAL", 1, COLUNAS_CONSOLIDADO, formatos)
+            abas_metricas = [wb.add_worksheet(aba) for aba in ABAS_METRICAS]
+            abas_pessoa = AbasPorPessoa(wb, pessoas, formatos)
+            with ProcessPoolExecutor(max_workers=leitores) as pool:
+                fila, proxima = deque(), 0
+                for i in range(n):
+                    while proxima < n and len(fila) < profundidade:
+                        fila.append(buscar(arquivos[proxima]))
+                        proxima += 1
+                    receber(i, fila.popleft())
+                    if chave_duplicados:
+                        decidir()
+                    else:
+                        filhas[i]["decidida"] = True
+                    gravar_decididas(geral, abas_pessoa)
+            etapa.linhas_saida = estado["total"]
+            metricas = combinar_metricas(parciais)
+            if metricas_historico and saidas.historico_ok:
+                metricas = metricas_do_historico(caminhos["historico"])
+            geral.fechar()
+            abas_pessoa.fechar()
+            escrever_abas_metricas_streaming(abas_metricas, metricas, formatos)
+            status = f"✅ Atualizado com sucesso — {estado['total']} linhas consolidadas."
+            escrever_status_streaming(wb.add_worksheet(ABA_STATUS), status, formatos)
+            with INSTRUMENTACAO.etapa("save"):
+                wb.close()
+
+    try:
+        gravar_com_troca(caminhos["mae"], gerar, backups, comprimir_backups)
+    except BaseException:
+        saidas.descartar()
+        # As filhas já lidas continuam no cache (ex.: planilha mãe aberta no Excel na hora da troca)
+        indice["arquivos"] = {**entradas_antigas, **entradas}
+        try:
+            salvar_indice_cache(cache_dir, indice)
+        except Exception:
+            pass
+        raise
+    fechar_indice_cache(cache_dir, indice, entradas)
+    print(f"♻️ Cache: {n - estado['lidas']} arquivo(s) reaproveitado(s), {estado['lidas']} lido(s) do disco")
+    total = estado["total"]
+    logs = [filha["log"] for filha in filhas]
+    if removidos:
+        logs = _anotar_repetidos(arquivos, logs, removidos, chave_duplicados)
+    print(f"📊 Encontrados {total} registros para consolidar")
+    for log in logs:
+        print(log)
+    saidas.concluir(total)
+    status_final = f"✅ Atualizado com sucesso — {total} linhas consolidadas."
+    escrever_status(status_final, caminhos["status"])
+    salvar_log(logs, total, pasta=caminhos["log"])
+    return total, logs, combinar_metricas(parciais)
+
+# ===== MODO LOTE =====
+# Várias pastas (uma por equipe) consolidadas num único processo, sem perguntas: pandas e
+# openpyxl são importados uma vez só. O resumo final em JSON é para o agendador.
+def _consolidar_par(par, opcoes, instrumentacao=None):
+    """Consolida um par (filhas_dir, saida_dir) e devolve o resumo; erros não interrompem o lote"""
+    filhas_dir, saida_dir = par
+    if instrumentacao:  # processos do pool começam com a instrumentação desligada
+        INSTRUMENTACAO.configurar(**instrumentacao)
+    resumo = {"filhas": filhas_dir, "saida": saida_dir, "ok": False, "linhas": 0, "arquivos": 0,
+              "rejeitados": [], "planilha": None, "erro": None}
+    inicio = time.perf_counter()
+    # O stdout fica reservado para o resumo JSON; o progresso vai para o stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        print(f"\n📁 {filhas_dir} -> {saida_dir}")
+        try:
+            if not os.path.isdir(filhas_dir):
+                raise FileNotFoundError(f"Diretório de filhas não encontrado: {filhas_dir}")
+            os.makedirs(saida_dir, exist_ok=True)
+            _, logs, metricas = consolidar(filhas_dir=filhas_dir, saida_dir=saida_dir, **opcoes)
+            resumo.update(ok=True, linhas=metricas.total, arquivos=len(logs),
+                          rejeitados=[log for log in logs if not log.startswith("✅")],
+                          planilha=caminhos_saida(saida_dir)["mae"])
+        except Exception as e:
+            resumo["erro"] = str(e)
+            print(f"❌ Erro na atualização: {e}")
+            if os.path.isdir(saida_dir):
+                escrever_status(f"❌ Erro na atualização: {e}", caminhos_saida(saida_dir)["status"])
+    resumo["segundos"] = round(time.perf_counter() - inicio, 3)
+    return resumo
+
+def consolidar_lote(pares, paralelo=1, **opcoes):
+    """
+    Consolida cada (filhas_dir, saida_dir) de pares e devolve a lista de resumos, na mesma ordem.
+    Com paralelo > 1 as pastas são distribuídas entre processos (cada um lê suas filhas sozinho).
+    """
+    pares = [tuple(par) for par in pares]
+    if paralelo <= 1 or len(pares) <= 1:
+        return [_consolidar_par(par, opcoes) for par in pares]
+    from concurrent.futures import ProcessPoolExecutor
+    opcoes = dict(opcoes, workers=1)  # o paralelismo já é por pasta
+    with ProcessPoolExecutor(max_workers=min(paralelo, len(pares))) as pool:
+        return list(pool.map(_consolidar_par, pares, [opcoes] * len(pares),
+                             [INSTRUMENTACAO.config()] * len(pares)))
+
+def carregar_pares(caminho):
+    """Lê a lista de pastas de um JSON: [{"filhas": ..., "saida": ...}, ...] ou [[filhas, saida], ...]"""
+    with open(caminho, "r", encoding="utf-8") as f:
+        itens = json.load(f)
+    return [(item["filhas"], item["saida"]) if isinstance(item, dict) else tuple(item) for item in itens]
+
+# ===== MODO OBSERVAÇÃO =====
+# Processo que fica aberto e reconsolida quando uma filha válida é criada, alterada ou removida.
+# pandas/openpyxl continuam carregados e as filhas já lidas ficam em memória entre as rodadas.
+def _varrer_filhas(filhas_dir):
+    """Assinatura (tamanho, mtime) das filhas com nome válido - os.scandir já traz o stat da listagem"""
+    assinatura = {}
+    with os.scandir(filhas_dir) as entradas:
+        for entrada in entradas:
+            nome = entrada.name
+            if not NOME_REGEX.match(nome):
+                continue
+            try:
+                st = entrada.stat()
+            except OSError:
+                continue  # removido durante a varredura
+            assinatura[nome] = (st.st_size, st.st_mtime_ns)
+    return assinatura
+
+def observar(intervalo=2.0, debounce=5.0, **opcoes):
+    """
+    Observa FILHAS_DIR e reconsolida após `debounce` segundos sem novas mudanças
+    (operadores costumam salvar várias vezes seguidas). Encerra com Ctrl+C.
+    """
+    print(f"👀 Observando {FILHAS_DIR} (varredura a cada {intervalo:g}s, espera de {debounce:g}s). Ctrl+C para sair.")
+    memoria = {}
+    consolidada = None         # assinatura da última consolidação bem-sucedida
+    pendente, desde = None, 0  # mudança aguardando o debounce
+    espera = 0                 # a 1ª consolidação não espera; depois de qualquer tentativa, o debounce
+    try:
+        while True:
+            atual = _varrer_filhas(FILHAS_DIR)
+            if atual != consolidada:
+                agora = time.monotonic()
+                if atual != pendente:
+                    pendente, desde = atual, agora
+                    if consolidada is not None:
+                        print(f"✏️ Mudança detectada em filhas/ ({datetime.now():%H:%M:%S}), aguardando estabilizar...")
+                elif agora - desde >= espera:
+                    inicio, espera = time.perf_counter(), debounce
+                    try:
+                        consolidar(memoria=memoria, **opcoes)
+                        consolidada = atual
+                        print(f"✅ PLANILHA_MAE atualizada em {time.perf_counter() - inicio:.1f}s ({datetime.now():%H:%M:%S})")
+                    except Exception as e:
+                        # Ex.: planilha mãe aberta no Excel - tenta de novo depois do debounce
+                        print(f"❌ Erro na atualização: {e}")
+                        escrever_status(f"❌ Erro na atualização: {e}")
+                        desde = time.monotonic()
+            time.sleep(intervalo)
+    except KeyboardInterrupt:
+        print("\n👋 Modo observação encerrado.")
+
+def _lista_colunas(texto):
+    """Tipo do argparse para --chave-duplicados: colunas separadas por vírgula, todas conhecidas"""
+    colunas = [c.strip() for c in texto.split(",") if c.strip()]
+    desconhecidas = [c for c in colunas if c not in COLS_ESPERADAS + ["PRIMEIRO_NOME"]]
+    if not colunas or desconhecidas:
+        raise argparse.ArgumentTypeError(f"colunas inválidas: {', '.join(desconhecidas) or repr(texto)}")
+    return colunas
+
+def _linhas_por_aba(texto):
+    """Tipo do argparse para --linhas-por-aba: de 1 até o limite de uma aba do Excel"""
+    linhas = int(texto)
+    if not 1 <= linhas <= LINHAS_POR_ABA:
+        raise argparse.ArgumentTypeError(f"use de 1 a {LINHAS_POR_ABA}")
+    return linhas
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Consolida as planilhas da pasta filhas/ na PLANILHA_MAE.xlsx")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="Apaga o cache das filhas e relê todos os arquivos")
+    parser.add_argument("--motor", choices=["openpyxl", "xlsxwriter"], default="openpyxl",
+                        help="Motor de escrita da planilha mãe (xlsxwriter = streaming, mais rápido e com menos memória)")
+    parser.add_argument("--backups", type=int, default=BACKUPS_MANTIDOS,
+                        help=f"Quantos backups da planilha mãe manter em backup/ (padrão: {BACKUPS_MANTIDOS})")
+    parser.add_argument("--comprimir-backups", action="store_true",
+                        help="Compacta em segundo plano os backups além do mais recente")
+    parser.add_argument("--chave-duplicados", type=_lista_colunas, default=CHAVE_DUPLICADOS, metavar="COL1,COL2,...",
+                        help=f"Colunas que identificam um atendimento repetido entre filhas "
+                             f"(padrão: {','.join(CHAVE_DUPLICADOS)})")
+    parser.add_argument("--sem-deduplicar", dest="chave_duplicados", action="store_const", const=None,
+                        help="Mantém os atendimentos repetidos entre filhas")
+    parser.add_argument("--metricas-historico", action="store_true",
+                        help="Abas de métricas com todo o histórico (inclui filhas que já saíram de filhas/)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reaproveita da planilha mãe anterior as abas que não mudaram, sem gerá-las de novo "
+                             "(sempre com o xlsxwriter)")
+    parser.add_argument("--memoria-limitada", action="store_true",
+                        help="Grava filha a filha sem montar o consolidado em memória (sempre com o xlsxwriter); "
+                             "COMPILE GERAL e abas por pessoa continuam em (2), (3)... quando enchem")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Lê as próximas filhas em outro(s) processo(s) enquanto grava as já lidas, sem montar o "
+                             "consolidado em memória (sempre com o xlsxwriter; mesma planilha do modo normal)")
+    parser.add_argument("--abas-em-paralelo", action="store_true",
+                        help="Gera o XML das abas de dados em --workers processos e monta a planilha no fim "
+                             "(sempre com o xlsxwriter; mesma planilha do modo normal)")
+    parser.add_argument("--linhas-por-aba", type=_linhas_por_aba, default=LINHAS_POR_ABA, metavar="N",
+                        help=f"Modo --memoria-limitada: linhas de dados por aba (padrão e máximo: {LINHAS_POR_ABA})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos para ler as filhas (e gerar as abas, com --abas-em-paralelo) em paralelo "
+                             "(0 = todos os núcleos; padrão: 1)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Fica observando filhas/ e reconsolida a cada mudança (sem perguntas)")
+    parser.add_argument("--intervalo", type=float, default=2.0,
+                        help="Modo --watch: segundos entre varreduras de filhas/ (padrão: 2)")
+    parser.add_argument("--debounce", type=float, default=5.0,
+                        help="Modo --watch: segundos sem novas mudanças antes de reconsolidar (padrão: 5)")
+    parser.add_argument("--par", nargs=2, action="append", default=[], metavar=("FILHAS", "SAIDA"),
+                        help="Modo lote: consolida a pasta FILHAS em SAIDA (pode repetir; sem perguntas)")
+    parser.add_argument("--pares", metavar="ARQUIVO.json",
+                        help='Modo lote: lista de pastas em JSON, [{"filhas": ..., "saida": ...}, ...]')
+    parser.add_argument("--paralelo", type=int, default=1,
+                        help="Modo lote: quantas pastas consolidar ao mesmo tempo (0 = todos os núcleos; padrão: 1)")
+    parser.add_argument("--resumo", metavar="ARQUIVO.json",
+                        help="Modo lote: grava o resumo JSON neste arquivo (padrão: imprime no stdout)")
+    parser.add_argument("--instrumentar", action="store_true",
+                        help=f"Mede tempo, linhas e memória de cada etapa e de cada filha (no log e em {RELATORIO_EXECUCAO})")
+    parser.add_argument("--instrumentar-memoria", action="store_true",
+                        help="Como --instrumentar, incluindo o pico do tracemalloc por etapa (execução mais lenta)")
+    parser.add_argument("--perfil", metavar="ARQUIVO.prof",
+                        help="Grava um perfil cProfile da execução (só o processo principal)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.perfil:
+        import cProfile
+        perfil = cProfile.Profile()
+        try:
+            return perfil.runcall(executar, args)
+        finally:
+            perfil.dump_stats(args.perfil)
+            print(f"🔬 Perfil salvo em: {args.perfil} (abra com: python -m pstats {args.perfil})", file=sys.stderr)
+    return executar(args)
+
+def executar(args):
+    INSTRUMENTACAO.configurar(args.instrumentar, args.instrumentar_memoria)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    opcoes = dict(motor=args.motor, workers=workers, reconstruir_cache=args.rebuild_cache, backups=args.backups,
+                  comprimir_backups=args.comprimir_backups, metricas_historico=args.metricas_historico,
+                  chave_duplicados=args.chave_duplicados, memoria_limitada=args.memoria_limitada,
+                  linhas_por_aba=args.linhas_por_aba, incremental=args.incremental, pipeline=args.pipeline,
+                  abas_em_paralelo=args.abas_em_paralelo)
+
+    if args.par or args.pares:
+        pares = list(args.par) + (carregar_pares(args.pares) if args.pares else [])
+        paralelo = args.paralelo if args.paralelo > 0 else (os.cpu_count() or 1)
+        resultados = consolidar_lote(pares, paralelo, **opcoes)
+        resumo = {"ok": all(r["ok"] for r in resultados),
+                  "pastas": len(resultados),
+                  "falhas": sum(not r["ok"] for r in resultados),
+                  "resultados": resultados}
+        texto = json.dumps(resumo, ensure_ascii=False, indent=2)
+        if args.resumo:
+            with open(args.resumo, "w", encoding="utf-8") as f:
+                f.write(texto + "\n")
+        else:
+            print(texto)
+        return 0 if resumo["ok"] else 1
+
+    anunciar_base_dir()
+    if args.watch:
+        if not os.path.exists(FILHAS_DIR):
+            raise FileNotFoundError(f"Diretório de filhas não encontrado: {FILHAS_DIR}")
+        if args.rebuild_cache:
+            ler_filhos_com_metricas(reconstruir_cache=True, workers=workers, chave_duplicados=None)
+        # o cache é apagado uma vez só, acima - não a cada reconsolidação
+        observar(args.intervalo, args.debounce, **dict(opcoes, reconstruir_cache=False))
+        return
+
+    try:
+        print("🚀 Iniciando atualização das planilhas...")
+
+        # Verifica se o Excel está aberto e pede ação
+        status_excel = fechar_excel()
+
+        # Se usuário cancelou, encerra
+        if status_excel == 'cancelado':
+            print("\n❌ Operação cancelada.")
+            if getattr(sys, 'frozen', False):
+                input("Pressione ENTER para fechar...")
+            return
+
+        # Verifica se os diretórios existem
+        if not os.path.exists(BASE_DIR):
+            raise FileNotFoundError(f"Diretório base não encontrado: {BASE_DIR}")
+
+        if not os.path.exists(FILHAS_DIR):
+            raise FileNotFoundError(f"Diretório de filhas não encontrado: {FILHAS_DIR}")
+
+        print(f"📁 Procurando arquivos em: {FILHAS_DIR}")
+
+        if args.memoria_limitada or args.pipeline:
+            if status_excel == 'navegador':
+                modo = "--memoria-limitada" if args.memoria_limitada else "--pipeline"
+                print(f"⚠️ O arquivo temporário não está disponível com {modo}: feche o Excel e execute de novo.")
+                return
+            _, logs, metricas = consolidar(**opcoes)
+            print(f"✅ Processo concluído! Arquivo salvo em: {MAE_PATH}")
+            print(f"📝 Log salvo em: {os.path.join(BASE_DIR, 'log_compilacao.txt')}")
+            abrir_planilha_final()
+            if getattr(sys, 'frozen', False):
+                print("\n✅ Processamento finalizado!")
+                input("Pressione ENTER para fechar...")
+            return
+
+        escrever_status("⏳ Atualizando…")
+        df, logs, metricas = ler_filhos_com_metricas(reconstruir_cache=args.rebuild_cache, workers=workers,
+                                                     chave_duplicados=args.chave_duplicados)
+
+        print(f"📊 Encontrados {len(df)} registros para consolidar")
+        for log in logs:
+            print(log)
+
+        if df.empty:
+            print("⚠️ Nenhum dado encontrado para consolidar!")
+
+        # Se escolheu modo navegador, salva temporário e pula salvamento normal
+        if status_excel == 'navegador':
+            abrir_no_navegador(df, motor=args.motor, metricas=metricas)
+            escrever_status(f"📋 Arquivo temporário gerado — {len(df)} linhas (planilha mãe não foi atualizada).")
+
+            # Salvar log em arquivo
+            log_path = salvar_log(logs, len(df), "Execução (MODO TEMPORÁRIO - Excel aberto)")
+            print(f"\n📝 Log salvo em: {log_path}")
+        else:
+            # Modo normal - salva no arquivo principal
+            log_path = gravar_consolidado(df, logs, metricas, args.motor, args.backups, args.comprimir_backups,
+                                          metricas_historico=args.metricas_historico,
+                                          chave_duplicados=args.chave_duplicados, incremental=args.incremental,
+                                          abas_em_paralelo=workers if args.abas_em_paralelo else 0)
+
+            print(f"✅ Processo concluído! Arquivo salvo em: {MAE_PATH}")
+            print(f"📝 Log salvo em: {log_path}")
+
+            # Abre a planilha final (com opção de escolha)
+            abrir_planilha_final()
+
+        # Pausa para ver o resultado (apenas quando executado como exe)
+        if getattr(sys, 'frozen', False):
+            print("\n✅ Processamento finalizado!")
+            input("Pressione ENTER para fechar...")
+
+    except Exception as e:
+        error_msg = f"❌ Erro na atualização: {e}"
+        print(error_msg)
+        escrever_status(error_msg)
+
+        # Salva erro no log
+        try:
+            log_path = os.path.join(BASE_DIR, "log_compilacao.txt")
+            with open(log_path, "w", encoding="utf-8") as f:
+                f.write(f"ERRO em {datetime.now()}\n")
+                f.write(f"{error_msg}\n")
+                f.write(f"Detalhes: {str(e)}")
         except:
             pass
-        
+
         # Tenta abrir planilha mesmo em caso de erro (se existir)
         if os.path.exists(MAE_PATH):
             print("🔄 Tentando abrir planilha existente...")
             abrir_planilha_final()
-        
+
         # Pausa para ver o erro (apenas quando executado como exe)
         if getattr(sys, 'frozen', False):
             print("\n❌ Erro durante o processamento!")
             input("Pressione ENTER para fechar...")
-        
+
         raise
 
 if __name__ == "__main__":
-    main()
+    # Necessário para o pool de processos no executável (PyInstaller/Windows)
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,449 @@
+"""
+Benchmark da consolidação com planilhas filhas sintéticas.
+
+Gera filhas no padrão NOME_SOBRENOME - ATENDIMENTOS - DD-MM-AA.xlsm com as colunas de
+COLS_ESPERADAS (textos com quebra de linha, durações, datas e linhas vazias formatadas no
+final, como nos modelos dos operadores) e mede cada etapa separadamente:
+
+  leitura      ler_planilha_filha (openpyxl read-only)
+  filtragem    resto de _ler_arquivo_filho (linhas vazias, PRIMEIRO_NOME, DATA_ARQUIVO)
+  concat       junção das filhas (concatenar_filhas, mantém as categorias)
+  metricas     MetricasParciais por filha + combinação
+  preparo      ColunasPreparadas e posições por pessoa
+  escrita_abas células de todas as abas (COMPILE GERAL, MÉTRICAS, pessoas, STATUS)
+  formatacao   larguras de coluna e registro de estilos
+  gravacao     wb.save / wb.close e troca atômica do arquivo
+
+Cada etapa conta só o próprio tempo (chamadas aninhadas vão para a etapa de dentro).
+Cada cenário roda num processo novo, para o pico de memória (RSS) ser só dele. Também
+registra a memória do frame consolidado (memory_usage(deep=True)).
+
+Uso:
+    python scripts/benchmark_consolidacao.py --arquivos 30 --linhas 300 --operadores 8
+    python scripts/benchmark_consolidacao.py --suite                    # compara com o baseline
+    python scripts/benchmark_consolidacao.py --suite --salvar-baseline  # grava um baseline novo
+    python scripts/benchmark_consolidacao.py --pipeline --workers 2     # sequencial x pipeline
+    python scripts/benchmark_consolidacao.py --abas-em-paralelo --workers 4  # gravação num processo x em 4
+"""
+import os, sys, glob, json, time, random, shutil, argparse, tempfile, subprocess, contextlib, statistics
+from datetime import datetime, timedelta
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+import atualizar_planilhas as ap
+
+BASELINE_PATH = os.path.join(SCRIPTS_DIR, "benchmark_baseline.json")
+ETAPAS = ["leitura", "filtragem", "concat", "metricas", "preparo", "escrita_abas", "formatacao", "gravacao"]
+CENARIOS = {
+    "pequeno": dict(arquivos=5, linhas=100, operadores=3),
+    "medio": dict(arquivos=30, linhas=300, operadores=8),
+    "grande": dict(arquivos=60, linhas=400, operadores=20),
+}
+MOTORES = ["openpyxl", "xlsxwriter"]
+TOLERANCIA = 0.25      # regressão: mais de 25% acima do baseline...
+FOLGA_MINIMA_S = 0.2   # ...e pelo menos 200 ms (ruído em cenários pequenos)
+
+# ===== GERADOR DE FILHAS =====
+NOMES = ["AMANDA", "RAPHAELA", "JOAO", "MARIA", "PEDRO", "JULIANA", "LUCAS", "FERNANDA", "RAFAEL",
+         "BEATRIZ", "GABRIEL", "LARISSA", "MATEUS", "CAMILA", "THIAGO", "LETICIA", "GUSTAVO", "PATRICIA",
+         "BRUNO", "VANESSA", "DIEGO", "ALINE", "RODRIGO", "CONCEIÇÃO"]
+SOBRENOMES = ["PINHEIRO", "MARQUES", "SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "LIMA", "PEREIRA", "COSTA", "ARAÚJO"]
+CLIENTES = ["Poupacred", "Fontanella ", "Banco Alfa", "Credimais", "Sul Financeira", "Prime Consig"]
+SETORES = ["Financeiro", "Parceiro", "Compliance", "Conta", "Operacional"]
+SOLICITACOES = ["Liquidação Manual", "Cancelamento/Desaverbação - Financeiro", "Limite", "Reprocessar",
+                "Portabilidade", "Segunda via de boleto", "Alteração cadastral"]
+OBSERVACOES = ["Cliente retornou por telefone.", "Cancelamento de FGTS, desistencia dentro do prazo de sete dias. ",
+               "Aguardando retorno do parceiro", "Enviado para análise do setor responsável com todos os documentos anexados"]
+
+FORMATO_DATA = "m/d/yy h:mm"
+FORMATO_DURACAO = "[h]:mm:ss"
+
+def _nome_operador(i):
+    """Primeiros nomes distintos para qualquer quantidade de operadores (só letras, como exige NOME_REGEX)"""
+    nome = NOMES[i % len(NOMES)]
+    volta = i // len(NOMES)
+    while volta:
+        volta, resto = divmod(volta - 1, 26)
+        nome += chr(ord("A") + resto)
+    return nome, SOBRENOMES[i % len(SOBRENOMES)]
+
+def _duracao(segundos):
+    return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+
+def _texto(rnd, opcoes, prob_quebra):
+    texto = rnd.choice(opcoes)
+    if rnd.random() < prob_quebra:
+        texto += "\n" + rnd.choice(OBSERVACOES)
+    return texto
+
+def gerar_filhas(pasta, arquivos, linhas, operadores, vazias=800, semente=42):
+    """
+    Gera `arquivos` filhas com `linhas` atendimentos cada, distribuídas entre `operadores`
+    (um arquivo por operador por dia), com extensão .xlsm como os modelos. Os valores são
+    gravados como os modelos guardam o resultado das fórmulas (SETOR e TIME SPENT como
+    texto); depois vêm `vazias` linhas só formatadas e a linha "Total".
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    rnd = random.Random(semente)
+    os.makedirs(pasta, exist_ok=True)
+    inicio_periodo = datetime(2025, 10, 1)
+    cabecalho = [("CLIENTE " if c == "CLIENTE" else c) for c in ap.COLS_ESPERADAS]  # espaço extra do modelo
+    caminhos = []
+    for k in range(arquivos):
+        nome, sobrenome = _nome_operador(k % operadores)
+        dia = inicio_periodo + timedelta(days=k // operadores)
+        separador = " - " if k % 3 else "_"
+        caminho = os.path.join(pasta, f"{nome}_{sobrenome} - ATENDIMENTOS{separador}{dia:%d-%m-%y}.xlsm")
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("ATENDIMENTOS")
+        ws.append(cabecalho)
+        momento = dia + timedelta(hours=8)
+
+        def celula(valor, formato=None):
+            cell = WriteOnlyCell(ws, value=valor)
+            if formato:
+                cell.number_format = formato
+            return cell
+
+        for _ in range(linhas):
+            momento += timedelta(seconds=rnd.randint(30, 900))
+            gasto = rnd.randint(5, 600)
+            setor = rnd.randint(60, 6 * 3600)
+            finalizar = momento + timedelta(seconds=gasto)
+            operacao = rnd.randint(4100000, 4199999)
+            ws.append([
+                celula(momento, FORMATO_DATA),
+                nome.title(),
+                f"{operacao}\t" if rnd.random() < 0.1 else operacao,
+                rnd.choice(CLIENTES),
+                _texto(rnd, SOLICITACOES, 0.15),
+                rnd.choice(SETORES),
+                _texto(rnd, OBSERVACOES, 0.3) if rnd.random() < 0.4 else None,
+                celula(finalizar, FORMATO_DATA),
+                celula(_duracao(gasto), FORMATO_DURACAO),
+                celula(finalizar + timedelta(seconds=setor), FORMATO_DATA),
+                celula(_duracao(setor), FORMATO_DURACAO),
+            ])
+        for _ in range(vazias):
+            ws.append([celula(None, FORMATO_DURACAO if i in (7, 8, 9, 10) else "General")
+                       for i in range(len(cabecalho))])
+        ws.append(["Total"])
+        wb.save(caminho)
+        caminhos.append(caminho)
+    return caminhos
+
+# ===== MEDIÇÃO =====
+class Cronometro:
+    """Tempo próprio por etapa: funções envolvidas empilham a etapa e descontam as aninhadas"""
+
+    def __init__(self):
+        self.tempos = dict.fromkeys(ETAPAS, 0.0)
+        self._pilha = []      # [etapa, tempo dos filhos]
+        self._originais = []  # (alvo, nome, original) para restaurar
+
+    def etapa(self, nome, funcao):
+        def medida(*args, **kwargs):
+            self._pilha.append([nome, 0.0])
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                decorrido = time.perf_counter() - inicio
+                _, filhos = self._pilha.pop()
+                self.tempos[nome] += decorrido - filhos
+                if self._pilha:
+                    self._pilha[-1][1] += decorrido
+        return medida
+
+    def envolver(self, alvo, nome_funcao, etapa):
+        original = alvo.__dict__[nome_funcao] if isinstance(alvo, type) else getattr(alvo, nome_funcao)
+        self._originais.append((alvo, nome_funcao, original))
+        if isinstance(original, classmethod):
+            funcao = original.__func__
+            setattr(alvo, nome_funcao, classmethod(self.etapa(etapa, funcao)))
+        else:
+            setattr(alvo, nome_funcao, self.etapa(etapa, original))
+
+    def restaurar(self):
+        for alvo, nome_funcao, original in reversed(self._originais):
+            setattr(alvo, nome_funcao, original)
+        self._originais.clear()
+
+def medir(pasta, motor="openpyxl"):
+    """Roda leitura + gravação da pasta uma vez (sem cache) e devolve o tempo de cada etapa"""
+    import openpyxl.workbook.workbook
+    import xlsxwriter.workbook
+
+    cron = Cronometro()
+    cron.envolver(ap, "ler_planilha_filha", "leitura")
+    cron.envolver(ap, "_ler_arquivo_filho", "filtragem")
+    cron.envolver(ap.MetricasParciais, "do_dataframe", "metricas")
+    cron.envolver(ap, "combinar_metricas", "metricas")
+    cron.envolver(ap.ColunasPreparadas, "do_dataframe", "preparo")
+    cron.envolver(ap.ColunasPreparadas, "fatia", "preparo")
+    cron.envolver(ap, "_posicoes_por_pessoa", "preparo")
+    for nome in ("_salvar_com_openpyxl", "_salvar_com_xlsxwriter", "escrever_aba", "escrever_aba_streaming"):
+        cron.envolver(ap, nome, "escrita_abas")
+    cron.envolver(ap, "aplicar_formatacao", "formatacao")
+    cron.envolver(ap, "registrar_estilos", "formatacao")
+    cron.envolver(ap.ColunasPreparadas, "larguras", "formatacao")
+    cron.envolver(ap, "salvar_no_excel", "gravacao")
+    cron.envolver(openpyxl.workbook.workbook.Workbook, "save", "gravacao")
+    cron.envolver(xlsxwriter.workbook.Workbook, "close", "gravacao")
+
+    arquivos = sorted(glob.glob(os.path.join(pasta, "*.xlsx")) + glob.glob(os.path.join(pasta, "*.xlsm")))
+    destino = os.path.join(tempfile.mkdtemp(prefix="bench_saida_"), "PLANILHA_MAE.xlsx")
+    inicio = time.perf_counter()
+    try:
+        dfs, parciais, logs = [], [], []
+        for arq in arquivos:
+            df_filtrado, log, _ = ap._ler_arquivo_filho(arq)
+            logs.append(log)
+            if df_filtrado is not None:
+                dfs.append(df_filtrado)
+                parciais.append(ap.MetricasParciais.do_dataframe(df_filtrado))
+        metricas = ap.combinar_metricas(parciais)
+
+        t = time.perf_counter()
+        df = ap.concatenar_filhas(dfs)
+        cron.tempos["concat"] += time.perf_counter() - t
+
+        ap.salvar_no_excel(df, motor=motor, metricas=metricas, status="benchmark", destino=destino, backups=0)
+    finally:
+        cron.restaurar()
+        total = time.perf_counter() - inicio
+        shutil.rmtree(os.path.dirname(destino), ignore_errors=True)
+
+    rejeitados = [log for log in logs if not log.startswith("✅")]
+    if rejeitados:
+        raise RuntimeError(f"filhas sintéticas rejeitadas: {rejeitados[:3]}")
+    return {"total": total, "linhas": len(df), "memoria_df_mb": round(df.memory_usage(deep=True).sum() / 2**20, 1),
+            **cron.tempos}
+
+def _aquecer(pasta, motor):
+    """Uma leitura e uma gravação pequenas fora da medição (imports tardios, caches do openpyxl)"""
+    primeira = sorted(glob.glob(os.path.join(pasta, "*.xlsm")))[0]
+    df, _, _ = ap._ler_arquivo_filho(primeira)
+    with tempfile.TemporaryDirectory(prefix="bench_aquecimento_") as temp:
+        ap.salvar_no_excel(df.head(10), motor=motor, status="aquecimento",
+                           destino=os.path.join(temp, "PLANILHA_MAE.xlsx"), backups=0)
+
+def rodar_cenario(arquivos, linhas, operadores, motor="openpyxl", repeticoes=1, pasta=None, vazias=800):
+    """Gera (se preciso) e mede um cenário; tempos são a mediana das repetições"""
+    temporaria = pasta is None
+    pasta = pasta or tempfile.mkdtemp(prefix="bench_filhas_")
+    try:
+        if not glob.glob(os.path.join(pasta, "*.xlsm")):
+            print(f"🏭 Gerando {arquivos} filha(s) x {linhas} linhas ({operadores} operadores)...", file=sys.stderr)
+            gerar_filhas(pasta, arquivos, linhas, operadores, vazias)
+        with contextlib.redirect_stdout(sys.stderr):
+            _aquecer(pasta, motor)
+            medidas = [medir(pasta, motor) for _ in range(repeticoes)]
+    finally:
+        if temporaria:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    linhas_total = medidas[0]["linhas"]
+    tempos = {chave: round(statistics.median(m[chave] for m in medidas), 4) for chave in ["total"] + ETAPAS}
+    return {
+        "parametros": {"arquivos": arquivos, "linhas": linhas, "operadores": operadores, "motor": motor},
+        "linhas_consolidadas": linhas_total,
+        "segundos": tempos,
+        "linhas_por_segundo": {chave: (round(linhas_total / seg) if seg > 0 else None) for chave, seg in tempos.items()},
+        "pico_rss_mb": ap.pico_rss_mb(),
+        "memoria_df_mb": medidas[0]["memoria_df_mb"],
+        "python": sys.version.split()[0],
+        "data": datetime.now().isoformat(timespec="seconds"),
+    }
+
+def _rodar_em_processo_novo(parametros, repeticoes, pasta):
+    comando = [sys.executable, os.path.abspath(__file__), "--json", "-", "--repeticoes", str(repeticoes),
+               "--arquivos", str(parametros["arquivos"]), "--linhas", str(parametros["linhas"]),
+               "--operadores", str(parametros["operadores"]), "--motor", parametros["motor"], "--pasta", pasta]
+    saida = subprocess.run(comando, stdout=subprocess.PIPE, check=True, text=True, encoding="utf-8")
+    return json.loads(saida.stdout)
+
+# ===== PIPELINE =====
+def _partes_da_planilha(caminho):
+    """Partes do xlsx que devem ser iguais entre dois modos (sem a data de criação e a aba STATUS)"""
+    import zipfile
+    with zipfile.ZipFile(caminho) as zf:
+        status = ap._partes_das_abas(zf).get(ap.ABA_STATUS)
+        return {nome: zf.read(nome) for nome in zf.namelist() if nome not in ("docProps/core.xml", status)}
+
+def medir_pipeline(pasta, workers=1, repeticoes=1, chave_duplicados=ap.CHAVE_DUPLICADOS):
+    """
+    Consolidação completa (consolidar, cache frio, motor xlsxwriter) no modo normal e em pipeline;
+    devolve a mediana de cada um e falha se as planilhas não forem iguais.
+    """
+    modos = {"sequencial": False, "pipeline": True}
+    tempos = {modo: [] for modo in modos}
+    for _ in range(repeticoes):
+        partes = {}
+        for modo, pipeline in modos.items():
+            with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as saida:
+                inicio = time.perf_counter()
+                with contextlib.redirect_stdout(sys.stderr):
+                    ap.consolidar(motor="xlsxwriter", workers=workers, backups=0, filhas_dir=pasta, saida_dir=saida,
+                                  chave_duplicados=chave_duplicados, pipeline=pipeline)
+                tempos[modo].append(time.perf_counter() - inicio)
+                partes[modo] = _partes_da_planilha(os.path.join(saida, "PLANILHA_MAE.xlsx"))
+        if partes["sequencial"] != partes["pipeline"]:
+            raise RuntimeError("a planilha gerada em pipeline difere da sequencial")
+    segundos = {modo: round(statistics.median(t), 3) for modo, t in tempos.items()}
+    return {"workers": workers, "nucleos": os.cpu_count(), "deduplicar": bool(chave_duplicados),
+            "segundos": segundos, "aceleracao": round(segundos["sequencial"] / segundos["pipeline"], 2)}
+
+# ===== ABAS EM PARALELO =====
+def medir_abas_em_paralelo(pasta, workers=1, repeticoes=1):
+    """
+    Só a gravação da planilha mãe (salvar_no_excel) do mesmo consolidado: xlsxwriter num processo e
+    com as abas em `workers` processos; devolve a mediana de cada um e falha se as planilhas diferirem.
+    """
+    with tempfile.TemporaryDirectory(prefix="bench_abas_") as saida:
+        with contextlib.redirect_stdout(sys.stderr):
+            df, _, metricas = ap.ler_filhos_com_metricas(filhas_dir=pasta, cache_dir=os.path.join(saida, "cache"))
+        modos = {"sequencial": dict(motor="xlsxwriter"), "paralelo": dict(abas_em_paralelo=max(1, workers))}
+        tempos = {modo: [] for modo in modos}
+        for _ in range(repeticoes):
+            partes = {}
+            for modo, opcoes in modos.items():
+                destino = os.path.join(saida, f"{modo}.xlsx")
+                inicio = time.perf_counter()
+                with contextlib.redirect_stdout(sys.stderr):
+                    ap.salvar_no_excel(df, metricas=metricas, status="benchmark", destino=destino, backups=0, **opcoes)
+                tempos[modo].append(time.perf_counter() - inicio)
+                partes[modo] = _partes_da_planilha(destino)
+            if partes["sequencial"] != partes["paralelo"]:
+                raise RuntimeError("a planilha gerada com as abas em paralelo difere da sequencial")
+    segundos = {modo: round(statistics.median(t), 3) for modo, t in tempos.items()}
+    return {"workers": workers, "nucleos": os.cpu_count(), "linhas": len(df),
+            "abas_pessoas": int(df["PRIMEIRO_NOME"].nunique()), "segundos": segundos, "aceleracao": round(segundos["sequencial"] / segundos["paralelo"], 2)}
+
+# ===== RELATÓRIO E BASELINE =====
+def imprimir_resultado(nome, resultado):
+    p = resultado["parametros"]
+    print(f"\n📊 {nome}: {p['arquivos']} arquivo(s) x {p['linhas']} linhas, {p['operadores']} operadores, "
+          f"motor {p['motor']} - {resultado['linhas_consolidadas']} linhas, pico RSS {resultado['pico_rss_mb']} MB, "
+          f"frame {resultado.get('memoria_df_mb', '-')} MB")
+    for chave in ETAPAS + ["total"]:
+        seg = resultado["segundos"][chave]
+        por_seg = resultado["linhas_por_segundo"][chave]
+        print(f"   {chave:<13} {seg:>9.3f} s   {por_seg if por_seg is not None else '-':>10} linhas/s")
+
+def comparar_com_baseline(nome, resultado, baseline, tolerancia=TOLERANCIA):
+    """Devolve a lista de regressões (etapas acima do baseline além da tolerância)"""
+    base = baseline.get(nome)
+    if not base or base["parametros"] != resultado["parametros"]:
+        print(f"   ⚠️ Sem baseline para {nome}")
+        return []
+    regressoes = []
+    for chave in ["total"] + ETAPAS:
+        antes, agora = base["segundos"][chave], resultado["segundos"][chave]
+        if agora > antes * (1 + tolerancia) and agora - antes > FOLGA_MINIMA_S:
+            regressoes.append(f"{nome}/{chave}: {antes:.3f}s -> {agora:.3f}s")
+    variacao = (resultado["segundos"]["total"] / base["segundos"]["total"] - 1) * 100
+    print(f"   {'❌' if regressoes else '✅'} total {variacao:+.1f}% em relação ao baseline")
+    return regressoes
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da consolidação com filhas sintéticas")
+    parser.add_argument("--arquivos", type=int, default=20, help="Quantidade de filhas (padrão: 20)")
+    parser.add_argument("--linhas", type=int, default=200, help="Atendimentos por filha (padrão: 200)")
+    parser.add_argument("--operadores", type=int, default=5, help="Operadores distintos (padrão: 5)")
+    parser.add_argument("--vazias", type=int, default=800, help="Linhas vazias formatadas no fim de cada filha")
+    parser.add_argument("--motor", choices=MOTORES, default="openpyxl")
+    parser.add_argument("--repeticoes", type=int, default=1, help="Repetições por cenário (usa a mediana)")
+    parser.add_argument("--pasta", help="Usa/gera as filhas nesta pasta (mantida entre execuções)")
+    parser.add_argument("--suite", action="store_true", help="Roda os cenários padrão com os dois motores")
+    parser.add_argument("--cenarios", nargs="+", choices=list(CENARIOS), default=list(CENARIOS),
+                        help="Cenários da --suite (padrão: todos)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Arquivo de baseline (padrão: scripts/benchmark_baseline.json)")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava o resultado como novo baseline")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Regressão aceita (0.25 = 25%%)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Compara a consolidação completa sequencial e em pipeline (motor xlsxwriter, cache frio)")
+    parser.add_argument("--abas-em-paralelo", action="store_true",
+                        help="Compara a gravação da planilha mãe num processo e com as abas em --workers processos")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Modos --pipeline e --abas-em-paralelo: processos de leitura/gravação (padrão: 1)")
+    parser.add_argument("--sem-deduplicar", action="store_true", help="Modo --pipeline: sem remoção de repetidos")
+    parser.add_argument("--json", metavar="ARQUIVO", help="Grava os resultados em JSON ('-' = stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.pipeline or args.abas_em_paralelo:
+        with contextlib.ExitStack() as pilha:
+            pasta = args.pasta or pilha.enter_context(tempfile.TemporaryDirectory(prefix="bench_filhas_"))
+            if not glob.glob(os.path.join(pasta, "*.xlsm")):
+                print(f"🏭 Gerando {args.arquivos} filha(s) x {args.linhas} linhas ({args.operadores} operadores)...",
+                      file=sys.stderr)
+                gerar_filhas(pasta, args.arquivos, args.linhas, args.operadores, args.vazias)
+            if args.pipeline:
+                resultado = medir_pipeline(pasta, args.workers, args.repeticoes,
+                                           None if args.sem_deduplicar else ap.CHAVE_DUPLICADOS)
+            else:
+                resultado = medir_abas_em_paralelo(pasta, args.workers, args.repeticoes)
+        s = resultado["segundos"]
+        if args.pipeline:
+            print(f"\n🔀 Pipeline ({args.workers} processo(s) de leitura, {resultado['nucleos']} núcleo(s)): "
+                  f"sequencial {s['sequencial']:.3f} s, pipeline {s['pipeline']:.3f} s - {resultado['aceleracao']}x "
+                  f"(planilhas idênticas)")
+        else:
+            print(f"\n🧵 Gravação de {resultado['linhas']} linhas e {resultado['abas_pessoas']} aba(s) por pessoa "
+                  f"({args.workers} processo(s), {resultado['nucleos']} núcleo(s)): num processo {s['sequencial']:.3f} s, "
+                  f"abas em paralelo {s['paralelo']:.3f} s - {resultado['aceleracao']}x (planilhas idênticas)")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(resultado, f, ensure_ascii=False, indent=2)
+        return 0
+
+    if args.suite:
+        resultados = {}
+        for nome in args.cenarios:
+            # As mesmas filhas servem para os dois motores
+            with tempfile.TemporaryDirectory(prefix="bench_filhas_") as pasta:
+                for motor in MOTORES:
+                    chave = f"{nome}-{motor}"
+                    print(f"⏱️ {chave}...", file=sys.stderr)
+                    resultados[chave] = _rodar_em_processo_novo(dict(CENARIOS[nome], motor=motor),
+                                                                args.repeticoes, pasta)
+    else:
+        resultado = rodar_cenario(args.arquivos, args.linhas, args.operadores, args.motor,
+                                  args.repeticoes, args.pasta, args.vazias)
+        if args.json == "-":
+            print(json.dumps(resultado, ensure_ascii=False))
+            return 0
+        resultados = {f"{args.arquivos}x{args.linhas}-{args.operadores}op-{args.motor}": resultado}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressoes = []
+    for nome, resultado in resultados.items():
+        imprimir_resultado(nome, resultado)
+        if not args.salvar_baseline:
+            regressoes += comparar_com_baseline(nome, resultado, baseline, args.tolerancia)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    if args.salvar_baseline:
+        baseline.update(resultados)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Baseline salvo em: {args.baseline}")
+        return 0
+
+    for regressao in regressoes:
+        print(f"❌ Regressão: {regressao}")
+    return 1 if regressoes else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
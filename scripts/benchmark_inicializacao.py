@@ -0,0 +1,121 @@
+"""
+Benchmark de inicialização do atualizar_planilhas.
+
+Mede, em processos novos (como o usuário abrindo o programa):
+  - import: tempo para importar o módulo, descontado o início do próprio Python;
+  - primeira saída: do início do processo até a primeira mensagem na tela;
+  - pandas: confere que o import do módulo não carrega pandas/numpy/openpyxl.
+
+Sai com código 1 se algum tempo passar do orçamento, para pegar regressões quando
+novas funcionalidades acrescentarem imports pesados no topo do módulo.
+
+Uso:
+    python scripts/benchmark_inicializacao.py
+    python scripts/benchmark_inicializacao.py --executavel dist/atualizar_planilhas.exe
+"""
+import os, sys, json, time, argparse, tempfile, subprocess, statistics
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(SCRIPTS_DIR, "atualizar_planilhas.py")
+MODULOS_PESADOS = ["pandas", "numpy", "openpyxl", "xlsxwriter"]
+
+# Orçamentos padrão (ms) - folgados para PCs lentos; ajuste com --orcamento-*
+ORCAMENTO_IMPORT_MS = 150
+ORCAMENTO_PRIMEIRA_SAIDA_MS = 400
+
+def _mediana_ms(amostras):
+    return round(statistics.median(amostras) * 1000, 1)
+
+def medir_import(repeticoes):
+    """Tempo de import do módulo (em processo novo) e módulos pesados carregados por ele"""
+    codigo = (
+        "import sys, time, json; sys.path.insert(0, %r); "
+        "t = time.perf_counter(); import atualizar_planilhas; t = time.perf_counter() - t; "
+        "print(json.dumps([t, [m for m in %r if m in sys.modules]]))"
+    ) % (SCRIPTS_DIR, MODULOS_PESADOS)
+    tempos, carregados = [], set()
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+        tempo, pesados = json.loads(saida.stdout.strip().splitlines()[-1])
+        tempos.append(tempo)
+        carregados.update(pesados)
+    return tempos, sorted(carregados)
+
+def medir_primeira_saida(comando, repeticoes):
+    """
+    Do início do processo até a primeira linha impressa (stdout ou stderr).
+    Roda o modo lote com uma pasta inexistente: nada é lido nem gravado e não há perguntas.
+    """
+    tempos = []
+    with tempfile.TemporaryDirectory() as temp:
+        args = comando + ["--par", os.path.join(temp, "nao_existe"), os.path.join(temp, "saida")]
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            proc.stdout.readline()
+            tempos.append(time.perf_counter() - inicio)
+            proc.communicate()
+    return tempos
+
+def medir_python_vazio(repeticoes):
+    """Início do interpretador sozinho (descontado dos tempos do script)"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização do atualizar_planilhas")
+    parser.add_argument("--repeticoes", type=int, default=7, help="Execuções por medida (usa a mediana)")
+    parser.add_argument("--executavel", help="Mede o .exe gerado pelo PyInstaller em vez do script")
+    parser.add_argument("--orcamento-import-ms", type=float, default=ORCAMENTO_IMPORT_MS)
+    parser.add_argument("--orcamento-primeira-saida-ms", type=float, default=ORCAMENTO_PRIMEIRA_SAIDA_MS)
+    parser.add_argument("--json", metavar="ARQUIVO", help="Grava o resultado em JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"⏱️ Medindo inicialização ({args.repeticoes} repetições, mediana)...")
+
+    tempos_import, carregados = medir_import(args.repeticoes)
+    if args.executavel:
+        comando, base = [os.path.abspath(args.executavel)], 0.0
+    else:
+        comando = [sys.executable, SCRIPT]
+        base = _mediana_ms(medir_python_vazio(args.repeticoes))
+    primeira_saida = _mediana_ms(medir_primeira_saida(comando, args.repeticoes)) - base
+
+    resultado = {
+        "import_ms": _mediana_ms(tempos_import),
+        "primeira_saida_ms": round(primeira_saida, 1),
+        "python_vazio_ms": base,
+        "modulos_pesados_no_import": carregados,
+        "orcamento_import_ms": args.orcamento_import_ms,
+        "orcamento_primeira_saida_ms": args.orcamento_primeira_saida_ms,
+    }
+    print(f"📦 Import do módulo: {resultado['import_ms']} ms (orçamento {args.orcamento_import_ms:g} ms)")
+    print(f"💬 Primeira saída: {resultado['primeira_saida_ms']} ms além do Python "
+          f"(orçamento {args.orcamento_primeira_saida_ms:g} ms)")
+
+    falhas = []
+    if carregados:
+        falhas.append(f"o import carrega módulos pesados: {', '.join(carregados)}")
+    if resultado["import_ms"] > args.orcamento_import_ms:
+        falhas.append("import acima do orçamento")
+    if resultado["primeira_saida_ms"] > args.orcamento_primeira_saida_ms:
+        falhas.append("primeira saída acima do orçamento")
+    resultado["ok"] = not falhas
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if not falhas:
+        print("✅ Inicialização dentro do orçamento")
+    return 0 if not falhas else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
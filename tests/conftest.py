@@ -0,0 +1,66 @@
+import os, sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import atualizar_planilhas as ap
+
+def atendimento(momento, responsavel="Ana", cliente="Banco Alfa", solicitacao="Limite", setor="Financeiro",
+                minutos=10, finalizar=True, operacao=4100000, observacoes=None):
+    """
+    Linha de uma filha na ordem de COLS_ESPERADAS (datas e durações como o Excel guarda).
+    finalizar: True = momento + minutos, False = vazio, ou o valor da célula.
+    """
+    fim = momento + timedelta(minutes=minutos) if momento else None
+    return [momento, responsavel, operacao, cliente, solicitacao, setor, observacoes,
+            fim if finalizar is True else finalizar or None, f"00:{minutos:02d}:00",
+            fim and fim + timedelta(hours=1), "01:00:00"]
+
+def criar_filha(pasta, nome, linhas):
+    """Grava uma filha (.xlsm, como os modelos) com o cabeçalho de COLS_ESPERADAS e as linhas dadas; devolve o caminho"""
+    from openpyxl import Workbook
+    os.makedirs(pasta, exist_ok=True)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "ATENDIMENTOS"
+    ws.append(ap.COLS_ESPERADAS)
+    for linha in linhas:
+        ws.append(linha)
+    caminho = os.path.join(pasta, nome)
+    wb.save(caminho)
+    return caminho
+
+def dia(d, hora=8, minuto=0):
+    return datetime(2025, 10, d, hora, minuto)
+
+@pytest.fixture
+def pastas(tmp_path):
+    """filhas/ e saída vazias num diretório temporário"""
+    filhas, saida = tmp_path / "filhas", tmp_path / "saida"
+    filhas.mkdir()
+    saida.mkdir()
+    return str(filhas), str(saida)
+
+@pytest.fixture
+def programa(tmp_path, monkeypatch):
+    """Pasta do programa num diretório temporário, sem Excel e sem perguntas; devolve a pasta de filhas"""
+    base = tmp_path / "programa"
+    filhas = base / "filhas"
+    monkeypatch.setattr(ap, "BASE_DIR", str(base))
+    monkeypatch.setattr(ap, "FILHAS_DIR", str(filhas))
+    monkeypatch.setattr(ap, "MAE_PATH", str(base / "PLANILHA_MAE.xlsx"))
+    monkeypatch.setattr(ap, "STATUS_PATH", str(base / "status_atualizacao.txt"))
+    monkeypatch.setattr(ap, "CACHE_DIR", str(base / "cache_filhas"))
+    monkeypatch.setattr(ap, "fechar_excel", lambda: "livre")
+    monkeypatch.setattr(ap, "abrir_planilha_final", lambda: None)
+    criar_filha(str(filhas), "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", [atendimento(dia(1, 8))])
+    criar_filha(str(filhas), "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm", [atendimento(dia(1, 9), responsavel="Bia")])
+    return str(filhas)
+
+def partes_do_zip(caminho):
+    """Partes de um xlsx (nome -> bytes) sem as que mudam a cada execução: data de criação e aba STATUS"""
+    import zipfile
+    with zipfile.ZipFile(caminho) as zf:
+        status = ap._partes_das_abas(zf)[ap.ABA_STATUS]
+        return {nome: zf.read(nome) for nome in zf.namelist() if nome not in ("docProps/core.xml", status)}
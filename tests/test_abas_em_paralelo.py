@@ -0,0 +1,60 @@
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia, partes_do_zip
+
+PESSOAS = {"ANA_SILVA": "Ana", "BIA_COSTA": "Bia", "CAIO_LIMA": "Caio"}
+
+def criar_filhas(filhas, linhas=15, dia_do_mes=1):
+    for k, (arquivo, nome) in enumerate(PESSOAS.items()):
+        criar_filha(filhas, f"{arquivo} - ATENDIMENTOS - {dia_do_mes:02d}-10-25.xlsm", [
+            atendimento(dia(dia_do_mes, 8 + k, m), responsavel=nome, minutos=m % 50 + 1,
+                        setor=("Financeiro", "Parceiro", None)[m % 3], finalizar=m % 4 > 0,
+                        observacoes=f"linha {m}\ncom quebra" if m % 5 == 0 else None)
+            for m in range(linhas)])
+
+def gravar(df, destino, workers=0):
+    ap.salvar_no_excel(df, motor="xlsxwriter", status="✅", destino=destino, backups=0, abas_em_paralelo=workers)
+    return destino
+
+def test_blocos_de_linhas():
+    assert ap._blocos_de_linhas(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert ap._blocos_de_linhas(2, 5) == [(0, 1), (1, 2)]
+    assert ap._blocos_de_linhas(0, 4) == [(0, 0)]
+
+@pytest.mark.parametrize("workers", [1, 2, 3, 7])
+def test_mesmas_partes_da_gravacao_num_processo(pastas, tmp_path, workers):
+    filhas, _ = pastas
+    criar_filhas(filhas)
+    df, _, _ = ap.ler_filhos_com_metricas(usar_cache=False, filhas_dir=filhas)
+    assert len(ap._blocos_de_linhas(len(df), workers)) == workers  # COMPILE GERAL em `workers` blocos
+    unico = gravar(df, str(tmp_path / "unico.xlsx"))
+    paralelo = gravar(df, str(tmp_path / "paralelo.xlsx"), workers)
+    assert partes_do_zip(paralelo) == partes_do_zip(unico)
+
+    wb = load_workbook(paralelo)
+    assert wb["COMPILE GERAL"].max_row == len(df) + 1
+    assert wb["Bia"]["B16"].value == "Bia"
+    assert not any(os.path.basename(nome).startswith(".~abas_") for nome in os.listdir(tmp_path))
+
+def test_com_gravacao_incremental(pastas, tmp_path, capsys):
+    filhas, saida = pastas
+    criar_filhas(filhas)
+    opcoes = dict(motor="xlsxwriter", incremental=True, abas_em_paralelo=True, workers=3, backups=0,
+                  filhas_dir=filhas, saida_dir=saida)
+    ap.consolidar(**opcoes)
+    # Um dia novo só para a Ana: COMPILE GERAL e Ana vão para os processos, Bia e Caio são reaproveitadas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 02-10-25.xlsm",
+                [atendimento(dia(2, 8, m), responsavel="Ana") for m in range(5)])
+    capsys.readouterr()
+    df, _, metricas = ap.consolidar(**opcoes)
+    saida_tela = capsys.readouterr().out
+    assert "2 aba(s) reaproveitada(s), 2 gerada(s) de novo" in saida_tela
+    assert "🧵 Planilha: 2 aba(s) de dados geradas em 4 bloco(s)" in saida_tela  # COMPILE GERAL em 3
+
+    unico = str(tmp_path / "unico.xlsx")
+    ap.salvar_no_excel(df, motor="xlsxwriter", metricas=metricas, status="✅", destino=unico, backups=0)
+    assert partes_do_zip(os.path.join(saida, "PLANILHA_MAE.xlsx")) == partes_do_zip(unico)
@@ -0,0 +1,107 @@
+import os, zipfile
+from datetime import datetime, timedelta
+
+import pytest
+
+import atualizar_planilhas as ap
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """datetime.now() do módulo avança 1 minuto a cada chamada (backups com carimbos distintos)"""
+    class Relogio(datetime):
+        agora = datetime(2025, 10, 1, 12, 0)
+
+        @classmethod
+        def now(cls, tz=None):
+            cls.agora += timedelta(minutes=1)
+            return cls.agora
+    monkeypatch.setattr(ap, "datetime", Relogio)
+
+@pytest.fixture
+def mae(tmp_path):
+    caminho = tmp_path / "PLANILHA_MAE.xlsx"
+    caminho.write_bytes(b"versao 0")
+    return str(caminho)
+
+def backups(mae):
+    return ap._listar_backups(os.path.join(os.path.dirname(mae), "backup"), "PLANILHA_MAE")
+
+def nova_versao(mae, n):
+    """Como gravar_com_troca: troca o arquivo (não regrava por cima), o que preserva o hard link do backup"""
+    temp = mae + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(f"versao {n}".encode())
+    os.replace(temp, mae)
+
+def test_backup_e_hard_link_com_o_mesmo_conteudo(mae, relogio):
+    assert ap._rotacionar_backups(mae, manter=3) is None
+    [nome] = backups(mae)
+    assert nome == "PLANILHA_MAE_20251001_120100.xlsx"
+    backup = os.path.join(os.path.dirname(mae), "backup", nome)
+    assert os.path.samefile(backup, mae)  # sem copiar bytes
+    nova_versao(mae, 1)
+    with open(backup, "rb") as f:
+        assert f.read() == b"versao 0"
+
+def test_mantem_so_os_mais_recentes(mae, relogio):
+    for n in range(1, 6):
+        ap._rotacionar_backups(mae, manter=3)
+        nova_versao(mae, n)
+    assert backups(mae) == [f"PLANILHA_MAE_20251001_12{m:02d}00.xlsx" for m in (5, 4, 3)]
+    with open(os.path.join(os.path.dirname(mae), "backup", backups(mae)[0]), "rb") as f:
+        assert f.read() == b"versao 4"
+
+def test_mesmo_segundo_ganha_sufixo(mae, monkeypatch):
+    class Parado(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 10, 1, 12, 0)
+    monkeypatch.setattr(ap, "datetime", Parado)
+    for n in range(1, 4):
+        ap._rotacionar_backups(mae, manter=5)
+        nova_versao(mae, n)
+    assert backups(mae) == ["PLANILHA_MAE_20251001_120000_2.xlsx", "PLANILHA_MAE_20251001_120000_1.xlsx",
+                            "PLANILHA_MAE_20251001_120000.xlsx"]
+
+@pytest.mark.parametrize("manter", [0, -1])
+def test_sem_backups(mae, manter):
+    assert ap._rotacionar_backups(mae, manter=manter) is None
+    assert not os.path.exists(os.path.join(os.path.dirname(mae), "backup"))
+
+def test_sem_planilha_anterior_nao_ha_backup(tmp_path):
+    assert ap._rotacionar_backups(str(tmp_path / "PLANILHA_MAE.xlsx")) is None
+    assert not os.path.exists(tmp_path / "backup")
+
+def test_comprime_os_backups_alem_do_mais_recente(mae, relogio):
+    for n in range(1, 5):
+        thread = ap._rotacionar_backups(mae, manter=3, comprimir=True)
+        if thread is not None:
+            thread.join()
+        nova_versao(mae, n)
+    assert backups(mae) == ["PLANILHA_MAE_20251001_120400.xlsx", "PLANILHA_MAE_20251001_120300.xlsx.zip",
+                            "PLANILHA_MAE_20251001_120200.xlsx.zip"]
+    backup_dir = os.path.join(os.path.dirname(mae), "backup")
+    with zipfile.ZipFile(os.path.join(backup_dir, backups(mae)[1])) as zf:
+        assert zf.read("PLANILHA_MAE_20251001_120300.xlsx") == b"versao 2"
+    assert not [n for n in os.listdir(backup_dir) if n.endswith(".tmp")]
+
+def test_gravar_com_troca_faz_backup_e_troca(mae, relogio):
+    def gerar(temp):
+        with open(temp, "wb") as f:
+            f.write(b"versao 1")
+    ap.gravar_com_troca(mae, gerar, backups=2)
+    with open(mae, "rb") as f:
+        assert f.read() == b"versao 1"
+    assert len(backups(mae)) == 1
+    assert sorted(os.listdir(os.path.dirname(mae))) == ["PLANILHA_MAE.xlsx", "backup"]
+
+def test_falha_na_geracao_mantem_a_planilha_anterior(mae):
+    def gerar(temp):
+        with open(temp, "wb") as f:
+            f.write(b"pela metade")
+        raise RuntimeError("falhou no meio")
+    with pytest.raises(RuntimeError):
+        ap.gravar_com_troca(mae, gerar, backups=2)
+    with open(mae, "rb") as f:
+        assert f.read() == b"versao 0"
+    assert sorted(os.listdir(os.path.dirname(mae))) == ["PLANILHA_MAE.xlsx"]  # sem temporário e sem backup
@@ -0,0 +1,90 @@
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+@pytest.fixture
+def base(pastas):
+    """Base colunar de três filhas (Ana em 01 e 02/10, Bia em 03/10); devolve (df consolidado, caminho)"""
+    filhas, saida = pastas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm",
+                [atendimento(dia(1, 8)), atendimento(dia(1, 9), setor="Parceiro", minutos=20, finalizar=False)])
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 02-10-25.xlsm", [atendimento(dia(2, 8), cliente="Credimais")])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 03-10-25.xlsm",
+                [atendimento(dia(3, 8), responsavel="Bia", setor="Parceiro"), atendimento(dia(3, 9), responsavel="Bia")])
+    df, _, _ = ap.consolidar(motor="xlsxwriter", backups=0, filhas_dir=filhas, saida_dir=saida)
+    return df, ap.caminhos_saida(saida)["colunar"]
+
+def como_texto(df):
+    return df.astype(str).reset_index(drop=True)
+
+def test_base_completa_com_tipos_reais(base):
+    df, caminho = base
+    lido = ap.carregar_atendimentos(caminho)
+    assert list(lido.columns) == ap.COLUNAS_CONSOLIDADO
+    assert como_texto(lido).equals(como_texto(df))
+    for col in ap.COLUNAS_DATA + ["DATA_ARQUIVO"]:
+        assert pd.api.types.is_datetime64_any_dtype(lido[col]), col
+    for col in ap.COLUNAS_TEMPO:
+        assert pd.api.types.is_timedelta64_dtype(lido[col]), col
+    for col in ap.COLUNAS_CATEGORIA:
+        assert isinstance(lido[col].dtype, pd.CategoricalDtype), col
+    assert lido["TIME SPENT"].sum() == pd.Timedelta(minutes=60)
+
+def test_filtro_por_pessoa_sem_diferenciar_maiusculas(base):
+    _, caminho = base
+    lido = ap.carregar_atendimentos(caminho, pessoas=["bia"])
+    assert lido["PRIMEIRO_NOME"].astype(str).tolist() == ["BIA", "BIA"]
+    assert ap.carregar_atendimentos(caminho, pessoas=["Ninguem"]).empty
+
+def test_filtro_por_setor_e_pessoa(base):
+    _, caminho = base
+    lido = ap.carregar_atendimentos(caminho, setores=["Parceiro"], pessoas=["ANA"])
+    assert lido["INICIAR"].tolist() == [pd.Timestamp(dia(1, 9))]
+
+@pytest.mark.parametrize("inicio, fim, dias", [
+    ("2025-10-02", None, [2, 3, 3]),
+    (None, date(2025, 10, 2), [1, 1, 2]),
+    ("2025-10-02", "2025-10-02", [2]),  # inclusivo dos dois lados
+])
+def test_filtro_por_data_do_arquivo(base, inicio, fim, dias):
+    _, caminho = base
+    lido = ap.carregar_atendimentos(caminho, inicio=inicio, fim=fim)
+    assert lido["DATA_ARQUIVO"].dt.day.tolist() == dias
+
+def test_projecao_devolve_so_as_colunas_pedidas(base):
+    _, caminho = base
+    lido = ap.carregar_atendimentos(caminho, colunas=["CLIENTE", "TIME SPENT"], pessoas=["ana"], inicio="2025-10-02")
+    assert list(lido.columns) == ["CLIENTE", "TIME SPENT"]  # as colunas dos filtros são lidas e descartadas
+    assert lido.values.tolist() == [["Credimais", pd.Timedelta(minutes=10)]]
+
+def test_como_tabela(base):
+    _, caminho = base
+    tabela = ap.carregar_atendimentos(caminho, colunas=["SETOR"], setores=["Financeiro"], como_tabela=True)
+    assert isinstance(tabela, pa.Table)
+    assert tabela.num_rows == 3 and tabela.column_names == ["SETOR"]
+
+def test_base_em_partes_igual_a_base_inteira(base, pastas):
+    _, caminho = base
+    filhas, saida = pastas
+    inteira = ap.carregar_atendimentos(caminho)
+    ap.consolidar(motor="xlsxwriter", backups=0, filhas_dir=filhas, saida_dir=saida, memoria_limitada=True)
+    em_partes = ap.carregar_atendimentos(caminho)
+    assert como_texto(em_partes).equals(como_texto(inteira))
+    # categorias viram texto no arquivo em lotes, mas os filtros continuam valendo
+    assert len(ap.carregar_atendimentos(caminho, pessoas=["ana"], setores=["Parceiro"])) == 1
+
+def test_base_colunar_de_frame_de_texto(base, tmp_path):
+    df, _ = base
+    destino = str(tmp_path / "texto.feather")
+    texto = df.astype(str).replace({"NaT": None, "nan": None})
+    for col in ap.COLUNAS_TEMPO:  # como as filhas guardam: H:MM:SS
+        texto[col] = df[col].dt.total_seconds().map(lambda s: f"{int(s) // 3600}:{int(s) % 3600 // 60:02d}:00")
+    assert ap.salvar_base_colunar(texto, destino) == destino
+    lido = ap.carregar_atendimentos(destino, colunas=["INICIAR", "TIME SPENT"])
+    assert lido["INICIAR"].tolist() == df["INICIAR"].tolist()
+    assert lido["TIME SPENT"].tolist() == df["TIME SPENT"].tolist()
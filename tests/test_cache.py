@@ -0,0 +1,126 @@
+import json, os
+
+import pytest
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+ANA = "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm"
+BIA = "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm"
+
+@pytest.fixture
+def cache(pastas):
+    """Filhas da Ana e da Bia já lidas uma vez com cache; devolve (filhas, pasta do cache)"""
+    filhas, saida = pastas
+    criar_filha(filhas, ANA, [atendimento(dia(1, 8)), atendimento(dia(1, 9), setor="Parceiro", finalizar=False)])
+    criar_filha(filhas, BIA, [atendimento(dia(1, 10), responsavel="Bia", minutos=25)])
+    cache_dir = os.path.join(saida, "cache_filhas")
+    ler(filhas, cache_dir)
+    return filhas, cache_dir
+
+def ler(filhas, cache_dir, **opcoes):
+    return ap.ler_filhos_com_metricas(filhas_dir=filhas, cache_dir=cache_dir, **opcoes)
+
+def indice(cache_dir):
+    with open(os.path.join(cache_dir, ap.CACHE_INDICE), encoding="utf-8") as f:
+        return json.load(f)
+
+def resumo_do_cache(saida_tela):
+    return next(linha for linha in saida_tela.splitlines() if linha.startswith("♻️ Cache:"))
+
+def test_filhas_inalteradas_vem_do_cache(cache, capsys):
+    filhas, cache_dir = cache
+    df_disco, logs_disco, metricas_disco = ler(filhas, cache_dir, usar_cache=False)
+    capsys.readouterr()
+    df, logs, metricas = ler(filhas, cache_dir)
+    assert resumo_do_cache(capsys.readouterr().out) == "♻️ Cache: 2 arquivo(s) reaproveitado(s), 0 lido(s) do disco"
+    assert df.astype(str).equals(df_disco.astype(str))
+    assert logs == logs_disco
+    assert metricas.para_dict() == metricas_disco.para_dict()
+
+def test_filha_alterada_e_relida(cache, capsys):
+    filhas, cache_dir = cache
+    criar_filha(filhas, ANA, [atendimento(dia(1, 8)), atendimento(dia(1, 9)), atendimento(dia(1, 11))])
+    capsys.readouterr()
+    df, _, metricas = ler(filhas, cache_dir)
+    assert resumo_do_cache(capsys.readouterr().out) == "♻️ Cache: 1 arquivo(s) reaproveitado(s), 1 lido(s) do disco"
+    assert (df["ARQUIVO"] == ANA).sum() == 3
+    assert metricas.para_dict() == ap.MetricasParciais.do_dataframe(df).para_dict()
+
+def test_filha_so_tocada_confere_o_hash(cache, capsys):
+    filhas, cache_dir = cache
+    arq = os.path.join(filhas, ANA)
+    os.utime(arq, ns=(os.stat(arq).st_atime_ns, os.stat(arq).st_mtime_ns + 10**9))  # copiada: mesmo conteúdo
+    capsys.readouterr()
+    ler(filhas, cache_dir)
+    assert resumo_do_cache(capsys.readouterr().out) == "♻️ Cache: 2 arquivo(s) reaproveitado(s), 0 lido(s) do disco"
+    assert indice(cache_dir)["arquivos"][ANA]["mtime_ns"] == os.stat(arq).st_mtime_ns
+
+def test_mesmo_tamanho_com_outro_hash_e_relida(cache, capsys):
+    filhas, cache_dir = cache
+    dados = indice(cache_dir)
+    dados["arquivos"][ANA]["sha1"] = "0" * 40  # conteúdo diferente com o mesmo tamanho
+    dados["arquivos"][ANA]["mtime_ns"] -= 1
+    with open(os.path.join(cache_dir, ap.CACHE_INDICE), "w", encoding="utf-8") as f:
+        json.dump(dados, f)
+    capsys.readouterr()
+    ler(filhas, cache_dir)
+    assert resumo_do_cache(capsys.readouterr().out) == "♻️ Cache: 1 arquivo(s) reaproveitado(s), 1 lido(s) do disco"
+    assert indice(cache_dir)["arquivos"][ANA]["sha1"] == ap.hash_arquivo(os.path.join(filhas, ANA))
+
+def test_filha_removida_apaga_o_pickle(cache):
+    filhas, cache_dir = cache
+    pickle_ana = indice(cache_dir)["arquivos"][ANA]["pickle"]
+    assert os.path.exists(os.path.join(cache_dir, pickle_ana))
+    os.remove(os.path.join(filhas, ANA))
+    df, _, _ = ler(filhas, cache_dir)
+    assert df["ARQUIVO"].astype(str).unique().tolist() == [BIA]
+    assert list(indice(cache_dir)["arquivos"]) == [BIA]
+    assert not os.path.exists(os.path.join(cache_dir, pickle_ana))
+
+@pytest.mark.parametrize("estrago", ["versao", "corrompido"])
+def test_indice_de_outra_versao_recomeca(cache, capsys, estrago):
+    filhas, cache_dir = cache
+    caminho = os.path.join(cache_dir, ap.CACHE_INDICE)
+    dados = indice(cache_dir)
+    with open(caminho, "w", encoding="utf-8") as f:
+        if estrago == "versao":
+            dados["versao"] = ap.CACHE_VERSAO - 1
+            json.dump(dados, f)
+        else:
+            f.write(json.dumps(dados)[:20])
+    capsys.readouterr()
+    ler(filhas, cache_dir)
+    assert resumo_do_cache(capsys.readouterr().out) == "♻️ Cache: 0 arquivo(s) reaproveitado(s), 2 lido(s) do disco"
+    assert indice(cache_dir)["versao"] == ap.CACHE_VERSAO
+
+def test_reconstruir_cache_rele_tudo(cache, capsys):
+    filhas, cache_dir = cache
+    capsys.readouterr()
+    ler(filhas, cache_dir, reconstruir_cache=True)
+    saida_tela = capsys.readouterr().out
+    assert "🧹 Cache das filhas apagado, todas serão relidas" in saida_tela
+    assert resumo_do_cache(saida_tela) == "♻️ Cache: 0 arquivo(s) reaproveitado(s), 2 lido(s) do disco"
+
+def test_entrada_sem_metricas_por_dia_recalcula_do_pickle(cache):
+    filhas, cache_dir = cache
+    dados = indice(cache_dir)
+    esperadas = ler(filhas, cache_dir, usar_cache=False)[2].para_dict()
+    del dados["arquivos"][ANA]["metricas"]["por_dia"]  # entrada gravada antes dos agregados por dia
+    dados["arquivos"][BIA]["metricas"] = None
+    with open(os.path.join(cache_dir, ap.CACHE_INDICE), "w", encoding="utf-8") as f:
+        json.dump(dados, f)
+    _, _, metricas = ler(filhas, cache_dir)
+    assert metricas.para_dict() == esperadas
+    assert "por_dia" in indice(cache_dir)["arquivos"][ANA]["metricas"]
+
+def test_erro_de_leitura_nao_vai_para_o_cache(cache, capsys):
+    filhas, cache_dir = cache
+    with open(os.path.join(filhas, "CAIO_LIMA - ATENDIMENTOS - 01-10-25.xlsm"), "wb") as f:
+        f.write(b"isto nao e um xlsm")
+    for _ in range(2):
+        capsys.readouterr()
+        _, logs, _ = ler(filhas, cache_dir)
+        assert resumo_do_cache(capsys.readouterr().out) == "♻️ Cache: 2 arquivo(s) reaproveitado(s), 1 lido(s) do disco"
+        assert logs[-1].startswith("❌ Erro lendo CAIO_LIMA")
+    assert "CAIO_LIMA - ATENDIMENTOS - 01-10-25.xlsm" not in indice(cache_dir)["arquivos"]
@@ -0,0 +1,26 @@
+import pytest
+
+import atualizar_planilhas as ap
+
+def resumo_do_cache(saida_tela):
+    return next(linha for linha in saida_tela.splitlines() if linha.startswith("♻️ Cache:"))
+
+@pytest.mark.parametrize("modo", [[], ["--memoria-limitada"], ["--pipeline"]],
+                         ids=["normal", "memoria_limitada", "pipeline"])
+def test_rebuild_cache_vale_em_todos_os_modos(programa, capsys, modo):
+    argumentos = ["--motor", "xlsxwriter", "--backups", "0", *modo]
+    ap.main(argumentos)
+    capsys.readouterr()
+    ap.main(argumentos)
+    assert resumo_do_cache(capsys.readouterr().out) == "♻️ Cache: 2 arquivo(s) reaproveitado(s), 0 lido(s) do disco"
+    ap.main(argumentos + ["--rebuild-cache"])
+    saida_tela = capsys.readouterr().out
+    assert "🧹 Cache das filhas apagado, todas serão relidas" in saida_tela
+    assert resumo_do_cache(saida_tela) == "♻️ Cache: 0 arquivo(s) reaproveitado(s), 2 lido(s) do disco"
+
+def test_rebuild_cache_no_watch_apaga_uma_vez_so(programa, monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(ap, "observar", lambda intervalo, debounce, **opcoes: chamadas.append(opcoes))
+    ap.main(["--watch", "--rebuild-cache", "--backups", "0"])
+    [opcoes] = chamadas
+    assert opcoes["reconstruir_cache"] is False  # já apagado antes de observar, não a cada rodada
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+def texto(*valores):
+    return pd.Series(valores, dtype="str")
+
+@pytest.mark.parametrize("celula, esperado", [
+    ("45946", "2025-10-16 00:00:00"),             # número de série do Excel
+    ("45946,5", "2025-10-16 12:00:00"),           # série com fração do dia e vírgula decimal
+    ("2025-10-16 12:01:00", "2025-10-16 12:01:00"),
+    ("16/10/2025 12:01", "2025-10-16 12:01:00"),  # digitada
+    ("16/10/25", "2025-10-16 00:00:00"),
+])
+def test_datas_de_texto(celula, esperado):
+    assert ap.datas_de_texto(texto(celula)).iloc[0] == pd.Timestamp(esperado)
+
+@pytest.mark.parametrize("celula", ["amanhã", "sim", "", None, "0", "-3", "32/13/2025"])
+def test_datas_de_texto_invalidas_viram_nat(celula):
+    assert pd.isna(ap.datas_de_texto(texto(celula)).iloc[0])
+
+@pytest.mark.parametrize("celula, segundos", [
+    ("00:25:00", 1500),
+    ("25:30", 91800),                # HH:MM, horas acima de 24
+    (" 1:02:03,5 ", 3723.5),
+    ("1 day, 2:00:00", 93600),       # str(timedelta)
+    ("0,0173611", 1500),             # fração de dia com vírgula, arredondada ao segundo
+    ("0.5", 43200),
+    ("1899-12-31 02:00:00", 93600),  # duração de 24h ou mais lida como data perto da origem do Excel
+])
+def test_segundos_de_duracao(celula, segundos):
+    assert ap.segundos_de_duracao(texto(celula)).iloc[0] == segundos
+
+@pytest.mark.parametrize("celula", ["abc", "", None, "2025-10-16 12:00:00", "12:xx"])
+def test_segundos_de_duracao_invalidos_viram_nan(celula):
+    assert pd.isna(ap.segundos_de_duracao(texto(celula)).iloc[0])
+
+def test_finalizado_igual_na_leitura_e_no_frame_de_texto(pastas):
+    filhas, saida = pastas
+    linhas = [atendimento(dia(1, 8)), atendimento(dia(1, 9), finalizar="Sim"),
+              atendimento(dia(1, 10), finalizar="16/10/2025 12:01"), atendimento(dia(1, 11), finalizar=False),
+              atendimento(dia(1, 12), finalizar="ok")]
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", linhas)
+    df, logs, metricas = ap.ler_filhos_com_metricas(usar_cache=False, filhas_dir=filhas)
+    # "Sim" e "ok" não são data: não contam como finalizado; "Sim" (o texto antigo) tem contagem própria no log
+    assert metricas.finalizados == 2
+    assert logs[0].endswith("— 1 data(s)/duração(ões) não reconhecida(s) (FINALIZAR: 1)"
+                            f" — 1 {ap.AVISO_FINALIZADO_EM_TEXTO}")
+
+    como_texto = pd.DataFrame({col: texto(*(None if v is None else str(v) for v in valores))
+                               for col, valores in zip(ap.COLS_ESPERADAS, zip(*linhas))})
+    como_texto["SETOR"], como_texto["PRIMEIRO_NOME"] = df["SETOR"].astype(str), "ANA"
+    assert ap.MetricasParciais.do_dataframe(como_texto).finalizados == metricas.finalizados
+
+def test_aviso_de_finalizado_em_texto_no_resumo_da_execucao(pastas, capsys):
+    filhas, saida = pastas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm",
+                [atendimento(dia(1, 8), finalizar="sim"), atendimento(dia(1, 9), finalizar=" YES ")])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm",
+                [atendimento(dia(1, 8), responsavel="Bia", finalizar="True"), atendimento(dia(1, 9), responsavel="Bia")])
+    _, _, metricas = ap.consolidar(motor="xlsxwriter", backups=0, filhas_dir=filhas, saida_dir=saida)
+    assert metricas.finalizados == 1
+    aviso = "⚠️ 3 atendimento(s) com FINALIZAR só com texto (Sim/yes/true) não contam como finalizados"
+    assert aviso in capsys.readouterr().out
+    with open(f"{saida}/log_compilacao.txt", encoding="utf-8") as f:
+        assert f.read().splitlines()[2].startswith(aviso)  # logo depois do total de registros
+
+def test_sem_finalizado_em_texto_sem_aviso():
+    log = "✅ OK: ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm (1 linhas úteis de 1 total)"
+    assert ap.aviso_finalizados_em_texto([log]) is None
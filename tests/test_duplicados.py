@@ -0,0 +1,89 @@
+import pytest
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+ONTEM = "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm"
+HOJE = "ANA_SILVA - ATENDIMENTOS - 02-10-25.xlsm"
+
+def ler(filhas, saida, chave=ap.CHAVE_DUPLICADOS):
+    return ap.ler_filhos_com_metricas(filhas_dir=filhas, cache_dir=f"{saida}/cache_filhas", chave_duplicados=chave)
+
+def assert_metricas_iguais(metricas, esperadas):
+    assert (metricas.total, metricas.finalizados) == (esperadas.total, esperadas.finalizados)
+    assert metricas.tempo_soma == pytest.approx(esperadas.tempo_soma)
+    assert metricas.por_setor == esperadas.por_setor
+    assert metricas.por_pessoa == esperadas.por_pessoa
+    assert metricas.por_dia.keys() == esperadas.por_dia.keys()
+    for chave, (n, fin, tempo) in esperadas.por_dia.items():
+        assert metricas.por_dia[chave][:2] == [n, fin]
+        assert metricas.por_dia[chave][2] == pytest.approx(tempo)
+
+def test_repetido_fica_so_na_filha_mais_nova(pastas):
+    filhas, saida = pastas
+    copiados = [atendimento(dia(1, 8)), atendimento(dia(1, 9), cliente="Credimais")]
+    # a filha mais nova vem antes na ordem dos arquivos: vale a data do nome, não a ordem
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 02-09-25.xlsm", copiados)
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", copiados + [atendimento(dia(1, 10))])
+    df, logs, _ = ler(filhas, saida)
+    assert df["ARQUIVO"].astype(str).value_counts().to_dict() == {"ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm": 3}
+    assert "2 repetido(s) de filha mais nova removido(s)" in logs[1]  # ordem de nome: 01-10-25 antes de 02-09-25
+
+def test_repetidos_na_mesma_filha_e_chave_incompleta_ficam(pastas):
+    filhas, saida = pastas
+    sem_cliente = atendimento(dia(1, 9), cliente=None)
+    criar_filha(filhas, ONTEM, [atendimento(dia(1, 8)), atendimento(dia(1, 8)), sem_cliente])
+    criar_filha(filhas, HOJE, [sem_cliente, atendimento(dia(2, 8))])
+    df, _, _ = ler(filhas, saida)
+    assert df["ARQUIVO"].astype(str).value_counts().to_dict() == {ONTEM: 3, HOJE: 2}
+
+def test_empate_na_data_fica_a_ultima_filha(pastas):
+    filhas, saida = pastas
+    copiado = atendimento(dia(1, 8))
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", [copiado])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm", [copiado])
+    df, _, _ = ler(filhas, saida)
+    assert df["ARQUIVO"].astype(str).tolist() == ["BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm"]
+
+def test_sem_chave_nada_e_removido(pastas):
+    filhas, saida = pastas
+    criar_filha(filhas, ONTEM, [atendimento(dia(1, 8))])
+    criar_filha(filhas, HOJE, [atendimento(dia(1, 8))])
+    df, _, _ = ler(filhas, saida, chave=None)
+    assert len(df) == 2
+
+def test_descontar_desfaz_combinar(pastas):
+    filhas, saida = pastas
+    criar_filha(filhas, ONTEM, [atendimento(dia(1, 8)), atendimento(dia(1, 9), setor="Parceiro", finalizar=False)])
+    criar_filha(filhas, HOJE, [atendimento(dia(2, 8), responsavel="Bia", minutos=30)])
+    df, _, _ = ler(filhas, saida, chave=None)
+    ontem = ap.MetricasParciais.do_dataframe(df[df["ARQUIVO"] == ONTEM])
+    hoje = ap.MetricasParciais.do_dataframe(df[df["ARQUIVO"] == HOJE])
+    assert_metricas_iguais((ontem + hoje) - hoje, ontem)
+
+@pytest.mark.parametrize("novas_de_hoje", [1, 5], ids=["desconta_removidas", "refaz_das_que_ficam"])
+def test_metricas_com_repetidos_iguais_as_do_consolidado(pastas, novas_de_hoje):
+    filhas, saida = pastas
+    ontem = [atendimento(dia(1, 8, m), setor=("Financeiro", "Parceiro")[m % 2], finalizar=m % 3 > 0, minutos=m + 1)
+             for m in range(4)]
+    hoje = [atendimento(dia(2, 8, m), responsavel="Ana", minutos=7) for m in range(novas_de_hoje)]
+    # hoje copia 3 linhas de ontem: ontem fica com 3 de 6 (desconta as removidas) ou 1 de 4 (refaz das que ficam)
+    extras = [atendimento(dia(1, 12, m), cliente="Credimais") for m in range(2 if novas_de_hoje == 1 else 0)]
+    criar_filha(filhas, ONTEM, ontem + extras)
+    criar_filha(filhas, HOJE, ontem[:3] + hoje)
+    for _ in range(2):  # 1ª leitura do disco, 2ª com as métricas do cache
+        df, _, metricas = ler(filhas, saida)
+        assert len(df) == 4 + len(extras) + novas_de_hoje
+        assert_metricas_iguais(metricas, ap.MetricasParciais.do_dataframe(df))
+
+@pytest.mark.parametrize("modo", ["memoria_limitada", "pipeline"])
+def test_metricas_com_repetidos_nos_modos_sem_frame(pastas, modo):
+    filhas, saida = pastas
+    ontem = [atendimento(dia(1, 8, m), minutos=m + 1, finalizar=m % 2 > 0) for m in range(5)]
+    criar_filha(filhas, ONTEM, ontem)
+    criar_filha(filhas, HOJE, ontem[:1] + [atendimento(dia(2, 8), responsavel="Ana")])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 03-10-25.xlsm", ontem[1:4])
+    df, _, esperadas = ler(filhas, saida)
+    assert_metricas_iguais(esperadas, ap.MetricasParciais.do_dataframe(df))
+    _, _, metricas = ap.consolidar(filhas_dir=filhas, saida_dir=saida, backups=0, **{modo: True})
+    assert_metricas_iguais(metricas, esperadas)
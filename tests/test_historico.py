@@ -0,0 +1,121 @@
+import os
+
+import pandas as pd
+import pytest
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+def frame_das_filhas(filhas, chave=None):
+    df, _, _ = ap.ler_filhos_com_metricas(usar_cache=False, filhas_dir=filhas, chave_duplicados=chave)
+    return df
+
+def linhas_por_arquivo(caminho):
+    consulta = ap.consultar_historico("SELECT arquivo, COUNT(*) AS n FROM atendimentos GROUP BY arquivo", caminho=caminho)
+    return dict(zip(consulta["arquivo"], consulta["n"]))
+
+@pytest.fixture
+def historico(tmp_path):
+    return str(tmp_path / "historico.db")
+
+def test_texto_historico_de_datas_e_duracoes():
+    datas = pd.Series(pd.to_datetime(["2025-10-01 08:30:05", None]))
+    assert ap._texto_historico(datas).tolist()[0] == "2025-10-01 08:30:05"
+    assert pd.isna(ap._texto_historico(datas).iloc[1])
+    duracoes = pd.Series(pd.to_timedelta([59.9, 25 * 3600 + 61, None], unit="s"))
+    texto = ap._texto_historico(duracoes)
+    assert texto.tolist()[:2] == ["00:00:59", "25:01:01"]
+    assert pd.isna(texto.iloc[2])
+
+def test_metricas_do_historico_iguais_as_do_frame(pastas, historico):
+    filhas, _ = pastas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm",
+                [atendimento(dia(1, 8)), atendimento(dia(1, 9), setor="Parceiro", finalizar=False)])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 02-10-25.xlsm",
+                [atendimento(dia(2, 10), responsavel="Bia", minutos=25), atendimento(None, responsavel="Bia")])
+    df = frame_das_filhas(filhas)
+    assert ap.atualizar_historico(df, historico) == (2, 4)
+    assert ap.atualizar_historico(df, historico) == (0, 0)  # nada mudou: nada regravado
+
+    esperadas = ap.MetricasParciais.do_dataframe(df)
+    metricas = ap.metricas_do_historico(historico)
+    assert (metricas.total, metricas.finalizados) == (esperadas.total, esperadas.finalizados)
+    assert metricas.tempo_soma == pytest.approx(esperadas.tempo_soma)
+    assert metricas.por_setor == esperadas.por_setor
+    assert metricas.por_pessoa == esperadas.por_pessoa
+    assert metricas.por_dia == esperadas.por_dia
+
+    so_dia_2 = ap.metricas_do_historico(historico, inicio=dia(2), fim=dia(2))
+    assert (so_dia_2.total, dict(so_dia_2.por_pessoa)) == (2, {"BIA": 2})
+
+def test_historico_mantem_o_repetido_so_na_filha_mais_nova(pastas, historico):
+    filhas, _ = pastas
+    copiado = atendimento(dia(1, 8))
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", [copiado])
+    ap.atualizar_historico(frame_das_filhas(filhas), historico, ap.CHAVE_DUPLICADOS)
+    # a filha do dia seguinte, copiada da anterior, entra depois e fica com o atendimento
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 02-10-25.xlsm", [copiado, atendimento(dia(2, 8))])
+    ap.atualizar_historico(frame_das_filhas(filhas), historico, ap.CHAVE_DUPLICADOS)
+    assert linhas_por_arquivo(historico) == {"ANA_SILVA - ATENDIMENTOS - 02-10-25.xlsm": 2}
+
+def test_historico_filha_sem_data_conta_como_a_mais_nova(pastas, historico):
+    filhas, _ = pastas
+    copiado = atendimento(dia(1, 8))
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", [copiado, atendimento(dia(1, 9))])
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 31-02-25.xlsm", [copiado])  # data inválida: sem DATA_ARQUIVO
+    df = frame_das_filhas(filhas)
+    assert df["DATA_ARQUIVO"].isna().sum() == 1
+    ap.atualizar_historico(df, historico, ap.CHAVE_DUPLICADOS)
+
+    _, removidos = ap.remover_duplicados(df)
+    assert removidos == {"ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm": 1}
+    assert linhas_por_arquivo(historico) == {"ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm": 1,
+                                             "ANA_SILVA - ATENDIMENTOS - 31-02-25.xlsm": 1}
+    assert ap.consultar_historico("SELECT linhas FROM arquivos ORDER BY arquivo", caminho=historico)["linhas"].tolist() == [1, 1]
+
+def test_historico_empate_na_data_fica_o_nome_maior(pastas, historico):
+    filhas, _ = pastas
+    copiado = atendimento(dia(1, 8))
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", [copiado])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm", [copiado])
+    ap.atualizar_historico(frame_das_filhas(filhas), historico, ap.CHAVE_DUPLICADOS)
+    assert linhas_por_arquivo(historico) == {"BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm": 1}
+
+def test_filha_alterada_substitui_as_linhas_e_removida_continua(pastas, historico):
+    filhas, _ = pastas
+    ana = criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", [atendimento(dia(1, 8)), atendimento(dia(1, 9))])
+    bia = criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm", [atendimento(dia(1, 10), responsavel="Bia")])
+    ap.atualizar_historico(frame_das_filhas(filhas), historico)
+
+    criar_filha(filhas, ana, [atendimento(dia(1, 8), cliente="Credimais")])
+    os.remove(bia)  # saiu de filhas/, mas o histórico guarda
+    assert ap.atualizar_historico(frame_das_filhas(filhas), historico) == (1, 1)
+    assert linhas_por_arquivo(historico) == {"ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm": 1,
+                                             "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm": 1}
+    consulta = ap.consultar_historico("SELECT cliente FROM atendimentos WHERE arquivo = ?",
+                                      ("ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm",), caminho=historico)
+    assert consulta["cliente"].tolist() == ["Credimais"]
+
+def test_consultar_historico_com_parametros(pastas, historico):
+    filhas, _ = pastas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm",
+                [atendimento(dia(1, 8)), atendimento(dia(1, 9), setor="Parceiro")])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 02-10-25.xlsm", [atendimento(dia(2, 8), responsavel="Bia", setor="Parceiro")])
+    ap.atualizar_historico(frame_das_filhas(filhas), historico)
+    consulta = ap.consultar_historico(
+        "SELECT primeiro_nome, COUNT(*) AS n FROM atendimentos WHERE setor = ? AND data_arquivo >= ? "
+        "GROUP BY primeiro_nome ORDER BY primeiro_nome", ("Parceiro", "2025-10-01"), caminho=historico)
+    assert consulta.values.tolist() == [["ANA", 1], ["BIA", 1]]
+
+def test_filha_toda_repetida_de_uma_mais_nova(pastas, capsys):
+    filhas, saida = pastas
+    ontem = [atendimento(dia(1, 8)), atendimento(dia(1, 9))]
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", ontem)
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 02-10-25.xlsm", ontem + [atendimento(dia(2, 8))])
+    df, _, _ = ap.consolidar(motor="xlsxwriter", backups=0, filhas_dir=filhas, saida_dir=saida)
+    # a filha de ontem continua entre as categorias de ARQUIVO, mas sem nenhuma linha
+    assert "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm" in df["ARQUIVO"].cat.categories
+    saida_tela = capsys.readouterr().out
+    assert "Não foi possível atualizar o histórico" not in saida_tela
+    assert "🗃️ Histórico: 1 filha(s) nova(s) ou alterada(s), 3 linhas gravadas" in saida_tela
+    assert linhas_por_arquivo(ap.caminhos_saida(saida)["historico"]) == {"ANA_SILVA - ATENDIMENTOS - 02-10-25.xlsm": 3}
@@ -0,0 +1,105 @@
+import io, os, json, zipfile
+
+import pytest
+from openpyxl import load_workbook
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia, partes_do_zip
+
+ANA = "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm"
+BIA = "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm"
+
+@pytest.fixture
+def planilha(pastas):
+    """Filhas de duas pessoas já consolidadas uma vez com --incremental; devolve (filhas, saida, mãe)"""
+    filhas, saida = pastas
+    criar_filha(filhas, ANA, [atendimento(dia(1, 8)), atendimento(dia(1, 9), cliente="Credimais")])
+    criar_filha(filhas, BIA, [atendimento(dia(1, 8, 30), responsavel="Bia", setor="Parceiro")])
+    consolidar(filhas, saida)
+    return filhas, saida, os.path.join(saida, "PLANILHA_MAE.xlsx")
+
+def consolidar(filhas, saida):
+    return ap.consolidar(motor="xlsxwriter", incremental=True, backups=0, filhas_dir=filhas, saida_dir=saida)
+
+def alterar_ana(filhas):
+    criar_filha(filhas, ANA, [atendimento(dia(1, 8)), atendimento(dia(1, 9), cliente="Credimais"),
+                              atendimento(dia(1, 10), solicitacao="Portabilidade\ncom quebra de linha")])
+
+def bytes_brutos(caminho, aba):
+    """Bytes ainda comprimidos da parte de uma aba no zip"""
+    with zipfile.ZipFile(caminho) as zf, open(caminho, "rb") as f:
+        info = zf.getinfo(ap._partes_das_abas(zf)[aba])
+        destino = io.BytesIO()
+        ap._copiar_entrada_bruta(f, info, destino)
+        return destino.getvalue()
+
+def assert_igual_a_gravacao_completa(df, metricas, mae, tmp_path):
+    completa = str(tmp_path / "completa.xlsx")
+    ap.salvar_no_excel(df, motor="xlsxwriter", metricas=metricas, status="✅", destino=completa, backups=0)
+    assert partes_do_zip(mae) == partes_do_zip(completa)
+
+def test_reaproveita_so_as_abas_que_nao_mudaram(planilha, capsys, tmp_path):
+    filhas, saida, mae = planilha
+    antes = {aba: bytes_brutos(mae, aba) for aba in ["COMPILE GERAL", "Ana", "Bia"]}
+
+    alterar_ana(filhas)
+    df, _, metricas = consolidar(filhas, saida)
+    assert "1 aba(s) reaproveitada(s), 2 gerada(s) de novo" in capsys.readouterr().out
+
+    with zipfile.ZipFile(mae) as zf:
+        assert zf.testzip() is None
+    wb = load_workbook(mae)
+    assert wb.sheetnames == ["COMPILE GERAL", *ap.ABAS_METRICAS, "Ana", "Bia", ap.ABA_STATUS]
+    assert wb["Ana"].max_row == 4 and wb["COMPILE GERAL"].max_row == 5
+    assert wb["Ana"]["E4"].value == "Portabilidade\ncom quebra de linha"
+    assert wb["Bia"]["B2"].value == "Bia"
+
+    assert bytes_brutos(mae, "Bia") == antes["Bia"]
+    assert bytes_brutos(mae, "Ana") != antes["Ana"]
+    assert bytes_brutos(mae, "COMPILE GERAL") != antes["COMPILE GERAL"]
+    assert_igual_a_gravacao_completa(df, metricas, mae, tmp_path)
+
+def test_sem_mudancas_reaproveita_todas(planilha, capsys, tmp_path):
+    filhas, saida, mae = planilha
+    df, _, metricas = consolidar(filhas, saida)
+    assert "3 aba(s) reaproveitada(s), 0 gerada(s) de novo" in capsys.readouterr().out
+    assert_igual_a_gravacao_completa(df, metricas, mae, tmp_path)
+
+def test_planilha_salva_no_excel_gera_tudo(planilha, capsys, tmp_path):
+    filhas, saida, mae = planilha
+    load_workbook(mae).save(mae)  # como o Excel: outro conteúdo, outro tamanho e mtime
+    alterar_ana(filhas)
+    capsys.readouterr()
+    df, _, metricas = consolidar(filhas, saida)
+    assert "nenhuma reaproveitada" in capsys.readouterr().out
+    assert_igual_a_gravacao_completa(df, metricas, mae, tmp_path)
+
+@pytest.mark.parametrize("mudanca", ["versao", "tamanho", "sem_arquivo"])
+def test_resumos_que_nao_conferem_geram_tudo(planilha, capsys, mudanca):
+    filhas, saida, mae = planilha
+    resumos = os.path.splitext(mae)[0] + ap.EXTENSAO_RESUMOS
+    if mudanca == "sem_arquivo":
+        os.remove(resumos)
+    else:
+        with open(resumos, encoding="utf-8") as f:
+            dados = json.load(f)
+        dados[mudanca] = "0/0" if mudanca == "versao" else dados[mudanca] + 1
+        with open(resumos, "w", encoding="utf-8") as f:
+            json.dump(dados, f)
+    capsys.readouterr()
+    consolidar(filhas, saida)
+    assert "nenhuma reaproveitada" in capsys.readouterr().out
+    load_workbook(mae)
+
+def test_planilha_anterior_ilegivel_gera_tudo(planilha, capsys, tmp_path):
+    filhas, saida, mae = planilha
+    # Resumos ainda conferem (mesmo tamanho e mtime), mas o zip anterior está corrompido
+    st = os.stat(mae)
+    with open(mae, "wb") as f:
+        f.write(b"\0" * st.st_size)
+    os.utime(mae, ns=(st.st_atime_ns, st.st_mtime_ns))
+    alterar_ana(filhas)
+    capsys.readouterr()
+    df, _, metricas = consolidar(filhas, saida)
+    assert "Não foi possível reaproveitar abas da planilha anterior" in capsys.readouterr().out
+    assert_igual_a_gravacao_completa(df, metricas, mae, tmp_path)
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+NOME = "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm"
+
+def ler(caminho):
+    return ap._ler_arquivo_filho(caminho)
+
+def criar_com_vazias(pasta, vazias, formatadas=True):
+    """Filha com um atendimento, `vazias` linhas vazias (formatadas, como nos modelos) e outro atendimento"""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(ap.COLS_ESPERADAS)
+    ws.append(atendimento(dia(1, 8)))
+    cinza = PatternFill("solid", fgColor="DDDDDD")
+    for linha in range(3, 3 + vazias):
+        if formatadas:
+            for col in range(1, len(ap.COLS_ESPERADAS) + 1):
+                ws.cell(row=linha, column=col).fill = cinza
+    for col, valor in enumerate(atendimento(dia(1, 9), cliente="Credimais"), 1):
+        ws.cell(row=3 + vazias, column=col, value=valor)
+    caminho = os.path.join(pasta, NOME)
+    wb.save(caminho)
+    return caminho
+
+@pytest.mark.parametrize("cabecalho, faltantes", [
+    ([c for c in ap.COLS_ESPERADAS if c != "SETOR"], ["SETOR"]),
+    (["INICIO" if c == "INICIAR" else c for c in ap.COLS_ESPERADAS], ["INICIAR"]),
+    ([], ap.COLS_ESPERADAS),
+])
+def test_cabecalho_sem_as_colunas_rejeita_sem_ler_o_corpo(pastas, cabecalho, faltantes):
+    filhas, _ = pastas
+    wb = Workbook()
+    ws = wb.active
+    if cabecalho:
+        ws.append(cabecalho)
+    ws.append(["x"] * 11)
+    caminho = os.path.join(filhas, NOME)
+    wb.save(caminho)
+    assert ap.ler_planilha_filha(caminho) == (None, 0, faltantes)
+    df, log, cacheavel = ler(caminho)
+    assert df is None and cacheavel
+    assert log == f"❌ Colunas faltando em {NOME}: {faltantes}"
+
+def test_cabecalho_em_outra_ordem_com_espacos_e_colunas_extras(pastas):
+    filhas, _ = pastas
+    linha = dict(zip(ap.COLS_ESPERADAS, atendimento(dia(1, 8), cliente="Credimais")))
+    ordem = ["EXTRA", *reversed(ap.COLS_ESPERADAS)]
+    wb = Workbook()
+    ws = wb.active
+    ws.append([f" {c} " if c == "CLIENTE" else c for c in ordem])
+    ws.append([linha.get(c, "ignorado") for c in ordem])
+    caminho = os.path.join(filhas, NOME)
+    wb.save(caminho)
+    df, log, _ = ler(caminho)
+    assert log == f"✅ OK: {NOME} (1 linhas úteis de 1 total)"
+    assert df["CLIENTE"].tolist() == ["Credimais"]
+    assert df["INICIAR"].tolist() == [dia(1, 8)]
+
+@pytest.mark.parametrize("formatadas", [True, False], ids=["formatadas", "sem_celulas"])
+def test_para_depois_de_muitas_linhas_vazias(pastas, formatadas):
+    filhas, _ = pastas
+    caminho = criar_com_vazias(filhas, ap.LINHAS_VAZIAS_CORTE, formatadas)
+    df, total, _ = ap.ler_planilha_filha(caminho)
+    assert df["CLIENTE"].tolist() == ["Banco Alfa"]  # o atendimento depois das vazias não é lido
+    # o total vem da dimensão declarada: o log mostra que havia mais linhas do que as úteis
+    assert total == ap.LINHAS_VAZIAS_CORTE + 2
+    assert ler(caminho)[1] == f"✅ OK: {NOME} (1 linhas úteis de {ap.LINHAS_VAZIAS_CORTE + 2} total)"
+
+def test_menos_vazias_que_o_corte_le_tudo(pastas):
+    filhas, _ = pastas
+    caminho = criar_com_vazias(filhas, ap.LINHAS_VAZIAS_CORTE - 1)
+    df, log, _ = ler(caminho)
+    assert df["CLIENTE"].tolist() == ["Banco Alfa", "Credimais"]
+    assert log == f"✅ OK: {NOME} (2 linhas úteis de {ap.LINHAS_VAZIAS_CORTE + 1} total)"
+
+def test_corte_desligado_le_ate_a_ultima_linha(pastas):
+    filhas, _ = pastas
+    caminho = criar_com_vazias(filhas, ap.LINHAS_VAZIAS_CORTE + 50)
+    df, total, _ = ap.ler_planilha_filha(caminho, corte_vazias=0)
+    assert df["CLIENTE"].dropna().tolist() == ["Banco Alfa", "Credimais"]
+    assert total == ap.LINHAS_VAZIAS_CORTE + 52
+
+def test_vazias_do_fim_nao_contam(pastas):
+    filhas, _ = pastas
+    caminho = criar_filha(filhas, NOME, [atendimento(dia(1, 8)), [None] * 11, [None] * 11])
+    df, total, _ = ap.ler_planilha_filha(caminho)
+    assert (len(df), total) == (1, 1)
@@ -0,0 +1,74 @@
+import json, os
+
+import pytest
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+@pytest.fixture
+def equipes(tmp_path):
+    """Duas pastas de filhas válidas (uma com um arquivo rejeitado) e uma que não existe; devolve os pares"""
+    pares = []
+    for equipe, pessoa in (("financeiro", "ANA_SILVA"), ("parceiros", "BIA_COSTA")):
+        filhas = str(tmp_path / equipe / "filhas")
+        criar_filha(filhas, f"{pessoa} - ATENDIMENTOS - 01-10-25.xlsm",
+                    [atendimento(dia(1, 8)), atendimento(dia(1, 9), cliente="Credimais")])
+        pares.append([filhas, str(tmp_path / equipe / "saida")])
+    with open(os.path.join(pares[1][0], "CAIO_LIMA - ATENDIMENTOS - 01-10-25.xlsm"), "wb") as f:
+        f.write(b"isto nao e um xlsm")
+    pares.insert(1, [str(tmp_path / "sumida" / "filhas"), str(tmp_path / "sumida" / "saida")])
+    return pares
+
+def test_pasta_com_erro_nao_interrompe_as_outras(equipes):
+    resultados = ap.consolidar_lote(equipes, motor="xlsxwriter", backups=0)
+    assert [r["filhas"] for r in resultados] == [filhas for filhas, _ in equipes]
+    assert [r["ok"] for r in resultados] == [True, False, True]
+
+    financeiro, sumida, parceiros = resultados
+    assert (financeiro["linhas"], financeiro["arquivos"], financeiro["rejeitados"]) == (2, 1, [])
+    assert financeiro["planilha"] == os.path.join(equipes[0][1], "PLANILHA_MAE.xlsx")
+    assert os.path.exists(financeiro["planilha"])
+    assert sumida["erro"].startswith("Diretório de filhas não encontrado")
+    assert (sumida["linhas"], sumida["planilha"]) == (0, None)
+    assert (parceiros["linhas"], parceiros["arquivos"]) == (2, 2)
+    assert [log.split(":")[0] for log in parceiros["rejeitados"]] == ["❌ Erro lendo CAIO_LIMA - ATENDIMENTOS - 01-10-25.xlsm"]
+    assert all(r["segundos"] >= 0 for r in resultados)
+
+def test_erro_na_consolidacao_vai_para_o_status_da_pasta(equipes, monkeypatch):
+    def falhar(**opcoes):
+        raise PermissionError("planilha aberta")
+    monkeypatch.setattr(ap, "consolidar", falhar)
+    [resumo] = ap.consolidar_lote(equipes[:1])
+    assert (resumo["ok"], resumo["erro"]) == (False, "planilha aberta")
+    with open(ap.caminhos_saida(equipes[0][1])["status"], encoding="utf-8") as f:
+        assert f.read().startswith("❌ Erro na atualização: planilha aberta")
+
+def test_lote_em_processos_mantem_a_ordem(equipes):
+    resultados = ap.consolidar_lote(equipes, paralelo=2, motor="xlsxwriter", backups=0)
+    assert [(r["filhas"], r["ok"], r["linhas"]) for r in resultados] == [
+        (equipes[0][0], True, 2), (equipes[1][0], False, 0), (equipes[2][0], True, 2)]
+
+def test_cli_resumo_json_e_codigo_de_saida(equipes, tmp_path, capsys):
+    argumentos = ["--motor", "xlsxwriter", "--backups", "0"]
+    for filhas, saida in equipes:
+        argumentos += ["--par", filhas, saida]
+    assert ap.main(argumentos) == 1
+    resumo = json.loads(capsys.readouterr().out)  # stdout só com o resumo; o progresso vai para o stderr
+    assert (resumo["ok"], resumo["pastas"], resumo["falhas"]) == (False, 3, 1)
+    assert [r["ok"] for r in resumo["resultados"]] == [True, False, True]
+
+    arquivo_pares, arquivo_resumo = str(tmp_path / "pares.json"), str(tmp_path / "resumo.json")
+    with open(arquivo_pares, "w", encoding="utf-8") as f:
+        json.dump([{"filhas": filhas, "saida": saida} for filhas, saida in (equipes[0], equipes[2])], f)
+    assert ap.main(["--pares", arquivo_pares, "--resumo", arquivo_resumo, "--backups", "0"]) == 0
+    assert capsys.readouterr().out == ""
+    with open(arquivo_resumo, encoding="utf-8") as f:
+        resumo = json.load(f)
+    assert (resumo["ok"], resumo["pastas"], resumo["falhas"]) == (True, 2, 0)
+    assert [r["linhas"] for r in resumo["resultados"]] == [2, 2]
+
+def test_carregar_pares_aceita_objetos_e_listas(tmp_path):
+    caminho = str(tmp_path / "pares.json")
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump([{"filhas": "a/filhas", "saida": "a"}, ["b/filhas", "b"]], f)
+    assert ap.carregar_pares(caminho) == [("a/filhas", "a"), ("b/filhas", "b")]
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+def linhas(wb, abas):
+    """Linhas de dados das abas, na ordem, conferindo que todas começam com o cabeçalho"""
+    cabecalhos, valores = set(), []
+    for aba in abas:
+        cabecalho, *dados = wb[aba].iter_rows(values_only=True)
+        cabecalhos.add(cabecalho)
+        valores += dados
+    assert len(cabecalhos) == 1
+    return valores
+
+@pytest.fixture
+def filhas(pastas):
+    filhas, _ = pastas
+    criar_filha(filhas, "AMANDA_SILVA - ATENDIMENTOS - 01-10-25.xlsm",
+                [atendimento(dia(1, 8, m), responsavel="Amanda", minutos=m + 1) for m in range(4)])
+    criar_filha(filhas, "AMANDA_SILVA - ATENDIMENTOS - 02-10-25.xlsm",
+                [atendimento(dia(2, 8, m), responsavel="Amanda", setor="Parceiro") for m in range(3)])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm",
+                [atendimento(dia(1, 9, m), responsavel="Bia", finalizar=False) for m in range(2)])
+    return filhas
+
+def test_abas_continuam_em_2_e_3_quando_enchem(filhas, tmp_path, capsys):
+    inteira, dividida = str(tmp_path / "inteira"), str(tmp_path / "dividida")
+    _, _, metricas = ap.consolidar(motor="xlsxwriter", backups=0, filhas_dir=filhas, saida_dir=inteira)
+    capsys.readouterr()
+    _, _, metricas_divididas = ap.consolidar(backups=0, filhas_dir=filhas, saida_dir=dividida,
+                                             memoria_limitada=True, linhas_por_aba=3)
+    assert "📑 COMPILE GERAL dividido em 3 abas de até 3 linhas" in capsys.readouterr().out
+    assert metricas.total == 9
+    assert metricas_divididas.para_dict() == metricas.para_dict()
+
+    wb = load_workbook(os.path.join(dividida, "PLANILHA_MAE.xlsx"))
+    geral = ["COMPILE GERAL", "COMPILE GERAL (2)", "COMPILE GERAL (3)"]
+    amanda = ["Amanda", "Amanda (2)", "Amanda (3)"]
+    assert wb.sheetnames == [*geral, *ap.ABAS_METRICAS, *amanda, "Bia", ap.ABA_STATUS]
+    assert [wb[aba].max_row - 1 for aba in geral] == [3, 3, 3]
+    assert [wb[aba].max_row - 1 for aba in amanda] == [3, 3, 1]
+
+    wb_inteira = load_workbook(os.path.join(inteira, "PLANILHA_MAE.xlsx"))
+    assert linhas(wb, geral) == linhas(wb_inteira, ["COMPILE GERAL"])
+    assert linhas(wb, amanda) == linhas(wb_inteira, ["Amanda"])
+    assert linhas(wb, ["Bia"]) == linhas(wb_inteira, ["Bia"])
+    for aba in ap.ABAS_METRICAS:
+        assert linhas(wb, [aba]) == linhas(wb_inteira, [aba])
+
+def test_sem_encher_nao_divide(filhas, tmp_path):
+    saida = str(tmp_path / "saida")
+    ap.consolidar(backups=0, filhas_dir=filhas, saida_dir=saida, memoria_limitada=True, linhas_por_aba=9)
+    wb = load_workbook(os.path.join(saida, "PLANILHA_MAE.xlsx"))
+    assert wb.sheetnames == ["COMPILE GERAL", *ap.ABAS_METRICAS, "Amanda", "Bia", ap.ABA_STATUS]
+
+def test_nomes_das_abas():
+    assert ap.nomes_das_abas("Amanda", 0, 3) == ["Amanda"]
+    assert ap.nomes_das_abas("Amanda", 3, 3) == ["Amanda"]
+    assert ap.nomes_das_abas("Amanda", 7, 3) == ["Amanda", "Amanda (2)", "Amanda (3)"]
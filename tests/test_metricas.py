@@ -0,0 +1,69 @@
+import json
+from collections import Counter
+
+import pytest
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+@pytest.fixture
+def partes(pastas):
+    """Frame consolidado de três filhas e as MetricasParciais de cada uma; devolve (df, [parciais])"""
+    filhas, _ = pastas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm",
+                [atendimento(dia(1, 8), minutos=12), atendimento(dia(1, 9), setor="Parceiro", finalizar=False)])
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 02-10-25.xlsm",
+                [atendimento(dia(2, 8), minutos=30), atendimento(None, setor=None)])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm",
+                [atendimento(dia(1, 10), responsavel="Bia", setor="Parceiro", minutos=45)])
+    df, _, _ = ap.ler_filhos_com_metricas(usar_cache=False, filhas_dir=filhas, chave_duplicados=None)
+    arquivos = df["ARQUIVO"].astype(str)
+    return df, [ap.MetricasParciais.do_dataframe(df[arquivos == nome]) for nome in arquivos.unique()]
+
+def test_do_dataframe(partes):
+    df, _ = partes
+    metricas = ap.MetricasParciais.do_dataframe(df)
+    # o atendimento sem INICIAR também não tem FINALIZAR; o sem setor fica fora da contagem por setor
+    assert (metricas.total, metricas.finalizados, metricas.tempo_soma) == (5, 3, 107.0)
+    assert metricas.pessoas() == {"ANA": 4, "BIA": 1}
+    assert list(metricas.setores().items()) == [("Financeiro", 2), ("Parceiro", 2)]  # empate: ordem de aparição
+    assert metricas.linhas_kpi() == [
+        ["📈 Atendimentos Totais", 5], ["✅ Finalizados", 3], ["📊 % Finalizados", "60.0%"],
+        ["⏱️ Tempo Total (minutos)", "107.0"], ["⏰ Tempo Médio (minutos)", "21.4"]]
+
+def test_combinar_as_filhas_da_o_mesmo_que_o_frame_inteiro(partes):
+    df, (a, b, c) = partes
+    inteiro = ap.MetricasParciais.do_dataframe(df)
+    assert a + b + c == inteiro
+    assert (a + b) + c == a + (b + c) == (c + a) + b  # associativa e comutativa
+    assert ap.combinar_metricas([a, b, c]) == inteiro
+    assert a + ap.MetricasParciais() == a  # vazia é o elemento neutro
+    assert ap.MetricasParciais.do_dataframe(df.iloc[:0]) == ap.MetricasParciais()
+
+def test_combinar_nao_altera_as_parciais(partes):
+    _, (a, b, c) = partes
+    copias = [ap.MetricasParciais.de_dict(json.loads(json.dumps(m.para_dict()))) for m in (a, b, c)]
+    a + b
+    ap.combinar_metricas([a, b, c])
+    ap.combinar_metricas([a, a])
+    assert [a, b, c] == copias
+
+def test_descontar_desfaz_combinar(partes):
+    _, (a, b, c) = partes
+    assert (a + b + c) - c == a + b
+    assert (a + b) - a == b
+    vazia = a - a
+    assert vazia == ap.MetricasParciais()
+    # o que zera sai dos contadores e dos agregados por dia, como se nunca tivesse entrado
+    assert (vazia.por_setor, vazia.por_pessoa, vazia.por_dia) == (Counter(), Counter(), {})
+
+def test_para_dict_e_de_dict_sobrevivem_ao_json(partes):
+    df, _ = partes
+    metricas = ap.MetricasParciais.do_dataframe(df)
+    dados = json.loads(json.dumps(metricas.para_dict()))  # como fica no índice do cache
+    assert ap.MetricasParciais.de_dict(dados) == metricas
+
+def test_tempo_medio_sem_atendimentos():
+    vazia = ap.MetricasParciais()
+    assert vazia.tempo_medio == 0
+    assert vazia.linhas_kpi()[2] == ["📊 % Finalizados", "0.0%"]
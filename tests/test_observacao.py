@@ -0,0 +1,48 @@
+import pytest
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+class Relogio:
+    """time.monotonic/time.sleep falsos: cada sleep avança o relógio; para depois de `voltas` varreduras"""
+
+    def __init__(self, voltas):
+        self.agora, self.voltas = 0.0, voltas
+
+    def monotonic(self):
+        return self.agora
+
+    def sleep(self, segundos):
+        self.voltas -= 1
+        if self.voltas <= 0:
+            raise KeyboardInterrupt
+        self.agora += segundos
+
+@pytest.fixture
+def observacao(pastas, monkeypatch):
+    filhas, saida = pastas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", [atendimento(dia(1))])
+    monkeypatch.setattr(ap, "FILHAS_DIR", filhas)
+    monkeypatch.setattr(ap, "STATUS_PATH", f"{saida}/status.txt")
+    chamadas = []
+
+    def rodar(voltas, falhar):
+        relogio = Relogio(voltas)
+        monkeypatch.setattr(ap.time, "monotonic", relogio.monotonic)
+        monkeypatch.setattr(ap.time, "sleep", relogio.sleep)
+
+        def consolidar(**opcoes):
+            chamadas.append(relogio.agora)
+            if falhar:
+                raise PermissionError("planilha mãe aberta no Excel")
+        monkeypatch.setattr(ap, "consolidar", consolidar)
+        ap.observar(intervalo=1, debounce=5)
+        return chamadas
+    return rodar
+
+def test_primeira_consolidacao_nao_espera_o_debounce(observacao):
+    assert observacao(voltas=4, falhar=False) == [1.0]
+
+def test_falha_tenta_de_novo_so_depois_do_debounce(observacao):
+    # Sem mudanças em filhas/: depois da falha em t=1, as novas tentativas respeitam o debounce
+    assert observacao(voltas=14, falhar=True) == [1.0, 6.0, 11.0]
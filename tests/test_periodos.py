@@ -0,0 +1,87 @@
+import os
+from datetime import date, datetime
+
+import pytest
+from openpyxl import load_workbook
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+@pytest.mark.parametrize("dia_, semana, mes", [
+    ("2025-09-29", date(2025, 9, 29), date(2025, 9, 1)),   # segunda-feira
+    ("2025-10-05", date(2025, 9, 29), date(2025, 10, 1)),  # domingo: ainda a semana de 29/09
+    ("2025-10-06", date(2025, 10, 6), date(2025, 10, 1)),
+])
+def test_inicio_do_periodo(dia_, semana, mes):
+    assert ap.inicio_do_periodo(dia_, "semana") == semana
+    assert ap.inicio_do_periodo(dia_, "mes") == mes
+
+def test_rotulo_do_periodo():
+    assert ap.rotulo_do_periodo(date(2025, 9, 29), "semana") == "29/09/2025 a 05/10/2025"
+    assert ap.rotulo_do_periodo(date(2025, 10, 1), "mes") == "10/2025"
+
+@pytest.fixture
+def filhas(pastas):
+    """Atendimentos da Ana de segunda 29/09 a segunda 06/10 e um da Bia; devolve a pasta"""
+    filhas, _ = pastas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 30-09-25.xlsm",
+                [atendimento(datetime(2025, 9, 29, 8)), atendimento(datetime(2025, 9, 30, 8), finalizar=False)])
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 06-10-25.xlsm",
+                [atendimento(dia(5, 8), minutos=20), atendimento(dia(6, 8), setor="Parceiro")])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 01-10-25.xlsm", [atendimento(dia(1, 8), responsavel="Bia")])
+    return filhas
+
+def test_semanas_de_segunda_a_domingo(filhas):
+    _, _, metricas = ap.ler_filhos_com_metricas(usar_cache=False, filhas_dir=filhas)
+    assert metricas.por_periodo("semana", "pessoa") == [
+        ["29/09/2025 a 05/10/2025", "ANA", 3, 2, "66.7%", 40.0, 13.3],
+        ["29/09/2025 a 05/10/2025", "BIA", 1, 1, "100.0%", 10.0, 10.0],
+        ["06/10/2025 a 12/10/2025", "ANA", 1, 1, "100.0%", 10.0, 10.0],
+    ]
+
+def test_meses(filhas):
+    _, _, metricas = ap.ler_filhos_com_metricas(usar_cache=False, filhas_dir=filhas)
+    assert metricas.por_periodo("mes", "setor") == [
+        ["09/2025", "Financeiro", 2, 1, "50.0%", 20.0, 10.0],
+        ["10/2025", "Financeiro", 2, 2, "100.0%", 30.0, 15.0],  # maior primeiro dentro do mês
+        ["10/2025", "Parceiro", 1, 1, "100.0%", 10.0, 10.0],
+    ]
+
+def test_sem_iniciar_usa_a_data_da_filha_e_sem_data_nenhuma_fica_de_fora(pastas):
+    filhas, _ = pastas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 06-10-25.xlsm", [atendimento(None), atendimento(dia(1, 8))])
+    criar_filha(filhas, "BIA_COSTA - ATENDIMENTOS - 31-02-25.xlsm",  # data inválida: sem DATA_ARQUIVO
+                [atendimento(None, responsavel="Bia"), atendimento(dia(2, 8), responsavel="Bia")])
+    _, _, metricas = ap.ler_filhos_com_metricas(usar_cache=False, filhas_dir=filhas)
+    assert metricas.total == 4
+    assert sorted((d, pessoa, n) for (d, _, pessoa), (n, _, _) in metricas.por_dia.items()) == [
+        ("2025-10-01", "ANA", 1), ("2025-10-02", "BIA", 1), ("2025-10-06", "ANA", 1)]
+    assert [linha[:3] for linha in metricas.por_periodo("semana", "pessoa")] == [
+        ["29/09/2025 a 05/10/2025", "ANA", 1], ["29/09/2025 a 05/10/2025", "BIA", 1],
+        ["06/10/2025 a 12/10/2025", "ANA", 1]]
+
+def test_agregados_do_cache_iguais_aos_recalculados(filhas, pastas):
+    _, saida = pastas
+    cache_dir = os.path.join(saida, "cache_filhas")
+    _, _, recalculadas = ap.ler_filhos_com_metricas(usar_cache=False, filhas_dir=filhas)
+    for _ in range(2):  # 1ª grava o cache, 2ª combina os agregados por dia guardados nele
+        _, _, metricas = ap.ler_filhos_com_metricas(filhas_dir=filhas, cache_dir=cache_dir)
+        assert metricas.por_dia == recalculadas.por_dia
+        for periodo in ("semana", "mes"):
+            for dimensao in ("setor", "pessoa"):
+                assert metricas.por_periodo(periodo, dimensao) == recalculadas.por_periodo(periodo, dimensao)
+
+@pytest.mark.parametrize("motor", ["openpyxl", "xlsxwriter"])
+def test_abas_semanais_e_mensais(filhas, pastas, motor):
+    _, saida = pastas
+    _, _, metricas = ap.consolidar(motor=motor, backups=0, filhas_dir=filhas, saida_dir=saida)
+    wb = load_workbook(os.path.join(saida, "PLANILHA_MAE.xlsx"))
+    for aba, periodo in ap.ABAS_PERIODO.items():
+        linhas = [linha for linha in wb[aba].iter_rows(values_only=True) if any(v is not None for v in linha)]
+        assert linhas[0][0] == f"📅 {aba}"
+        coluna = "Semana" if periodo == "semana" else "Mês"
+        assert linhas[2] == (coluna, "Setor", *ap.CABECALHO_PERIODO)
+        por_setor = metricas.por_periodo(periodo, "setor")
+        assert [list(linha) for linha in linhas[3:3 + len(por_setor)]] == por_setor
+        assert linhas[3 + len(por_setor)][0] == "📋 ATENDIMENTOS POR RESPONSÁVEL"
+        assert [list(linha) for linha in linhas[5 + len(por_setor):]] == metricas.por_periodo(periodo, "pessoa")
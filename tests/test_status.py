@@ -0,0 +1,72 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from openpyxl import load_workbook
+
+import atualizar_planilhas as ap
+from conftest import criar_filha, atendimento, dia
+
+SUCESSO = "✅ Atualizado com sucesso — 2 linhas consolidadas."
+
+def status_do_arquivo(caminho):
+    """(mensagem, momento) do arquivo de status"""
+    with open(caminho, encoding="utf-8") as f:
+        mensagem, momento = f.read().splitlines()
+    return mensagem, datetime.strptime(momento, "%d/%m/%Y %H:%M:%S")
+
+def aba_status(mae):
+    wb = load_workbook(mae)
+    assert wb.sheetnames[-1] == ap.ABA_STATUS
+    (a1, b1), (a2, b2) = wb[ap.ABA_STATUS].iter_rows(values_only=True)
+    assert (a1, b1) == ("Status", "Atualizado em")
+    assert wb["COMPILE GERAL"]["A1"].value == "INICIAR"  # o status não sobrescreve mais o cabeçalho
+    return a2, datetime.strptime(b2, "%d/%m/%Y %H:%M:%S")
+
+def recente(momento):
+    return abs(datetime.now() - momento) < timedelta(minutes=1)
+
+@pytest.mark.parametrize("opcoes", [dict(motor="openpyxl"), dict(motor="xlsxwriter"), dict(incremental=True),
+                                    dict(memoria_limitada=True), dict(pipeline=True)],
+                         ids=["openpyxl", "xlsxwriter", "incremental", "memoria_limitada", "pipeline"])
+def test_sucesso_na_aba_e_no_arquivo_de_status(pastas, opcoes):
+    filhas, saida = pastas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", [atendimento(dia(1, 8)), atendimento(dia(1, 9))])
+    ap.consolidar(backups=0, filhas_dir=filhas, saida_dir=saida, **opcoes)
+    caminhos = ap.caminhos_saida(saida)
+    mensagem, momento = aba_status(caminhos["mae"])
+    assert mensagem == SUCESSO and recente(momento)
+    mensagem, momento = status_do_arquivo(caminhos["status"])
+    assert mensagem == SUCESSO and recente(momento)
+
+def test_erro_vai_so_para_o_arquivo_de_status(programa, monkeypatch):
+    ap.main(["--motor", "xlsxwriter", "--backups", "0"])
+    assert aba_status(ap.MAE_PATH)[0] == SUCESSO
+
+    def sem_espaco(*args, **kwargs):
+        raise OSError("disco cheio")
+    monkeypatch.setattr(ap, "_salvar_com_xlsxwriter", sem_espaco)
+    with pytest.raises(OSError):  # grava o status e o log, e repassa o erro
+        ap.main(["--motor", "xlsxwriter", "--backups", "0"])
+    mensagem, momento = status_do_arquivo(ap.STATUS_PATH)
+    assert mensagem == "❌ Erro na atualização: disco cheio" and recente(momento)
+    # a gravação é atômica: a planilha anterior continua com o status da última execução que deu certo
+    assert aba_status(ap.MAE_PATH)[0] == SUCESSO
+    with open(os.path.join(ap.BASE_DIR, "log_compilacao.txt"), encoding="utf-8") as f:
+        assert "❌ Erro na atualização: disco cheio" in f.read()
+
+def test_atualizando_e_gravado_antes_da_leitura(pastas, monkeypatch):
+    filhas, saida = pastas
+    criar_filha(filhas, "ANA_SILVA - ATENDIMENTOS - 01-10-25.xlsm", [atendimento(dia(1, 8))])
+    caminho = ap.caminhos_saida(saida)["status"]
+    vistos = []
+    ler = ap.ler_filhos_com_metricas
+    def ler_e_ver_status(*args, **kwargs):
+        vistos.append(status_do_arquivo(caminho)[0])
+        return ler(*args, **kwargs)
+    monkeypatch.setattr(ap, "ler_filhos_com_metricas", ler_e_ver_status)
+    ap.consolidar(backups=0, filhas_dir=filhas, saida_dir=saida)
+    assert vistos == ["⏳ Atualizando…"]
+
+def test_falha_ao_gravar_o_status_nao_interrompe(tmp_path):
+    ap.escrever_status("✅ ok", str(tmp_path / "nao_existe" / "status.txt"))